@@ -1,22 +1,106 @@
+import re
 from django.contrib import admin
-from .models import ProcessoPermanente, Listagem, ItemProcesso
+from .models import ConferenciaCaixa, ProcessoPermanente, Listagem, ItemProcesso, SituacaoProcesso, VerificacaoLote
+from .numeros import FORMATO_ANTIGO, apenas_numeros, chave_legado, chave_numerica, decompor_numero
+
+# Número digitado com ou sem pontuação (ex: 0001234-56.2019.4.04.7110)
+_NUMERO_DIGITADO = re.compile(r'[\d.\-]+')
 
 @admin.register(ProcessoPermanente)
 class ProcessoPermanenteAdmin(admin.ModelAdmin):
     # Campos para mostrar na listagem do admin
     list_display = ('numero', 'encontrado_por', 'data_encontrado', 'listagem_encontrado')
-    # Permite procurar pelo 'numero'
+    # Permite procurar pelo 'numero' (ou por "ano/sequência", ver get_search_results)
     search_fields = ('numero',)
-    # Adiciona um filtro para ver quais já foram encontrados
-    list_filter = ('data_encontrado',)
+    # Adiciona um filtro para ver quais já foram encontrados (e quais são permanentes)
+    list_filter = ('data_encontrado', 'permanente')
+    # Uma consulta só para a página (o __str__ da listagem usa o criador)
+    list_select_related = ('encontrado_por', 'listagem_encontrado__criador')
+    # Evita um select com todos os usuários/listagens no formulário
+    raw_id_fields = ('encontrado_por', 'listagem_encontrado')
+    list_per_page = 100
+    # Sem o COUNT(*) da tabela inteira a cada página
+    show_full_result_count = False
+    # Encontrados mais recentes primeiro: a ordem do índice de 'data_encontrado'
+    ordering = ('-data_encontrado', '-pk')
+
+    def get_search_results(self, request, queryset, search_term):
+        termo = search_term.strip()
+        ano, _, sequencia = termo.partition('/')
+        if len(ano) == 4 and ano.isdigit() and sequencia.isdigit():
+            # "1999/5690": ano + sequência, pelas partes indexadas do número
+            return queryset.filter(ano=int(ano), sequencia=int(sequencia)), False
+
+        encontrados = None
+        partes = decompor_numero(apenas_numeros(termo)) if _NUMERO_DIGITADO.fullmatch(termo) else None
+        if partes and partes.formato == FORMATO_ANTIGO:
+            # Número completo de 10 dígitos: todos os candidatos da chave legado
+            encontrados = queryset.filter(chave_legado=chave_legado(partes.numero))
+        elif partes and chave_numerica(partes.numero) is not None:
+            # Número completo de 15 ou 20 dígitos (com ou sem pontuação), pela chave numérica
+            encontrados = queryset.filter(chave=chave_numerica(partes.numero))
+        if encontrados is not None and encontrados.exists():
+            return encontrados, False
+        # Qualquer trecho (ou número completo não encontrado acima): 'numero' contém o termo,
+        # como antes. Um trecho curto pode estar em qualquer parte do número, não só na
+        # sequência ou na origem, então não há atalho pelos índices das partes.
+        return super().get_search_results(request, queryset, search_term)
+
+@admin.register(SituacaoProcesso)
+class SituacaoProcessoAdmin(admin.ModelAdmin):
+    list_display = ('nome', 'permanente')
+    list_filter = ('permanente',)
+    search_fields = ('nome',)
+    # Calculados a partir do texto da situação (e copiados para cada processo) pela
+    # importação: editados aqui, ficariam diferentes de ProcessoPermanente.permanente
+    readonly_fields = ('nome', 'permanente')
 
 @admin.register(Listagem)
 class ListagemAdmin(admin.ModelAdmin):
-    list_display = ('titulo', 'criador', 'data_criacao')
+    list_display = ('titulo', 'criador', 'data_criacao', 'qtd_itens', 'qtd_itens_permanentes', 'qtd_encontrados')
     search_fields = ('titulo', 'criador__username')
+    raw_id_fields = ('criador',)
+
+    def get_queryset(self, request):
+        # Criador e contagens na mesma consulta da página
+        return super().get_queryset(request).com_contagens()
+
+    @admin.display(description='Itens', ordering='qtd_itens')
+    def qtd_itens(self, obj):
+        return obj.qtd_itens
+
+    @admin.display(description='Itens permanentes', ordering='qtd_itens_permanentes')
+    def qtd_itens_permanentes(self, obj):
+        return obj.qtd_itens_permanentes
+
+    @admin.display(description='Permanentes encontrados', ordering='qtd_encontrados')
+    def qtd_encontrados(self, obj):
+        return obj.qtd_encontrados
 
 @admin.register(ItemProcesso)
 class ItemProcessoAdmin(admin.ModelAdmin):
     list_display = ('numero_digitado', 'listagem', 'e_permanente')
     list_filter = ('e_permanente',)
-    search_fields = ('numero_digitado', 'listagem__titulo')
\ No newline at end of file
+    search_fields = ('numero_digitado', 'listagem__titulo')
+    list_select_related = ('listagem__criador',)
+    raw_id_fields = ('listagem',)
+    list_per_page = 100
+    show_full_result_count = False
+
+@admin.register(VerificacaoLote)
+class VerificacaoLoteAdmin(admin.ModelAdmin):
+    list_display = ('pk', 'criador', 'status', 'total', 'processados', 'criada_em', 'concluida_em')
+    list_filter = ('status',)
+    list_select_related = ('criador',)
+    # O texto com todos os números pode ser enorme
+    exclude = ('numeros',)
+    readonly_fields = ('criador', 'total', 'processados', 'erro', 'concluida_em')
+
+
+@admin.register(ConferenciaCaixa)
+class ConferenciaCaixaAdmin(admin.ModelAdmin):
+    list_display = ('pk', 'caixa', 'criador', 'status', 'iniciada_em', 'finalizada_em')
+    list_filter = ('status',)
+    search_fields = ('caixa',)
+    list_select_related = ('criador',)
+    readonly_fields = ('criador', 'iniciada_em', 'finalizada_em')
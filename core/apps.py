@@ -1,6 +1,16 @@
 from django.apps import AppConfig
+from django.db.models.signals import post_migrate, post_save
 
 
 class CoreConfig(AppConfig):
     default_auto_field = 'django.db.models.BigAutoField'
     name = 'core'
+
+    def ready(self):
+        from .models import ProcessoPermanente, processo_salvo
+        from .pesquisa import garantir_indice
+
+        # Índice FTS5 da pesquisa por conteúdo (fora das migrações, ver core/pesquisa.py)
+        post_migrate.connect(garantir_indice, sender=self)
+        # Mudança de geração dos caches de consulta (ver core/geracao.py)
+        post_save.connect(processo_salvo, sender=ProcessoPermanente)
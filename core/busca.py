@@ -0,0 +1,156 @@
+from django.db.models import Q
+from .filtro import PREFIXO_LEGADO, filtro_atual
+from .models import ProcessoPermanente, e_situacao_permanente
+from .numeros import analisar_numeros, chave_legado, chave_numerica
+
+# O SQLite antigo aceita no máximo 999 parâmetros por consulta.
+# Usamos uma margem de segurança para os blocos de 'numero__in'.
+LIMITE_PARAMETROS_SQLITE = 900
+
+
+def em_blocos(itens, tamanho=LIMITE_PARAMETROS_SQLITE):
+    """Divide uma lista em pedaços de no máximo 'tamanho' itens."""
+    itens = list(itens)
+    for inicio in range(0, len(itens), tamanho):
+        yield itens[inicio:inicio + tamanho]
+
+
+def buscar_processos_em_lote(numeros_input):
+    """
+    Resolve uma lista inteira de números de uma vez.
+    Retorna um dicionário {input: ProcessoPermanente ou None}, com as mesmas
+    regras de 'buscar_processo_no_banco', mas com poucas consultas no total.
+    """
+    resultado = {numero: None for numero in numeros_input}
+    # Números que não podem existir (tamanho, ano ou dígito verificador) nem vão ao banco
+    limpos = {numero: partes.numero if partes else '' for numero, partes in analisar_numeros(resultado).items()}
+
+    # O filtro descarta, sem consulta, os números que com certeza não existem
+    filtro = filtro_atual()
+
+    # TENTATIVA 1: Busca Exata pela chave numérica (inteiro indexado) com 'chave__in' em blocos
+    chaves = {}  # input -> chave numérica
+    for numero, limpo in limpos.items():
+        chave = chave_numerica(limpo)
+        if chave is not None and (filtro is None or limpo in filtro):
+            chaves[numero] = chave
+
+    por_chave = {}
+    for bloco in em_blocos(set(chaves.values())):
+        for proc in ProcessoPermanente.objects.filter(chave__in=bloco):
+            por_chave[proc.chave] = proc
+
+    pendentes_legado = {}  # input -> chave ANO + SEQUÊNCIA
+    for numero, limpo in limpos.items():
+        if not limpo:
+            continue
+        proc = por_chave.get(chaves.get(numero))
+        if proc:
+            resultado[numero] = proc
+        elif len(limpo) == 10:
+            chave = chave_legado(limpo)
+            if filtro is None or PREFIXO_LEGADO + chave in filtro:
+                pendentes_legado[numero] = chave
+
+    # TENTATIVA 2: Números antigos de 10 dígitos, todos numa passada só
+    if pendentes_legado:
+        melhores = _resolver_legado(set(pendentes_legado.values()))
+        for numero, chave in pendentes_legado.items():
+            resultado[numero] = melhores.get(chave)
+
+    return resultado
+
+
+def _resolver_legado(chaves):
+    """
+    Recebe um conjunto de chaves ANO + SEQUÊNCIA e devolve {chave: melhor candidato}.
+    Usa o índice de 'chave_legado': os PERMANENTES vêm primeiro, depois o mais antigo.
+    A sequência precisa estar na posição dela (os 5 dígitos antes do DV): a busca
+    antiga (resolver_legado_por_varredura) aceitava os 5 dígitos em qualquer lugar
+    depois do ano, o que também achava números que só coincidiam por acaso.
+    """
+    melhores = {}
+    for bloco in em_blocos(chaves):
+        candidatos = ProcessoPermanente.objects.filter(chave_legado__in=bloco).order_by('-permanente', 'pk')
+        for cand in candidatos:
+            melhores.setdefault(cand.chave_legado, cand)
+    return melhores
+
+
+def resolver_legado_por_varredura(chaves):
+    """
+    Resolução antiga (começa com o ANO e contém a SEQUÊNCIA), sem usar o índice.
+    Mantida apenas para conferir que a chave pré-calculada dá o mesmo resultado.
+    """
+    sequencias_por_ano = {}
+    for chave in chaves:
+        sequencias_por_ano.setdefault(chave[:4], set()).add(chave[4:])
+
+    melhores = {}
+    # Cada chave usa 2 parâmetros (startswith + contains)
+    for bloco in em_blocos(sorted(chaves), LIMITE_PARAMETROS_SQLITE // 2):
+        filtro = Q()
+        for chave in bloco:
+            filtro |= Q(numero__startswith=chave[:4], numero__contains=chave[4:])
+
+        for cand in ProcessoPermanente.objects.filter(filtro).order_by('pk'):
+            ano = cand.numero[:4]
+            # Um mesmo candidato pode conter mais de uma sequência pendente
+            trechos = {cand.numero[i:i + 5] for i in range(len(cand.numero) - 4)}
+            for sequencia in trechos.intersection(sequencias_por_ano.get(ano, ())):
+                chave = ano + sequencia
+                atual = melhores.get(chave)
+                if atual is None or (e_situacao_permanente(cand.situacao) and not e_situacao_permanente(atual.situacao)):
+                    melhores[chave] = cand
+
+    return melhores
+
+
+def processos_por_numero(numeros):
+    """{numero: ProcessoPermanente} dos números como gravados no banco, em blocos de 'numero__in'."""
+    processos = {}
+    for bloco in em_blocos(set(numeros)):
+        processos.update((proc.numero, proc) for proc in ProcessoPermanente.objects.filter(numero__in=bloco))
+    return processos
+
+
+def buscar_por_partes(ano=None, sequencia=None, origem=None):
+    """
+    Processos por partes do número (ex: ano + sequência, ou todos de uma origem),
+    pelas colunas indexadas em vez de 'numero LIKE'.
+    """
+    filtros = {campo: valor for campo, valor in (('ano', ano), ('sequencia', sequencia), ('origem', origem)) if valor is not None}
+    if not filtros:
+        return ProcessoPermanente.objects.none()
+    return ProcessoPermanente.objects.filter(**filtros).order_by('numero')
+
+
+def buscar_processo_no_banco(numero_input):
+    """
+    Busca inteligente que lida com 10 dígitos (formato antigo) e 15/20 dígitos (novo).
+    Prioriza encontrar registros PERMANENTES.
+    """
+    return buscar_processos_em_lote([numero_input])[numero_input]
+
+
+def dados_conferencia(processo, caixa=None):
+    """Resposta da conferência para um processo (ou None, se não foi encontrado)."""
+    if not processo:
+        return {'encontrado': False}
+
+    # Pega a situação exata
+    situacao_db = processo.situacao
+    situacao_texto = str(situacao_db).strip() if situacao_db else "Campo Nulo"
+    if not situacao_texto: situacao_texto = "Vazio"
+
+    dados = {
+        'encontrado': True,
+        'caixa_origem': processo.caixa,
+        'situacao': situacao_texto,
+        # Indicador calculado na importação (campo indexado)
+        'is_permanente': processo.permanente,
+        'numero_db': processo.numero # Retorna o número oficial (15 dígitos) para exibir
+    }
+    if caixa is not None:
+        dados['na_caixa'] = processo.caixa == caixa
+    return dados
@@ -0,0 +1,182 @@
+"""
+Cache de consultas de processos por número.
+
+Guarda um resumo de cada número consultado (id, número, caixa, situação e
+se é permanente), para que as bipagens repetidas no balcão não precisem ir
+ao banco. Tudo é descartado quando a geração muda (ver core/geracao.py).
+
+Dois tipos, escolhidos em settings.CACHE_PROCESSOS_TIPO:
+- 'local': dicionário na memória do processo, com limite de itens (LRU);
+- 'compartilhado': usa o cache do Django settings.CACHE_PROCESSOS_ALIAS (Redis,
+  com settings.CACHE_PROCESSOS_URL), visto por todos os workers.
+"""
+import sys
+import threading
+import time
+from collections import OrderedDict, namedtuple
+from django.conf import settings
+from django.core.cache import caches
+from .busca import buscar_processos_em_lote
+from .geracao import ao_mudar_geracao, obter_geracao
+
+ResumoProcesso = namedtuple('ResumoProcesso', 'id numero caixa situacao permanente')
+
+# Valor guardado para "número não encontrado" (o cache do Django não diferencia None)
+NAO_ENCONTRADO = ()
+
+
+def resumir(processo):
+    if processo is None:
+        return NAO_ENCONTRADO
+    # Há poucas situações e caixas distintas: intern evita uma cópia por processo
+    return ResumoProcesso(
+        processo.id, processo.numero,
+        sys.intern(processo.caixa) if processo.caixa else processo.caixa,
+        sys.intern(processo.situacao) if processo.situacao else processo.situacao,
+        processo.permanente,
+    )
+
+
+class CacheLocal:
+    """Cache na memória do processo, limitado a 'limite' números (descarta os mais antigos)."""
+
+    def __init__(self, limite, intervalo_verificacao=1.0):
+        self.limite = limite
+        # Quanto tempo (s) confiar na geração antes de conferir de novo no banco
+        self.intervalo_verificacao = intervalo_verificacao
+        self.itens = OrderedDict()
+        self.lock = threading.Lock()
+        self.acertos = 0
+        self.falhas = 0
+        self.geracao = None
+        self.verificado_em = 0.0
+
+    def _conferir_geracao(self):
+        agora = time.monotonic()
+        if agora - self.verificado_em < self.intervalo_verificacao:
+            return
+        geracao = obter_geracao()
+        self.verificado_em = agora
+        if geracao != self.geracao:
+            self.itens.clear()
+            self.geracao = geracao
+
+    def obter_varios(self, chaves):
+        """
+        Retorna ({chave: resumo} dos que estão no cache, [chaves que faltam], geração).
+        A geração vai de volta para guardar_varios() junto com o que for lido no banco.
+        """
+        achados, faltando = {}, []
+        with self.lock:
+            self._conferir_geracao()
+            geracao = self.geracao
+            for chave in chaves:
+                valor = self.itens.get(chave)
+                if valor is None:
+                    faltando.append(chave)
+                else:
+                    self.itens.move_to_end(chave)
+                    achados[chave] = valor
+            self.acertos += len(achados)
+            self.falhas += len(faltando)
+        return achados, faltando, geracao
+
+    def guardar_varios(self, valores, geracao):
+        with self.lock:
+            if geracao != self.geracao:
+                # A geração mudou enquanto o banco era lido: os valores podem ser da anterior
+                return
+            self.itens.update(valores)
+            while len(self.itens) > self.limite:
+                self.itens.popitem(last=False)
+
+    def limpar(self):
+        with self.lock:
+            self.itens.clear()
+            # Uma consulta em andamento, com a geração anterior, não guarda mais nada
+            self.geracao = None
+            self.verificado_em = 0.0
+
+    def estatisticas(self):
+        return {'tipo': 'local', 'itens': len(self.itens), 'limite': self.limite,
+                'acertos': self.acertos, 'falhas': self.falhas, 'geracao': self.geracao}
+
+
+class CacheCompartilhado:
+    """Cache no backend do Django, compartilhado entre workers. A geração faz parte da chave."""
+
+    PREFIXO = 'core:processo'
+
+    def __init__(self, cache, timeout=24 * 60 * 60):
+        self.cache = cache
+        self.timeout = timeout
+        self.acertos = 0
+        self.falhas = 0
+
+    def _chaves(self, chaves, geracao):
+        return {f'{self.PREFIXO}:{geracao}:{chave}': chave for chave in chaves}
+
+    def obter_varios(self, chaves):
+        # Uma leitura da geração por consulta: a mesma vale para guardar o que faltou
+        geracao = obter_geracao()
+        mapa = self._chaves(chaves, geracao)
+        guardados = self.cache.get_many(list(mapa))
+        achados = {mapa[chave_cache]: valor for chave_cache, valor in guardados.items()}
+        faltando = [chave for chave in chaves if chave not in achados]
+        self.acertos += len(achados)
+        self.falhas += len(faltando)
+        return achados, faltando, geracao
+
+    def guardar_varios(self, valores, geracao):
+        # Lidos depois de a geração ser obtida: no pior caso ficam sob uma geração já velha
+        self.cache.set_many({chave_cache: valores[chave] for chave_cache, chave in self._chaves(valores, geracao).items()},
+                            self.timeout)
+
+    def limpar(self):
+        # As chaves antigas ficam órfãs e expiram sozinhas
+        pass
+
+    def estatisticas(self):
+        return {'tipo': 'compartilhado', 'acertos': self.acertos, 'falhas': self.falhas, 'geracao': obter_geracao()}
+
+
+_cache = None
+_cache_lock = threading.Lock()
+
+
+def obter_cache():
+    """O cache configurado em settings (criado uma vez por processo)."""
+    global _cache
+    if _cache is None:
+        with _cache_lock:
+            if _cache is None:
+                tipo = getattr(settings, 'CACHE_PROCESSOS_TIPO', 'local')
+                if tipo == 'compartilhado':
+                    _cache = CacheCompartilhado(caches[getattr(settings, 'CACHE_PROCESSOS_ALIAS', 'default')])
+                else:
+                    _cache = CacheLocal(getattr(settings, 'CACHE_PROCESSOS_LIMITE', 100_000))
+                    # Alterações feitas neste processo limpam o cache na hora;
+                    # as de outros processos são vistas em até 'intervalo_verificacao'
+                    ao_mudar_geracao(_cache.limpar)
+    return _cache
+
+
+def consultar_processos(numeros_input):
+    """
+    Igual a 'buscar_processos_em_lote', mas devolve ResumoProcesso (ou None)
+    e só vai ao banco para os números que não estão no cache.
+    """
+    numeros = list(dict.fromkeys(numeros_input))
+    cache_processos = obter_cache()
+    achados, faltando, geracao = cache_processos.obter_varios(numeros)
+
+    if faltando:
+        novos = {numero: resumir(processo) for numero, processo in buscar_processos_em_lote(faltando).items()}
+        cache_processos.guardar_varios(novos, geracao)
+        achados.update(novos)
+
+    return {numero: (achados[numero] or None) for numero in numeros}
+
+
+def consultar_processo(numero_input):
+    return consultar_processos([numero_input])[numero_input]
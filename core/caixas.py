@@ -0,0 +1,43 @@
+"""
+Diretório de caixas para o autocomplete.
+
+A lista de caixas (com a quantidade de processos em cada uma) é calculada
+uma vez e guardada no cache, numa chave que inclui a geração dos dados
+(ver core/geracao.py): importar ou alterar processos gera uma lista nova.
+"""
+from bisect import bisect_left
+from django.core.cache import cache
+from django.db.models import Count
+from .geracao import obter_geracao
+from .models import ProcessoPermanente
+
+CHAVE_CACHE = 'core:diretorio_caixas:{geracao}'
+LIMITE_PADRAO = 20
+
+
+def listar_caixas():
+    """Lista ordenada de (caixa, quantidade de processos), vinda do cache se possível."""
+    chave = CHAVE_CACHE.format(geracao=obter_geracao())
+    caixas = cache.get(chave)
+    if caixas is None:
+        caixas = list(
+            ProcessoPermanente.objects.exclude(caixa__isnull=True).exclude(caixa='')
+            .values('caixa').annotate(quantidade=Count('id')).order_by('caixa')
+            .values_list('caixa', 'quantidade')
+        )
+        # Expira sozinha depois de um dia, quando já for de uma geração antiga
+        cache.set(chave, caixas, 24 * 60 * 60)
+    return caixas
+
+
+def buscar_caixas(prefixo, limite=LIMITE_PADRAO):
+    """As primeiras 'limite' caixas que começam com 'prefixo', em ordem."""
+    caixas = listar_caixas()
+    inicio = bisect_left(caixas, (prefixo,))
+    encontradas = []
+    for caixa, quantidade in caixas[inicio:]:
+        if not caixa.startswith(prefixo) or len(encontradas) >= limite:
+            break
+        encontradas.append({'caixa': caixa, 'quantidade': quantidade})
+    return encontradas
+
@@ -0,0 +1,149 @@
+"""
+Conferência de caixa por WebSocket (servida pelo ASGI, ver permanentes/asgi.py).
+
+O leitor mantém uma conexão aberta, envia os números bipados e recebe de
+volta o veredito de cada um junto com o placar da caixa. As leituras são
+gravadas na conferência aberta da caixa (core/conferencias.py):
+
+    -> {"caixa": "123"}                       (primeira mensagem, ou ?caixa=123 na URL)
+    <- {"tipo": "sessao", "caixa": "123", "conferencia": 7, "placar": {...}}
+    -> {"numeros": ["9919056901", ...]}       (ou {"numero": "..."})
+    <- {"tipo": "veredito", "numero": "...", "veredito": "na_caixa", ..., "placar": {...}}
+
+Vereditos: 'permanente', 'na_caixa', 'caixa_errada' (com 'caixa_origem') e 'nao_encontrado'.
+"""
+import json
+from http.cookies import SimpleCookie
+from importlib import import_module
+from urllib.parse import parse_qs, urlsplit
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.contrib.auth import aget_user
+from django.http.request import validate_host
+from .cache_processos import consultar_processos
+from .conferencias import ConferenciaFinalizada, abrir_conferencia, calcular_placar, registrar_leituras
+
+CAMINHO = '/ws/conferencia/'
+# Mesmo limite da conferência em lote por HTTP
+LIMITE_NUMEROS_MENSAGEM = 500
+
+
+class SessaoConferencia:
+    """A conferência gravada da caixa (core/conferencias.py) lida por esta conexão."""
+
+    def __init__(self, conferencia, usuario):
+        self.conferencia = conferencia
+        self.usuario = usuario
+
+    def registrar(self, numeros):
+        """Resolve e grava os números; devolve os vereditos, cada um com o placar depois do lote."""
+        resolvidos = consultar_processos(numeros)
+        vereditos = registrar_leituras(self.conferencia, numeros, resolvidos, self.usuario)
+        # O placar sai do banco: inclui as leituras das outras estações na mesma caixa e
+        # não conta duas vezes o processo lido por duas estações ao mesmo tempo
+        placar = calcular_placar(self.conferencia)
+        for dados in vereditos:
+            dados.update(tipo='veredito', placar=placar)
+        return vereditos
+
+
+async def conferencia_websocket(scope, receive, send):
+    """Aplicação ASGI para conexões WebSocket."""
+    mensagem = await receive()
+    if mensagem['type'] != 'websocket.connect':
+        return
+
+    if scope['path'] != CAMINHO or not origem_permitida(scope):
+        await send({'type': 'websocket.close', 'code': 4403})
+        return
+
+    usuario = await usuario_da_conexao(scope)
+    if not usuario.is_authenticated:
+        await send({'type': 'websocket.close', 'code': 4401})
+        return
+
+    await send({'type': 'websocket.accept'})
+
+    sessao = None
+    caixa = parse_qs(scope.get('query_string', b'').decode()).get('caixa', [''])[0].strip()
+    if caixa:
+        sessao = await iniciar_sessao(send, caixa, usuario)
+
+    while True:
+        mensagem = await receive()
+        if mensagem['type'] == 'websocket.disconnect':
+            return
+
+        try:
+            dados = json.loads(mensagem.get('text') or mensagem.get('bytes') or '')
+        except ValueError:
+            await enviar(send, {'tipo': 'erro', 'erro': 'JSON inválido.'})
+            continue
+        if not isinstance(dados, dict):
+            await enviar(send, {'tipo': 'erro', 'erro': 'JSON inválido.'})
+            continue
+
+        if dados.get('caixa'):
+            sessao = await iniciar_sessao(send, str(dados['caixa']).strip(), usuario)
+
+        numeros = dados.get('numeros') or ([dados['numero']] if dados.get('numero') else [])
+        if not numeros:
+            continue
+        if sessao is None:
+            await enviar(send, {'tipo': 'erro', 'erro': 'Informe a caixa antes de enviar números.'})
+            continue
+
+        numeros = [str(numero).strip() for numero in numeros][:LIMITE_NUMEROS_MENSAGEM]
+        try:
+            vereditos = await sync_to_async(sessao.registrar)(numeros)
+        except ConferenciaFinalizada:
+            await enviar(send, {'tipo': 'erro', 'erro': 'Esta conferência já foi finalizada.'})
+            continue
+        for dados in vereditos:
+            await enviar(send, dados)
+
+
+@sync_to_async
+def _abrir(caixa, usuario):
+    conferencia = abrir_conferencia(caixa, usuario)
+    return conferencia, calcular_placar(conferencia)
+
+
+async def iniciar_sessao(send, caixa, usuario):
+    # Abre ou retoma a conferência gravada da caixa, com o placar das leituras já feitas
+    conferencia, placar = await _abrir(caixa, usuario)
+    sessao = SessaoConferencia(conferencia, usuario)
+    await enviar(send, {'tipo': 'sessao', 'caixa': caixa, 'conferencia': conferencia.pk, 'placar': dict(placar)})
+    return sessao
+
+
+async def enviar(send, dados):
+    await send({'type': 'websocket.send', 'text': json.dumps(dados)})
+
+
+def cabecalhos(scope):
+    return {nome.decode('latin1').lower(): valor.decode('latin1') for nome, valor in scope.get('headers', [])}
+
+
+def origem_permitida(scope):
+    """Bloqueia conexões abertas por páginas de outros sites (o navegador envia o cookie)."""
+    origem = cabecalhos(scope).get('origin')
+    if not origem:
+        return True
+    return validate_host(urlsplit(origem).netloc.split(':')[0], settings.ALLOWED_HOSTS)
+
+
+class _RequisicaoSessao:
+    """O mínimo de 'request' que o aget_user precisa: só a sessão."""
+
+    def __init__(self, session):
+        self.session = session
+
+
+async def usuario_da_conexao(scope):
+    """Usuário logado, a partir do cookie de sessão do Django."""
+    cookie = SimpleCookie(cabecalhos(scope).get('cookie', ''))
+    morsel = cookie.get(settings.SESSION_COOKIE_NAME)
+    engine = import_module(settings.SESSION_ENGINE)
+    session = engine.SessionStore(morsel.value if morsel else None)
+    return await aget_user(_RequisicaoSessao(session))
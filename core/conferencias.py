@@ -0,0 +1,136 @@
+"""
+Conferência de caixa gravada no servidor.
+
+Cada leitura vira uma LeituraConferencia, então a conferência sobrevive a
+um recarregamento da página e pode ser continuada de outra estação (basta
+abrir a mesma caixa). O placar e o relatório saem do banco:
+
+- placar: contagem das leituras por veredito (GROUP BY);
+- faltantes: processos da caixa sem leitura (NOT IN sobre os números lidos);
+- excedentes: leituras de processos de outra caixa ou não cadastrados.
+
+Leituras e processos se cruzam pelo número, não pelo id: a importação
+completa troca os ids de todos os processos no meio de uma conferência aberta.
+
+Usada pelas views HTTP (core/views.py) e pelo WebSocket (core/conferencia_ws.py).
+"""
+from django.db import IntegrityError, transaction
+from django.db.models import Count
+from django.utils import timezone
+from .busca import dados_conferencia, em_blocos, processos_por_numero
+from .models import ConferenciaCaixa, LeituraConferencia, ProcessoPermanente
+
+
+class ConferenciaFinalizada(Exception):
+    """Leitura enviada para uma conferência que já foi finalizada (por outra estação, por exemplo)."""
+
+
+def abrir_conferencia(caixa, usuario):
+    """A conferência aberta da caixa (de qualquer usuário) ou uma nova."""
+    aberta = ConferenciaCaixa.objects.filter(caixa=caixa, status=ConferenciaCaixa.ABERTA).first()
+    if aberta:
+        return aberta
+    try:
+        with transaction.atomic():
+            return ConferenciaCaixa.objects.create(caixa=caixa, criador=usuario)
+    except IntegrityError:
+        # Outra estação abriu a mesma caixa ao mesmo tempo
+        return ConferenciaCaixa.objects.get(caixa=caixa, status=ConferenciaCaixa.ABERTA)
+
+
+def finalizar_conferencia(conferencia):
+    """Fecha a conferência; depois disso ela só aparece no relatório."""
+    ConferenciaCaixa.objects.filter(pk=conferencia.pk, status=ConferenciaCaixa.ABERTA).update(
+        status=ConferenciaCaixa.FINALIZADA, finalizada_em=timezone.now(),
+    )
+
+
+def classificar(processo, caixa):
+    if not processo:
+        return LeituraConferencia.NAO_ENCONTRADO
+    if processo.permanente:
+        return LeituraConferencia.PERMANENTE
+    if processo.caixa == caixa:
+        return LeituraConferencia.NA_CAIXA
+    return LeituraConferencia.CAIXA_ERRADA
+
+
+def registrar_leituras(conferencia, numeros, resolvidos, usuario):
+    """
+    Grava as leituras novas e devolve, na ordem lida, os dados de cada número:
+    os de dados_conferencia mais 'numero', 'veredito' e 'repetido'.
+    'resolvidos' é o {numero: ResumoProcesso ou None} de consultar_processos.
+    """
+    if not ConferenciaCaixa.objects.filter(pk=conferencia.pk, status=ConferenciaCaixa.ABERTA).exists():
+        raise ConferenciaFinalizada
+
+    # O número oficial identifica a leitura: o mesmo processo lido em outro formato é repetido
+    oficiais = {numero: resolvidos[numero].numero if resolvidos[numero] else numero[:25] for numero in numeros}
+    ja_lidos = set()
+    for bloco in em_blocos(set(oficiais.values())):
+        ja_lidos.update(conferencia.leituras.filter(numero__in=bloco).values_list('numero', flat=True))
+
+    novas = {}
+    resultados = []
+    for numero in numeros:
+        processo, oficial = resolvidos[numero], oficiais[numero]
+        veredito = classificar(processo, conferencia.caixa)
+        repetido = oficial in ja_lidos or oficial in novas
+        if not repetido:
+            novas[oficial] = LeituraConferencia(
+                conferencia=conferencia, numero=oficial, processo_id=processo.id if processo else None,
+                veredito=veredito, lida_por=usuario,
+            )
+        dados = dados_conferencia(processo, conferencia.caixa)
+        dados.update(numero=numero, veredito=veredito, repetido=repetido)
+        resultados.append(dados)
+
+    # Duas estações lendo o mesmo processo ao mesmo tempo: a segunda gravação é ignorada
+    LeituraConferencia.objects.bulk_create(novas.values(), ignore_conflicts=True)
+    return resultados
+
+
+def calcular_placar(conferencia):
+    """Processos esperados na caixa e quantas leituras de cada veredito."""
+    placar = {'esperados': ProcessoPermanente.objects.filter(caixa=conferencia.caixa).count()}
+    placar.update({veredito: 0 for veredito, _ in LeituraConferencia.VEREDITOS})
+    placar.update(conferencia.leituras.order_by().values_list('veredito').annotate(Count('pk')))
+    return placar
+
+
+def _processos_lidos(leituras):
+    """{numero: ProcessoPermanente} dos processos encontrados nas leituras, como estão agora no banco."""
+    return processos_por_numero(leitura.numero for leitura in leituras if leitura.veredito != LeituraConferencia.NAO_ENCONTRADO)
+
+
+def leituras_para_retomar(conferencia):
+    """As leituras já feitas, no formato das respostas de registrar_leituras, para a página se remontar."""
+    leituras = list(conferencia.leituras.order_by('lida_em', 'pk'))
+    processos = _processos_lidos(leituras)
+    retomadas = []
+    for leitura in leituras:
+        dados = dados_conferencia(processos.get(leitura.numero), conferencia.caixa)
+        dados.update(numero=leitura.numero, veredito=leitura.veredito, repetido=False)
+        retomadas.append(dados)
+    return retomadas
+
+
+def relatorio(conferencia):
+    """Permanentes a separar, processos na caixa, excedentes e faltantes."""
+    leituras = list(conferencia.leituras.order_by('lida_em', 'pk'))
+    processos = _processos_lidos(leituras)
+    for leitura in leituras:
+        processo = processos.get(leitura.numero)
+        leitura.caixa_origem = processo.caixa if processo else None
+
+    def com_veredito(*vereditos):
+        return [leitura for leitura in leituras if leitura.veredito in vereditos]
+
+    return {
+        'permanentes': com_veredito(LeituraConferencia.PERMANENTE),
+        'na_caixa': com_veredito(LeituraConferencia.NA_CAIXA),
+        'excedentes': com_veredito(LeituraConferencia.CAIXA_ERRADA, LeituraConferencia.NAO_ENCONTRADO),
+        'faltantes': ProcessoPermanente.objects.filter(caixa=conferencia.caixa)
+            .exclude(numero__in=conferencia.leituras.values('numero'))
+            .order_by('numero').values_list('numero', flat=True),
+    }
@@ -1,14 +1,45 @@
+import os
 import subprocess
+from functools import lru_cache
+from django.conf import settings
 
-def versao_sistema(request):
+# Arquivo gerado no deploy com a versão (ex: echo $(git rev-parse --short HEAD) > VERSION)
+ARQUIVO_VERSAO = 'VERSION'
+
+
+def versao_do_git():
+    """Hash curto do último commit git (ex: a1b2c3d), ou None se não houver git."""
     try:
-        # Tenta pegar o hash curto do último commit git (ex: a1b2c3d)
-        versao = subprocess.check_output(
-            ['git', 'rev-parse', '--short', 'HEAD'], 
-            stderr=subprocess.STDOUT
+        return subprocess.check_output(
+            ['git', 'rev-parse', '--short', 'HEAD'],
+            stderr=subprocess.STDOUT,
+            cwd=settings.BASE_DIR,
         ).decode('utf-8').strip()
     except Exception:
-        # Se der erro (não tiver git instalado ou pasta .git), mostra padrão
-        versao = 'Local/Dev'
+        return None
+
+
+@lru_cache(maxsize=None)
+def obter_versao():
+    """
+    Descobre a versão uma única vez por processo.
+    Ordem: variável de ambiente VERSAO_SISTEMA, arquivo VERSION e, por último, o git.
+    """
+    versao = os.environ.get('VERSAO_SISTEMA', '').strip()
+    if versao:
+        return versao
 
-    return {'versao_sistema': versao}
\ No newline at end of file
+    try:
+        with open(os.path.join(settings.BASE_DIR, ARQUIVO_VERSAO), encoding='utf-8') as f:
+            versao = f.read().strip()
+    except OSError:
+        versao = ''
+    if versao:
+        return versao
+
+    # Se der erro (não tiver git instalado ou pasta .git), mostra padrão
+    return versao_do_git() or 'Local/Dev'
+
+
+def versao_sistema(request):
+    return {'versao_sistema': obter_versao()}
@@ -0,0 +1,106 @@
+"""
+Dados sintéticos para os benchmarks: processos com números, caixas e
+situações parecidos com os reais, e listas de consulta com a mistura de
+formatos que chega no balcão.
+
+Tudo é gerado a partir de uma semente, para os resultados poderem ser
+comparados entre commits.
+"""
+import csv
+import random
+
+# Situações e o peso de cada uma na base
+SITUACOES = [('Baixado', 60), ('Arquivado', 25), ('PERMANENTE', 10), ('Arquivado Permanente', 5)]
+VARAS = ['7110', '7111', '7120', '7130', '7200', '7210', '7300', '7400', '8100', '8200']
+
+# Textos para a pesquisa por conteúdo: 20 temas x 10 complementos = 200 assuntos
+TEMAS = [
+    'Contribuições Previdenciárias', 'Imposto de Renda', 'IPI', 'PIS', 'COFINS', 'Aposentadoria por Idade',
+    'Auxílio-Doença', 'Pensão por Morte', 'Salário-Maternidade', 'Benefício Assistencial', 'FGTS',
+    'Sistema Financeiro da Habitação', 'Desapropriação', 'Responsabilidade Civil', 'Servidor Público',
+    'Crimes contra a Ordem Tributária', 'Contrabando ou Descaminho', 'Multas e Sanções',
+    'Anuidade de Conselho Profissional', 'Dívida Ativa',
+]
+COMPLEMENTOS = [
+    'Restituição', 'Repetição de Indébito', 'Revisão', 'Concessão', 'Cobrança', 'Anulação de Débito',
+    'Isenção', 'Parcelamento', 'Indenização', 'Execução',
+]
+ASSUNTOS = [f'{tema} - {complemento}' for complemento in COMPLEMENTOS for tema in TEMAS]
+CLASSES = [
+    'Execução Fiscal', 'Procedimento Comum', 'Mandado de Segurança', 'Procedimento do Juizado Especial Cível',
+    'Ação Penal', 'Embargos à Execução Fiscal', 'Cumprimento de Sentença',
+]
+ORGAOS = ['1ª Vara Federal de Pelotas', '2ª Vara Federal de Pelotas', '3ª Vara Federal de Pelotas',
+          'Juizado Especial Federal de Pelotas']
+LOCALIZADORES = ['Arquivo Permanente', 'Arquivo Geral', 'Baixa Definitiva', 'Aguardando Digitalização',
+                 'Remetido ao Tribunal']
+
+# Mistura dos números consultados: formato -> proporção
+MISTURA_CONSULTAS = {
+    'existente_15': 0.50,   # Número atual de um processo da base
+    'legado_10': 0.15,      # Número antigo (10 dígitos) de um processo da base
+    'cnj_20': 0.15,         # Numeração única (20 dígitos), que não está na base
+    'ausente_15': 0.20,     # 15 dígitos que não está na base
+}
+
+
+def gerar_processos(quantidade, caixas=300, semente=42):
+    """
+    Gera 'quantidade' processos (dicionários com os campos do CSV da importação).
+    Os tamanhos das caixas seguem uma distribuição de Zipf: poucas caixas
+    muito cheias e muitas com poucos processos, como no arquivo real.
+    """
+    aleatorio = random.Random(semente)
+    nomes_caixas = [f'{numero:04d}' for numero in range(1, caixas + 1)]
+    pesos_caixas = [1 / posicao for posicao in range(1, caixas + 1)]
+    situacoes, pesos_situacoes = zip(*SITUACOES)
+    # Os textos saem de outro gerador: os números, caixas e situações continuam os mesmos para a mesma semente
+    textos = random.Random(semente + 1)
+
+    vistos = set()
+    while len(vistos) < quantidade:
+        numero = f'{aleatorio.randint(1990, 2024)}{aleatorio.choice(VARAS)}{aleatorio.randrange(10 ** 6):06d}{aleatorio.randrange(10)}'
+        if numero in vistos:
+            continue
+        vistos.add(numero)
+        yield {
+            'numero': numero,
+            'caixa': aleatorio.choices(nomes_caixas, pesos_caixas)[0],
+            'situacao': aleatorio.choices(situacoes, pesos_situacoes)[0],
+            'assunto': ASSUNTOS[aleatorio.randrange(200)],
+            'classe': textos.choice(CLASSES),
+            'orgao_atual': textos.choice(ORGAOS),
+            'localizador': textos.choice(LOCALIZADORES),
+        }
+
+
+def numero_legado(numero):
+    """Número antigo (10 dígitos) que corresponde a um número de 15 dígitos."""
+    return numero[2:4] + numero[4:6] + numero[-6:-1] + numero[-1]
+
+
+def numeros_consulta(existentes, quantidade, aleatorio):
+    """Lista de números para consultar, na proporção de MISTURA_CONSULTAS."""
+    formatos, pesos = zip(*MISTURA_CONSULTAS.items())
+    numeros = []
+    for formato in aleatorio.choices(formatos, pesos, k=quantidade):
+        if formato == 'existente_15':
+            numeros.append(aleatorio.choice(existentes))
+        elif formato == 'legado_10':
+            numeros.append(numero_legado(aleatorio.choice(existentes)))
+        elif formato == 'cnj_20':
+            numeros.append(f'{aleatorio.randrange(10 ** 20):020d}')
+        else:
+            numeros.append(f'{aleatorio.randrange(10 ** 15):015d}')
+    return numeros
+
+
+def escrever_csv(caminho, processos):
+    """Grava os processos no formato aceito pelo comando importar_dados."""
+    colunas = {'numero': 'Processo', 'caixa': 'Caixa', 'situacao': 'Situação', 'assunto': 'Assunto', 'classe': 'Classe',
+               'orgao_atual': 'Órgão Atual', 'localizador': 'Localizador'}
+    with open(caminho, 'w', newline='', encoding='utf-8') as arquivo:
+        escritor = csv.DictWriter(arquivo, fieldnames=list(colunas.values()))
+        escritor.writeheader()
+        for processo in processos:
+            escritor.writerow({colunas[campo]: valor for campo, valor in processo.items()})
@@ -0,0 +1,160 @@
+"""
+Filtro de Bloom com todos os números de processo (e chaves de números antigos).
+
+Responde "com certeza não existe" sem consultar o banco. Se responder
+"talvez exista", a busca segue normalmente. A maioria das bipagens no
+balcão não é de processo permanente, então a maioria das buscas para aqui.
+
+O filtro é gerado pela importação e gravado em disco
+(settings.FILTRO_PROCESSOS_ARQUIVO). Ele guarda a geração dos números
+(ver core/geracao.py) de quando foi gerado e só é usado enquanto ela não
+mudar: um número novo salvo depois disso desliga o filtro até a próxima
+geração. Como no CacheLocal, a geração é conferida no banco no máximo uma vez
+por INTERVALO_VERIFICACAO; as mudanças feitas neste processo valem na hora.
+"""
+import hashlib
+import math
+import os
+import struct
+import threading
+import time
+from django.conf import settings
+from .geracao import CHAVE_GERACAO_NUMEROS, ao_mudar_geracao, novos_numeros, obter_geracao
+from .models import ProcessoPermanente
+
+# Cabeçalho do arquivo: identificador, geração, bits, funções de hash, itens
+CABECALHO = struct.Struct('<8sQQII')
+IDENTIFICADOR = b'PERMBLM1'
+# Prefixo das chaves de número antigo, para não se confundirem com os números
+PREFIXO_LEGADO = 'L'
+# Quanto tempo (s) confiar na geração dos números antes de conferir de novo no banco
+INTERVALO_VERIFICACAO = 1.0
+
+
+class FiltroBloom:
+
+    def __init__(self, bits, hashes, dados=None, itens=0, geracao=0):
+        self.bits = bits
+        self.hashes = hashes
+        self.dados = dados if dados is not None else bytearray((bits + 7) // 8)
+        self.itens = itens
+        self.geracao = geracao
+
+    @classmethod
+    def para(cls, quantidade, taxa_falso_positivo):
+        """Filtro dimensionado para 'quantidade' itens com a taxa de falso positivo desejada."""
+        quantidade = max(quantidade, 1)
+        bits = max(8, math.ceil(-quantidade * math.log(taxa_falso_positivo) / math.log(2) ** 2))
+        hashes = max(1, round(bits / quantidade * math.log(2)))
+        return cls(bits, hashes)
+
+    def _posicoes(self, chave):
+        # Hash duplo: duas metades de um blake2b geram as 'hashes' posições
+        resumo = hashlib.blake2b(chave.encode(), digest_size=16).digest()
+        h1, h2 = struct.unpack('<QQ', resumo)
+        return ((h1 + i * h2) % self.bits for i in range(self.hashes))
+
+    def adicionar(self, chave):
+        for posicao in self._posicoes(chave):
+            self.dados[posicao >> 3] |= 1 << (posicao & 7)
+        self.itens += 1
+
+    def __contains__(self, chave):
+        return all(self.dados[posicao >> 3] & (1 << (posicao & 7)) for posicao in self._posicoes(chave))
+
+    def tamanho_bytes(self):
+        return len(self.dados)
+
+    def gravar(self, caminho):
+        # Grava num arquivo temporário e troca, para os workers nunca lerem um arquivo pela metade
+        temporario = f'{caminho}.tmp'
+        with open(temporario, 'wb') as f:
+            f.write(CABECALHO.pack(IDENTIFICADOR, self.geracao, self.bits, self.hashes, self.itens))
+            f.write(self.dados)
+        os.replace(temporario, caminho)
+
+    @classmethod
+    def ler(cls, caminho):
+        with open(caminho, 'rb') as f:
+            identificador, geracao, bits, hashes, itens = CABECALHO.unpack(f.read(CABECALHO.size))
+            if identificador != IDENTIFICADOR:
+                raise ValueError(f'{caminho} não é um filtro de processos.')
+            return cls(bits, hashes, bytearray(f.read()), itens, geracao)
+
+
+def construir_filtro(taxa_falso_positivo=None):
+    """Gera o filtro com todos os números e chaves de número antigo do banco."""
+    taxa = taxa_falso_positivo or getattr(settings, 'FILTRO_PROCESSOS_TAXA_FP', 0.01)
+    processos = ProcessoPermanente.objects.values_list('numero', 'chave_legado')
+    # Cada processo entra com o número e, quando tiver, a chave de número antigo
+    filtro = FiltroBloom.para(2 * processos.count(), taxa)
+    for numero, chave in processos.iterator(chunk_size=5000):
+        filtro.adicionar(numero)
+        if chave:
+            filtro.adicionar(PREFIXO_LEGADO + chave)
+    return filtro
+
+
+def reconstruir_filtro():
+    """Muda a geração dos números, gera o filtro de novo e grava em disco."""
+    # A geração muda antes de ler o banco: um número salvo durante a leitura desliga o filtro
+    novos_numeros()
+    caminho = getattr(settings, 'FILTRO_PROCESSOS_ARQUIVO', None)
+    if not caminho:
+        return None
+    geracao = obter_geracao(CHAVE_GERACAO_NUMEROS)
+    filtro = construir_filtro()
+    filtro.geracao = geracao
+    filtro.gravar(caminho)
+    return filtro
+
+
+_carregado = {'filtro': None, 'mtime': None}
+_geracao = {'valor': None, 'verificada_em': 0.0}
+_lock = threading.Lock()
+
+
+def _geracao_numeros():
+    """A geração dos números, lida do banco no máximo uma vez por INTERVALO_VERIFICACAO."""
+    agora = time.monotonic()
+    with _lock:
+        if _geracao['valor'] is not None and agora - _geracao['verificada_em'] < INTERVALO_VERIFICACAO:
+            return _geracao['valor']
+    valor = obter_geracao(CHAVE_GERACAO_NUMEROS)
+    with _lock:
+        _geracao.update(valor=valor, verificada_em=agora)
+    return valor
+
+
+@ao_mudar_geracao
+def _esquecer_geracao():
+    # Este processo mudou uma geração: a próxima consulta confere no banco
+    with _lock:
+        _geracao['valor'] = None
+
+
+def filtro_atual():
+    """
+    O filtro gravado em disco, se existir e ainda valer para a geração atual.
+    Relê o arquivo quando ele muda. Retorna None se não houver filtro válido.
+    """
+    caminho = getattr(settings, 'FILTRO_PROCESSOS_ARQUIVO', None)
+    if not caminho:
+        return None
+    try:
+        mtime = os.stat(caminho).st_mtime_ns
+    except OSError:
+        return None
+
+    with _lock:
+        if _carregado['mtime'] != mtime:
+            try:
+                _carregado['filtro'] = FiltroBloom.ler(caminho)
+            except (OSError, ValueError, struct.error):
+                _carregado['filtro'] = None
+            _carregado['mtime'] = mtime
+        filtro = _carregado['filtro']
+
+    if filtro is None or filtro.geracao != _geracao_numeros():
+        return None
+    return filtro
@@ -0,0 +1,72 @@
+"""
+Geração dos dados de processos.
+
+Um contador guardado no banco (modelo Geracao), que aumenta sempre que a
+tabela de processos muda (importação ou save()). Os caches que dependem
+desses dados usam a geração na chave ou comparam com ela para saber quando
+descartar o que guardaram. No banco (e não no cache do Django) o contador
+não some quando o cache descarta entradas, e dois processos que mudam a
+geração ao mesmo tempo contam as duas mudanças.
+
+Há uma segunda geração, só dos números (CHAVE_GERACAO_NUMEROS), que muda
+apenas quando entram números novos. É ela que o filtro de números usa.
+"""
+import time
+from django.db.models import F
+
+CHAVE_GERACAO = 'processos'
+CHAVE_GERACAO_NUMEROS = 'numeros'
+
+# Funções chamadas (neste processo) quando a geração muda
+_ouvintes = []
+
+
+def ao_mudar_geracao(funcao):
+    """Registra uma função para ser chamada logo que este processo mudar a geração."""
+    _ouvintes.append(funcao)
+    return funcao
+
+
+def _geracoes():
+    # Importado aqui: core/models.py importa este módulo
+    from .models import Geracao
+    return Geracao.objects
+
+
+def _criar(chave):
+    agora = time.time()
+    # Começa pelo relógio para não repetir a geração de um filtro gravado antes da linha existir
+    geracao, _ = _geracoes().get_or_create(nome=chave, defaults={'valor': int(agora * 1000), 'alterada_em': agora})
+    return geracao
+
+
+def obter_geracao(chave=CHAVE_GERACAO):
+    geracao = _geracoes().filter(nome=chave).values_list('valor', flat=True).first()
+    if geracao is None:
+        geracao = _criar(chave).valor
+    return geracao
+
+
+def nova_geracao(chave=CHAVE_GERACAO):
+    """Marca os dados de processos como alterados. Retorna a nova geração."""
+    if not _geracoes().filter(nome=chave).update(valor=F('valor') + 1, alterada_em=time.time()):
+        # Primeira vez: a linha criada já é uma geração nova
+        _criar(chave)
+    for funcao in _ouvintes:
+        funcao()
+    return obter_geracao(chave)
+
+
+def data_geracao():
+    """Momento (timestamp) da última mudança dos processos."""
+    data = _geracoes().filter(nome=CHAVE_GERACAO).values_list('alterada_em', flat=True).first()
+    if data is None:
+        # Sem registro: considera que mudou agora (nunca responde com dados velhos)
+        data = _criar(CHAVE_GERACAO).alterada_em
+    return data
+
+
+def novos_numeros():
+    """Entraram números novos (ou mudaram): muda as duas gerações."""
+    nova_geracao(CHAVE_GERACAO_NUMEROS)
+    return nova_geracao()
@@ -0,0 +1,140 @@
+"""
+Leitura e normalização das planilhas exportadas (CSV).
+
+Este módulo não depende do Django para poder rodar nos processos
+auxiliares da importação paralela.
+"""
+import csv
+import json
+import unicodedata
+from .numeros import apenas_numeros, chave_numerica
+
+# Campo do modelo -> nomes aceitos para a coluna na planilha
+MAPA_COLUNAS = {
+    'numero': ['Processo', 'Numero', 'Número'],
+    'classe': ['Classe'],
+    'situacao': ['Situacao', 'Situação'],
+    'assunto': ['Assunto'],
+    'orgao_atual': ['Orgao Atual', 'Órgão Atual', 'Orgao_Atual'],
+    'localizador': ['Localizador'],
+    # A segunda coluna 'SITUAÇÃO' da tabela original vem renomeada
+    'situacao_detalhe': ['Situacao Detalhe', 'Situação Detalhe', 'Situacao_Detalhe'],
+    'caixa': ['Caixa'],
+}
+
+CAMPOS_IMPORTADOS = [campo for campo in MAPA_COLUNAS if campo != 'numero']
+
+
+def normalizar_cabecalho(nome):
+    """'Órgão  Atual ' -> 'ORGAO ATUAL' (sem acento, maiúsculo, espaços simples)."""
+    sem_acento = unicodedata.normalize('NFKD', nome or '').encode('ascii', 'ignore').decode('ascii')
+    return ' '.join(sem_acento.replace('_', ' ').upper().split())
+
+
+def carregar_mapa(caminho_json=None):
+    """
+    Devolve o mapa de colunas padrão, sobrescrito pelo JSON informado.
+    Formato do JSON: {"caixa": "Nome da Coluna"} ou {"caixa": ["Nome 1", "Nome 2"]}.
+    """
+    mapa = {campo: list(nomes) for campo, nomes in MAPA_COLUNAS.items()}
+    if caminho_json:
+        with open(caminho_json, encoding='utf-8') as f:
+            for campo, nomes in json.load(f).items():
+                if campo not in mapa:
+                    raise ValueError(f'Campo desconhecido no mapa de colunas: {campo}')
+                mapa[campo] = [nomes] if isinstance(nomes, str) else list(nomes)
+    return mapa
+
+
+def localizar_colunas(caminho, cabecalho, mapa):
+    """Campo -> posição da coluna (a primeira que bater com algum nome aceito)."""
+    cabecalho = [normalizar_cabecalho(nome) for nome in cabecalho]
+    posicoes = {}
+    for campo, nomes in mapa.items():
+        aceitos = {normalizar_cabecalho(nome) for nome in nomes}
+        for indice, nome in enumerate(cabecalho):
+            if nome in aceitos:
+                posicoes[campo] = indice
+                break
+
+    if 'numero' not in posicoes:
+        raise ValueError(f'{caminho}: coluna do número do processo não encontrada.')
+    return posicoes
+
+
+def abrir_csv(caminho):
+    # Usamos 'utf-8' pois o arquivo é utf-8 (mesmo que tenha caracteres corrompidos gravados nele)
+    return open(caminho, 'r', encoding='utf-8', errors='replace', newline='')
+
+
+def verificar_cabecalho(caminho, mapa, delimitador=','):
+    """Lê só o cabeçalho e levanta ValueError se faltar a coluna do número."""
+    with abrir_csv(caminho) as f:
+        localizar_colunas(caminho, next(csv.reader(f, delimiter=delimitador), []), mapa)
+
+
+def ler_linhas(caminho, mapa, delimitador=','):
+    """
+    Gera um dicionário {campo: valor} por linha do CSV, já normalizado.
+    Linhas sem número de processo são ignoradas.
+    """
+    with abrir_csv(caminho) as f:
+        reader = csv.reader(f, delimiter=delimitador)
+        posicoes = localizar_colunas(caminho, next(reader, []), mapa)
+
+        for row in reader:
+            valores = {
+                campo: (row[indice].strip() if indice < len(row) else '')
+                for campo, indice in posicoes.items()
+            }
+            numero = apenas_numeros(valores.pop('numero')) # Remove pontos e traços
+            if not numero:
+                continue
+
+            linha = {campo: valores.get(campo, '') for campo in CAMPOS_IMPORTADOS}
+            linha['numero'] = numero
+            yield linha
+
+
+def procurar_repetidos(caminhos, mapa, delimitador=','):
+    """
+    Lê só os números dos arquivos e devolve as linhas que repetem um número ou a
+    chave numérica de outra (os dois são únicos no banco), como textos
+    'arquivo: número repete arquivo: número'.
+    """
+    vistos = {}  # número (texto) ou chave (inteiro) -> (arquivo, número)
+    repetidos = []
+    for caminho in caminhos:
+        for linha in ler_linhas(caminho, mapa, delimitador):
+            numero = linha['numero']
+            for valor in (numero, chave_numerica(numero)):
+                if valor is None:
+                    continue
+                anterior = vistos.get(valor)
+                if anterior is not None:
+                    repetidos.append(f'{caminho}: {numero} repete {anterior[0]}: {anterior[1]}')
+                    break
+                vistos[valor] = (caminho, numero)
+    return repetidos
+
+
+def ler_arquivo(caminho, mapa, delimitador, fila, tamanho_lote, parar=None):
+    """
+    Usado pelos processos auxiliares da importação paralela: põe as linhas do
+    arquivo na fila em lotes de 'tamanho_lote' e, no final, (caminho, None).
+    A fila é limitada, então o arquivo nunca fica inteiro na memória.
+    'parar' (um Event) interrompe a leitura quando quem consome a fila desiste.
+    """
+    lote = []
+    try:
+        for linha in ler_linhas(caminho, mapa, delimitador):
+            if parar is not None and parar.is_set():
+                return
+            lote.append(linha)
+            if len(lote) >= tamanho_lote:
+                fila.put((caminho, lote))
+                lote = []
+        if lote:
+            fila.put((caminho, lote))
+    finally:
+        fila.put((caminho, None))
@@ -0,0 +1,102 @@
+import os
+import random
+import sqlite3
+import tempfile
+import time
+from django.core.management.base import BaseCommand
+from core.busca import em_blocos
+from core.dados_sinteticos import gerar_processos, numeros_consulta
+from core.numeros import apenas_numeros, chave_numerica
+
+# Como o número é procurado em cada variante: coluna indexada e conversão do número digitado
+VARIANTES = {
+    'texto': ('numero', lambda numero: numero),
+    'inteiro': ('chave', chave_numerica),
+}
+
+
+class Command(BaseCommand):
+    help = ('Compara o índice do número como texto com o índice da chave numérica (BigInteger): '
+            'tamanho do índice e tempo das buscas exatas, uma a uma e em lote')
+
+    def add_arguments(self, parser):
+        parser.add_argument('--processos', type=int, default=1_000_000, help='Processos sintéticos no banco')
+        parser.add_argument('--consultas', type=int, default=20_000, help='Números consultados em cada medição')
+        parser.add_argument('--repeticoes', type=int, default=3, help='Medições de cada variante (vale a melhor)')
+
+    def handle(self, *args, **options):
+        self.stdout.write(f'Gerando {options["processos"]} processos...')
+        numeros = [processo['numero'] for processo in gerar_processos(options['processos'])]
+        consultas = [apenas_numeros(numero) for numero in numeros_consulta(numeros, options['consultas'], random.Random(7))]
+        # Os números antigos (10 dígitos) não têm chave numérica e seguem pela chave legado nas duas variantes
+        consultas = [numero for numero in consultas if chave_numerica(numero) is not None]
+
+        resultados = {}
+        with tempfile.TemporaryDirectory() as diretorio:
+            for variante, (coluna, converter) in VARIANTES.items():
+                caminho = os.path.join(diretorio, f'{variante}.sqlite3')
+                tamanho_indice = self.preparar(caminho, coluna, numeros)
+                conexao = sqlite3.connect(caminho)
+                valores = [converter(numero) for numero in consultas]
+                unitaria = min(self.medir_unitaria(conexao, coluna, valores) for _ in range(options['repeticoes']))
+                lote = min(self.medir_lote(conexao, coluna, valores) for _ in range(options['repeticoes']))
+                encontrados = self.contar_encontrados(conexao, coluna, valores)
+                conexao.close()
+                resultados[variante] = (tamanho_indice, unitaria, lote, encontrados)
+
+        self.relatar(resultados, len(consultas))
+
+    def preparar(self, caminho, coluna, numeros):
+        """Cria a tabela, mede o arquivo antes e depois do índice e devolve o tamanho do índice em bytes."""
+        conexao = sqlite3.connect(caminho)
+        conexao.execute('CREATE TABLE processo (id INTEGER PRIMARY KEY, numero TEXT NOT NULL, chave INTEGER)')
+        conexao.executemany(
+            'INSERT INTO processo (numero, chave) VALUES (?, ?)',
+            ((numero, chave_numerica(numero)) for numero in numeros),
+        )
+        conexao.commit()
+        antes = os.path.getsize(caminho)
+        conexao.execute(f'CREATE UNIQUE INDEX processo_{coluna} ON processo ({coluna})')
+        conexao.commit()
+        conexao.close()
+        return os.path.getsize(caminho) - antes
+
+    def medir_unitaria(self, conexao, coluna, valores):
+        """Segundos para buscar os números um a um (como a conferência por WebSocket)."""
+        sql = f'SELECT id FROM processo WHERE {coluna} = ?'
+        inicio = time.perf_counter()
+        for valor in valores:
+            conexao.execute(sql, (valor,)).fetchall()
+        return time.perf_counter() - inicio
+
+    def medir_lote(self, conexao, coluna, valores):
+        """Segundos para buscar os números em blocos de IN (como buscar_processos_em_lote)."""
+        inicio = time.perf_counter()
+        for bloco in em_blocos(valores):
+            marcadores = ', '.join('?' * len(bloco))
+            conexao.execute(f'SELECT id FROM processo WHERE {coluna} IN ({marcadores})', bloco).fetchall()
+        return time.perf_counter() - inicio
+
+    def contar_encontrados(self, conexao, coluna, valores):
+        # As duas variantes precisam achar exatamente os mesmos processos
+        return sum(
+            conexao.execute(f'SELECT COUNT(*) FROM processo WHERE {coluna} = ?', (valor,)).fetchone()[0]
+            for valor in valores
+        )
+
+    def relatar(self, resultados, quantidade):
+        self.stdout.write(self.style.MIGRATE_HEADING(f'{quantidade} números consultados'))
+        for variante, (tamanho_indice, unitaria, lote, encontrados) in resultados.items():
+            self.stdout.write(
+                f'  {variante:8s} índice {tamanho_indice / 2 ** 20:8.1f} MiB | '
+                f'uma a uma {unitaria / quantidade * 1e6:7.2f} µs/número | '
+                f'em lote {lote / quantidade * 1e6:7.2f} µs/número | encontrados {encontrados}'
+            )
+
+        texto, inteiro = resultados['texto'], resultados['inteiro']
+        if texto[3] != inteiro[3]:
+            self.stdout.write(self.style.ERROR('  As variantes encontraram quantidades diferentes!'))
+        self.stdout.write(self.style.SUCCESS(
+            f'  Chave numérica: índice {texto[0] / max(inteiro[0], 1):.2f}x menor, '
+            f'{texto[1] / inteiro[1]:.2f}x na busca unitária, {texto[2] / inteiro[2]:.2f}x em lote'
+        ))
@@ -0,0 +1,197 @@
+import logging
+import os
+import random
+import secrets
+import statistics
+import tempfile
+import threading
+import time
+from io import BytesIO, StringIO
+from urllib.parse import urlencode
+from django.conf import settings
+from django.contrib.auth.models import User
+from django.core.handlers.wsgi import WSGIHandler
+from django.core.management import call_command
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection, connections
+from django.db.backends.signals import connection_created
+from django.test import Client, override_settings
+from core.dados_sinteticos import escrever_csv, gerar_processos
+from core.models import ItemProcesso, Listagem, ProcessoPermanente
+from .benchmark_endpoints import CACHE_MEMORIA, banco_de_teste
+
+# Tempo de reaproveitamento das conexões comparado: uma por requisição e o do settings
+IDADES_CONEXAO = (0, 600)
+
+
+def perfis():
+    """OPTIONS do banco em cada perfil. O 'padrao' volta o arquivo para o journal padrão (sem WAL)."""
+    return {
+        'padrao': {'init_command': 'PRAGMA journal_mode=DELETE'},
+        'otimizado': dict(settings.SQLITE_OPCOES),
+    }
+
+
+class Command(BaseCommand):
+    help = ('Compara o SQLite padrão com o perfil otimizado (WAL), cada um com CONN_MAX_AGE 0 e 600: '
+            'leitores abrindo o detalhe_listagem em paralelo enquanto um escritor adiciona números '
+            'pelo mesmo detalhe_listagem, pelo handler WSGI (num banco de teste, não toca no banco real)')
+
+    def add_arguments(self, parser):
+        parser.add_argument('--processos', type=int, default=20_000, help='Processos sintéticos importados')
+        parser.add_argument('--itens', type=int, default=100, help='Itens da listagem aberta pelos leitores')
+        parser.add_argument('--leitores', type=int, default=8, help='Threads abrindo a listagem')
+        parser.add_argument('--segundos', type=float, default=5.0, help='Duração de cada combinação')
+        parser.add_argument('--pausa-escrita', type=float, default=0.005,
+                            help='Pausa (s) entre os números adicionados pelo escritor')
+
+    def handle(self, *args, **options):
+        if connection.vendor != 'sqlite':
+            raise CommandError(f'O banco ({connection.vendor}) não é SQLite: não há perfis para comparar.')
+
+        with tempfile.TemporaryDirectory() as diretorio:
+            # Banco de teste em arquivo (o padrão do SQLite em teste é na memória, sem WAL)
+            connection.settings_dict.setdefault('TEST', {})['NAME'] = os.path.join(diretorio, 'benchmark.sqlite3')
+            with banco_de_teste(), override_settings(
+                CACHES=CACHE_MEMORIA, FILTRO_PROCESSOS_ARQUIVO=os.path.join(diretorio, 'filtro.bin'),
+            ):
+                self.preparar(diretorio, options)
+                banco = connection.settings_dict
+                opcoes_originais, idade_original = banco.get('OPTIONS', {}), banco['CONN_MAX_AGE']
+                try:
+                    for perfil, opcoes in perfis().items():
+                        for idade in IDADES_CONEXAO:
+                            # Valem para as conexões novas, abertas pelas threads de cada medição
+                            connections.close_all()
+                            banco['OPTIONS'], banco['CONN_MAX_AGE'] = opcoes, idade
+                            self.relatar(perfil, idade, self.medir(options), options['segundos'])
+                finally:
+                    connections.close_all()
+                    banco['OPTIONS'], banco['CONN_MAX_AGE'] = opcoes_originais, idade_original
+
+    def preparar(self, diretorio, options):
+        caminho = os.path.join(diretorio, 'processos.csv')
+        escrever_csv(caminho, gerar_processos(options['processos']))
+        self.stdout.write(f'Importando {options["processos"]} processos...')
+        call_command('importar_dados', caminho, '--noinput', stdout=StringIO())
+
+        usuario = User.objects.create_user('benchmark', password='benchmark')
+        self.leitura = Listagem.objects.create(titulo='Leitura', criador=usuario)
+        self.escrita = Listagem.objects.create(titulo='Escrita', criador=usuario)
+        ItemProcesso.objects.bulk_create(
+            ItemProcesso(listagem=self.leitura, numero_digitado=f'{i:015d}') for i in range(options['itens'])
+        )
+        self.existentes = list(ProcessoPermanente.objects.values_list('numero', flat=True))
+
+        # Sessão e token CSRF de um navegador logado, mandados como cookies em cada requisição
+        cliente = Client()
+        cliente.force_login(usuario)
+        self.csrf = secrets.token_hex(16)
+        self.cookie = f'sessionid={cliente.cookies[settings.SESSION_COOKIE_NAME].value}; csrftoken={self.csrf}'
+
+    def requisicao(self, handler, metodo, caminho, dados=None):
+        """Uma requisição pelo handler WSGI, como o waitress faz: o fim dela fecha ou guarda a conexão."""
+        corpo = urlencode(dados or {}).encode()
+        ambiente = {
+            'REQUEST_METHOD': metodo, 'PATH_INFO': caminho, 'QUERY_STRING': '', 'SCRIPT_NAME': '',
+            'SERVER_NAME': 'testserver', 'SERVER_PORT': '80', 'SERVER_PROTOCOL': 'HTTP/1.1',
+            'HTTP_HOST': 'testserver', 'HTTP_COOKIE': self.cookie, 'REMOTE_ADDR': '127.0.0.1',
+            'CONTENT_TYPE': 'application/x-www-form-urlencoded', 'CONTENT_LENGTH': str(len(corpo)),
+            'wsgi.input': BytesIO(corpo), 'wsgi.errors': StringIO(), 'wsgi.url_scheme': 'http',
+            'wsgi.version': (1, 0), 'wsgi.multithread': True, 'wsgi.multiprocess': False, 'wsgi.run_once': False,
+        }
+        situacao = []
+        resposta = handler(ambiente, lambda status, cabecalhos, *_: situacao.append(int(status.split()[0])))
+        try:
+            b''.join(resposta)
+        finally:
+            # request_finished -> close_old_connections (CONN_MAX_AGE)
+            resposta.close()
+        return situacao[0]
+
+    def medir(self, options):
+        handler = WSGIHandler()
+        parar = threading.Event()
+        lock = threading.Lock()
+        latencias, escritas, erros = [], [], []
+        conexoes = [0]
+
+        def conectou(sender, **kwargs):
+            with lock:
+                conexoes[0] += 1
+
+        def registrar_erro(texto):
+            with lock:
+                erros.append(texto)
+
+        def leitor():
+            caminho = f'/listagem/{self.leitura.pk}/'
+            minhas = []
+            try:
+                while not parar.is_set():
+                    inicio = time.perf_counter()
+                    situacao = self.requisicao(handler, 'GET', caminho)
+                    if situacao != 200:
+                        registrar_erro(f'GET {caminho}: {situacao}')
+                        continue
+                    minhas.append(time.perf_counter() - inicio)
+            finally:
+                connections.close_all()
+                with lock:
+                    latencias.extend(minhas)
+
+        def escritor():
+            # O envio do formulário do detalhe_listagem: marca um processo da base ou cria um item
+            aleatorio = random.Random(0)
+            caminho = f'/listagem/{self.escrita.pk}/'
+            sequencia = 0
+            try:
+                while not parar.is_set():
+                    sequencia += 1
+                    numero = aleatorio.choice(self.existentes) if sequencia % 2 else f'{aleatorio.randrange(10 ** 15):015d}'
+                    inicio = time.perf_counter()
+                    situacao = self.requisicao(handler, 'POST', caminho, {
+                        'csrfmiddlewaretoken': self.csrf, 'submit_adicionar': '1', 'numero_processo': numero,
+                    })
+                    if situacao != 302:
+                        registrar_erro(f'POST {caminho}: {situacao}')
+                    else:
+                        escritas.append(time.perf_counter() - inicio)
+                    time.sleep(options['pausa_escrita'])
+            finally:
+                connections.close_all()
+
+        threads = [threading.Thread(target=leitor) for _ in range(options['leitores'])]
+        threads.append(threading.Thread(target=escritor))
+        # Um "database is locked" vira resposta 500: conta como erro sem imprimir o traceback
+        log_requisicoes = logging.getLogger('django.request')
+        nivel = log_requisicoes.level
+        log_requisicoes.setLevel(logging.CRITICAL)
+        connection_created.connect(conectou)
+        try:
+            for thread in threads:
+                thread.start()
+            time.sleep(options['segundos'])
+            parar.set()
+            for thread in threads:
+                thread.join()
+        finally:
+            connection_created.disconnect(conectou)
+            log_requisicoes.setLevel(nivel)
+        return latencias, escritas, erros, conexoes[0]
+
+    def relatar(self, perfil, idade, resultado, segundos):
+        latencias, escritas, erros, conexoes = resultado
+
+        def percentis(valores):
+            if len(valores) < 2:
+                return '-'
+            cortes = statistics.quantiles(valores, n=100)
+            return f'p50 {cortes[49] * 1000:.2f} ms, p99 {cortes[98] * 1000:.2f} ms, máx {max(valores) * 1000:.2f} ms'
+
+        self.stdout.write(self.style.MIGRATE_HEADING(f'Perfil {perfil}, CONN_MAX_AGE={idade}'))
+        self.stdout.write(f'  Leituras: {len(latencias) / segundos:10.0f}/s  ({percentis(latencias)})')
+        self.stdout.write(f'  Escritas: {len(escritas) / segundos:10.0f}/s  ({percentis(escritas)})')
+        self.stdout.write(f'  Conexões: {conexoes:10d}')
+        estilo = self.style.ERROR if erros else self.style.SUCCESS
+        self.stdout.write(estilo(f'  Erros:    {len(erros):10d}' + (f'  (ex.: {erros[0]})' if erros else '')))
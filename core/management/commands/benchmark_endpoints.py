@@ -0,0 +1,168 @@
+import json
+import os
+import random
+import statistics
+import tempfile
+import time
+from contextlib import contextmanager
+from datetime import datetime, timezone
+from io import StringIO
+from django.contrib.auth.models import User
+from django.core.management import call_command
+from django.core.management.base import BaseCommand
+from django.db import connection
+from django.test import Client, override_settings
+from django.test.utils import CaptureQueriesContext, setup_test_environment, teardown_test_environment
+from core.cache_processos import obter_cache
+from core.context_processors import versao_do_git
+from core.dados_sinteticos import escrever_csv, gerar_processos, numeros_consulta
+from core.models import ProcessoPermanente
+
+CACHE_MEMORIA = {
+    'default': {'BACKEND': 'django.core.cache.backends.locmem.LocMemCache'},
+    'processos': {'BACKEND': 'django.core.cache.backends.locmem.LocMemCache', 'LOCATION': 'processos'},
+}
+
+
+@contextmanager
+def banco_de_teste():
+    """Cria um banco de teste vazio (como o 'manage.py test') e apaga no final."""
+    setup_test_environment()
+    nome_original = connection.settings_dict['NAME']
+    connection.creation.create_test_db(verbosity=0, autoclobber=True, serialize=False)
+    try:
+        yield
+    finally:
+        connection.creation.destroy_test_db(nome_original, verbosity=0)
+        teardown_test_environment()
+
+
+def resumir_medidas(latencias, consultas, duracao):
+    cortes = statistics.quantiles(latencias, n=100) if len(latencias) > 1 else latencias * 99
+    return {
+        'repeticoes': len(latencias),
+        'por_segundo': round(len(latencias) / duracao, 1) if duracao else None,
+        'latencia_ms': {
+            'media': round(statistics.fmean(latencias) * 1000, 3),
+            'p50': round(cortes[49] * 1000, 3),
+            'p95': round(cortes[94] * 1000, 3),
+            'p99': round(cortes[98] * 1000, 3),
+            'max': round(max(latencias) * 1000, 3),
+        },
+        'consultas': {'media': round(statistics.fmean(consultas), 2), 'max': max(consultas)},
+    }
+
+
+class Command(BaseCommand):
+    help = ('Mede latência, vazão e consultas ao banco dos endpoints mais usados, com dados sintéticos '
+            'num banco de teste (não toca no banco real). Grava um relatório JSON para comparar commits.')
+
+    def add_arguments(self, parser):
+        parser.add_argument('--processos', type=int, default=50_000, help='Processos sintéticos importados')
+        parser.add_argument('--caixas', type=int, default=300, help='Quantidade de caixas')
+        parser.add_argument('--repeticoes', type=int, default=50, help='Requisições por endpoint')
+        parser.add_argument('--lote', type=int, default=200, help='Números por verificação em lote')
+        parser.add_argument('--itens-listagem', type=int, default=50, help='Números por listagem criada')
+        parser.add_argument('--semente', type=int, default=42)
+        parser.add_argument('--saida', type=str, default='benchmark.json', help='Arquivo do relatório JSON ("-" = só na tela)')
+
+    def handle(self, *args, **options):
+        self.aleatorio = random.Random(options['semente'])
+
+        with banco_de_teste(), tempfile.TemporaryDirectory() as diretorio, override_settings(
+            CACHES=CACHE_MEMORIA,
+            FILTRO_PROCESSOS_ARQUIVO=os.path.join(diretorio, 'filtro.bin'),
+        ):
+            resultados = {'importar_dados': self.medir_importacao(diretorio, options)}
+
+            self.existentes = list(ProcessoPermanente.objects.values_list('numero', flat=True))
+            self.caixas = list(ProcessoPermanente.objects.values_list('caixa', flat=True))
+            self.cliente = Client()
+            self.cliente.force_login(User.objects.create_user('benchmark', password='benchmark'))
+
+            cenarios = {
+                'checar_processo_individual': self.checar_processo_individual,
+                'verificar_lote': self.verificar_lote,
+                'get_processos_caixa': self.get_processos_caixa,
+                'criar_listagem': self.criar_listagem,
+            }
+            for nome, requisicao in cenarios.items():
+                # Cada endpoint começa com o cache de consultas vazio
+                obter_cache().limpar()
+                resultados[nome] = self.medir(requisicao, options)
+
+        relatorio = {
+            'versao': versao_do_git(),
+            'data': datetime.now(timezone.utc).isoformat(timespec='seconds'),
+            'banco': connection.vendor,
+            'parametros': {chave: options[chave] for chave in
+                           ('processos', 'caixas', 'repeticoes', 'lote', 'itens_listagem', 'semente')},
+            'resultados': resultados,
+        }
+        self.mostrar(resultados)
+        if options['saida'] == '-':
+            self.stdout.write(json.dumps(relatorio, indent=2, ensure_ascii=False))
+        else:
+            with open(options['saida'], 'w', encoding='utf-8') as arquivo:
+                json.dump(relatorio, arquivo, indent=2, ensure_ascii=False)
+            self.stdout.write(self.style.SUCCESS(f'Relatório gravado em {options["saida"]}'))
+
+    def medir_importacao(self, diretorio, options):
+        caminho = os.path.join(diretorio, 'processos.csv')
+        escrever_csv(caminho, gerar_processos(options['processos'], options['caixas'], options['semente']))
+
+        inicio = time.perf_counter()
+        with CaptureQueriesContext(connection) as consultas:
+            call_command('importar_dados', caminho, '--noinput', stdout=StringIO())
+        duracao = time.perf_counter() - inicio
+        return {
+            'linhas': options['processos'],
+            'segundos': round(duracao, 3),
+            'linhas_por_segundo': round(options['processos'] / duracao, 1),
+            'consultas': len(consultas),
+        }
+
+    def medir(self, requisicao, options):
+        latencias, consultas = [], []
+        inicio_total = time.perf_counter()
+        for _ in range(options['repeticoes']):
+            inicio = time.perf_counter()
+            with CaptureQueriesContext(connection) as capturadas:
+                resposta = requisicao(options)
+                # Consome respostas em streaming dentro da medição
+                if resposta.streaming:
+                    b''.join(resposta.streaming_content)
+            latencias.append(time.perf_counter() - inicio)
+            consultas.append(len(capturadas))
+            if resposta.status_code >= 400:
+                raise RuntimeError(f'{resposta.request["PATH_INFO"]} respondeu {resposta.status_code}')
+        return resumir_medidas(latencias, consultas, time.perf_counter() - inicio_total)
+
+    def checar_processo_individual(self, options):
+        numero = numeros_consulta(self.existentes, 1, self.aleatorio)[0]
+        return self.cliente.get('/ajax/checar-processo/', {'numero': numero})
+
+    def verificar_lote(self, options):
+        numeros = numeros_consulta(self.existentes, options['lote'], self.aleatorio)
+        return self.cliente.post('/verificar-em-lote/', {'lista_processos': '\n'.join(numeros)})
+
+    def get_processos_caixa(self, options):
+        # Sorteia um processo e usa a caixa dele: caixas cheias aparecem mais, como no balcão
+        return self.cliente.get('/ajax/get-processos/', {'caixa': self.aleatorio.choice(self.caixas)})
+
+    def criar_listagem(self, options):
+        numeros = [self.aleatorio.choice(self.existentes) if self.aleatorio.random() < 0.3
+                   else f'{self.aleatorio.randrange(10 ** 15):015d}' for _ in range(options['itens_listagem'])]
+        return self.cliente.post('/listagem/nova/', {'titulo': 'Benchmark', 'processos': numeros})
+
+    def mostrar(self, resultados):
+        importacao = resultados['importar_dados']
+        self.stdout.write(f'{"importar_dados":<28} {importacao["linhas_por_segundo"]:>10.0f} linhas/s  '
+                          f'{importacao["segundos"]:.2f} s  {importacao["consultas"]} consultas')
+        for nome, medidas in resultados.items():
+            if nome == 'importar_dados':
+                continue
+            latencia = medidas['latencia_ms']
+            self.stdout.write(f'{nome:<28} {medidas["por_segundo"]:>10.1f} req/s  '
+                              f'p50 {latencia["p50"]:.2f} ms  p95 {latencia["p95"]:.2f} ms  '
+                              f'{medidas["consultas"]["media"]:.1f} consultas (máx {medidas["consultas"]["max"]})')
@@ -0,0 +1,55 @@
+import random
+import time
+from django.core.management.base import BaseCommand
+from core.filtro import FiltroBloom, PREFIXO_LEGADO, construir_filtro
+from core.models import ProcessoPermanente
+
+
+class Command(BaseCommand):
+    help = 'Mede a taxa de falso positivo, o tamanho e a velocidade do filtro de números'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--quantidade', type=int, default=1_000_000, help='Números sintéticos no filtro')
+        parser.add_argument('--consultas', type=int, default=200_000, help='Números inexistentes consultados')
+        parser.add_argument('--taxa', type=float, default=0.01, help='Taxa de falso positivo desejada')
+        parser.add_argument('--banco', action='store_true', help='Usa os processos do banco em vez de números sintéticos')
+
+    def handle(self, *args, **options):
+        aleatorio = random.Random(42)
+        inicio = time.perf_counter()
+
+        if options['banco']:
+            existentes = set(ProcessoPermanente.objects.values_list('numero', flat=True))
+            filtro = construir_filtro(options['taxa'])
+        else:
+            existentes = set()
+            while len(existentes) < options['quantidade']:
+                existentes.add(f'{aleatorio.randrange(10 ** 15):015d}')
+            filtro = FiltroBloom.para(2 * len(existentes), options['taxa'])
+            for numero in existentes:
+                filtro.adicionar(numero)
+                filtro.adicionar(PREFIXO_LEGADO + numero[:4] + numero[-6:-1])
+
+        construcao = time.perf_counter() - inicio
+
+        # Consulta números que com certeza não estão no banco
+        consultas = []
+        while len(consultas) < options['consultas']:
+            numero = f'{aleatorio.randrange(10 ** 15):015d}'
+            if numero not in existentes:
+                consultas.append(numero)
+
+        inicio = time.perf_counter()
+        falsos_positivos = sum(1 for numero in consultas if numero in filtro)
+        consulta = (time.perf_counter() - inicio) / len(consultas)
+
+        self.stdout.write(f'Chaves no filtro:       {filtro.itens}')
+        self.stdout.write(f'Bits / funções de hash: {filtro.bits} / {filtro.hashes}')
+        self.stdout.write(f'Memória:                {filtro.tamanho_bytes() / 1024 / 1024:.2f} MiB '
+                          f'({filtro.tamanho_bytes() * 8 / max(filtro.itens, 1):.1f} bits por chave)')
+        self.stdout.write(f'Construção:             {construcao:.2f} s')
+        self.stdout.write(f'Consulta:               {consulta * 1e6:.2f} µs por número')
+        self.stdout.write(self.style.SUCCESS(
+            f'Falsos positivos:       {falsos_positivos}/{len(consultas)} '
+            f'({falsos_positivos / len(consultas):.3%}, desejado {options["taxa"]:.2%})'
+        ))
@@ -0,0 +1,59 @@
+import os
+import tempfile
+import time
+from io import StringIO
+from django.core.management import call_command
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection
+from core.dados_sinteticos import escrever_csv, gerar_processos
+from core.pesquisa import fts_disponivel, pesquisar_processos
+from .benchmark_endpoints import banco_de_teste
+
+# (texto, filtros): palavras comuns, raras, prefixos e com filtro de caixa/situação
+PESQUISAS = [
+    ('previdenciaria', {}),
+    ('imposto renda', {}),
+    ('execucao fiscal', {}),
+    ('auxilio doenca revis', {}),
+    ('contribu', {}),
+    ('arquivo', {'situacao': 'Baixado'}),
+    ('fgts', {'caixa': '0001'}),
+]
+
+
+class Command(BaseCommand):
+    help = ('Compara a pesquisa por conteúdo com o índice FTS5 e com icontains (LIKE), '
+            'com dados sintéticos num banco de teste (não toca no banco real)')
+
+    def add_arguments(self, parser):
+        parser.add_argument('--processos', type=int, default=200_000, help='Processos sintéticos importados')
+        parser.add_argument('--repeticoes', type=int, default=5, help='Medições de cada pesquisa (vale a melhor)')
+        parser.add_argument('--limite', type=int, default=50, help='Resultados por pesquisa')
+
+    def handle(self, *args, **options):
+        with banco_de_teste(), tempfile.TemporaryDirectory() as diretorio:
+            if not fts_disponivel():
+                raise CommandError(f'O banco ({connection.vendor}) não tem FTS5: só há o modo icontains.')
+
+            caminho = os.path.join(diretorio, 'processos.csv')
+            escrever_csv(caminho, gerar_processos(options['processos']))
+            self.stdout.write(f'Importando {options["processos"]} processos...')
+            inicio = time.perf_counter()
+            call_command('importar_dados', caminho, '--noinput', stdout=StringIO())
+            self.stdout.write(f'Importação (com reconstrução do índice): {time.perf_counter() - inicio:.2f} s')
+
+            self.stdout.write(f'{"pesquisa":<36} {"fts (ms)":>10} {"icontains (ms)":>15} {"ganho":>8}  resultados')
+            for texto, filtros in PESQUISAS:
+                tempos, quantidades = {}, {}
+                for modo in ('fts', 'icontains'):
+                    tempos[modo] = min(self.medir(texto, filtros, modo, options) for _ in range(options['repeticoes']))
+                    quantidades[modo] = len(pesquisar_processos(texto, limite=options['limite'], modo=modo, **filtros)[0])
+                rotulo = ' '.join([texto] + [f'{campo}={valor}' for campo, valor in filtros.items()])
+                self.stdout.write(f'{rotulo:<36} {tempos["fts"] * 1000:>10.2f} {tempos["icontains"] * 1000:>15.2f} '
+                                  f'{tempos["icontains"] / tempos["fts"]:>7.1f}x  '
+                                  f'{quantidades["fts"]} / {quantidades["icontains"]}')
+
+    def medir(self, texto, filtros, modo, options):
+        inicio = time.perf_counter()
+        pesquisar_processos(texto, limite=options['limite'], modo=modo, **filtros)
+        return time.perf_counter() - inicio
@@ -0,0 +1,38 @@
+import time
+from django.core.management.base import BaseCommand
+from django.template import engines
+from django.test import RequestFactory
+from core import context_processors
+
+TEMPLATE = '{{ versao_sistema }}'
+
+
+class Command(BaseCommand):
+    help = 'Mede o custo por requisição do context processor de versão (git a cada página x cache)'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--repeticoes', type=int, default=200)
+
+    def handle(self, *args, **options):
+        repeticoes = options['repeticoes']
+        template = engines['django'].from_string(TEMPLATE)
+        request = RequestFactory().get('/')
+
+        def versao_por_requisicao(request):
+            # Comportamento antigo: um 'git rev-parse' a cada template renderizado
+            return {'versao_sistema': context_processors.versao_do_git() or 'Local/Dev'}
+
+        antes = self.medir(template, request, versao_por_requisicao, repeticoes)
+        context_processors.obter_versao.cache_clear()
+        depois = self.medir(template, request, context_processors.versao_sistema, repeticoes)
+
+        self.stdout.write(f'Antes (git por requisição): {antes * 1000:.3f} ms/render')
+        self.stdout.write(f'Depois (versão em cache):   {depois * 1000:.3f} ms/render')
+        if depois:
+            self.stdout.write(self.style.SUCCESS(f'{antes / depois:.0f}x mais rápido'))
+
+    def medir(self, template, request, processador, repeticoes):
+        inicio = time.perf_counter()
+        for _ in range(repeticoes):
+            template.render(processador(request), request)
+        return (time.perf_counter() - inicio) / repeticoes
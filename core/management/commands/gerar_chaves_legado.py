@@ -0,0 +1,95 @@
+from itertools import islice
+from django.core.management.base import BaseCommand, CommandError
+from core.busca import _resolver_legado, resolver_legado_por_varredura
+from core.filtro import reconstruir_filtro
+from core.models import ProcessoPermanente
+from core.numeros import chave_legado_do_numero
+
+
+class Command(BaseCommand):
+    help = ('Recalcula os campos derivados dos processos já importados: chave de busca de números '
+            'antigos (10 dígitos), situação normalizada, indicador de permanente e partes do número')
+
+    def add_arguments(self, parser):
+        parser.add_argument('--lote', type=int, default=2000, help='Quantidade de registros gravados por vez')
+        parser.add_argument('--verificar', action='store_true', help='Compara a busca nova (chave) com a antiga (varredura)')
+
+    def handle(self, *args, **options):
+        lote = options['lote']
+        atualizados = 0
+        pendentes = []
+
+        campos = list(ProcessoPermanente.CAMPOS_DERIVADOS)
+        atributos = [ProcessoPermanente._meta.get_field(campo).attname for campo in campos]
+
+        def valores(proc):
+            return tuple(getattr(proc, atributo) for atributo in atributos)
+
+        # 1. Recalcula os campos percorrendo a tabela sem carregar tudo na memória
+        processos = ProcessoPermanente.objects.only('id', 'numero', 'situacao', *campos)
+        situacoes = {}
+        for proc in processos.iterator(chunk_size=lote):
+            antes = valores(proc)
+            proc.atualizar_campos_derivados(situacoes)
+            if valores(proc) != antes:
+                pendentes.append(proc)
+
+            if len(pendentes) >= lote:
+                ProcessoPermanente.objects.bulk_update(pendentes, campos)
+                atualizados += len(pendentes)
+                pendentes = []
+
+        if pendentes:
+            ProcessoPermanente.objects.bulk_update(pendentes, campos)
+            atualizados += len(pendentes)
+
+        if atualizados:
+            # As chaves também entram no filtro de números
+            reconstruir_filtro()
+        self.stdout.write(self.style.SUCCESS(f'{atualizados} processos atualizados.'))
+
+        if options['verificar']:
+            self.verificar(lote)
+
+    def verificar(self, lote=2000):
+        """
+        Compara a busca pela chave com a busca antiga, a partir das entradas: todo
+        número antigo (ano + 5 dígitos) que a varredura antiga resolveria, ou seja,
+        o ano de cada processo com cada trecho de 5 dígitos do seu número.
+
+        A chave só acha a sequência na posição dela (os 5 dígitos antes do DV); a
+        varredura achava os 5 dígitos em qualquer lugar depois do ano. Entradas que
+        só a varredura resolve por isso são a diferença esperada e só são contadas.
+        Falha se, com a sequência na posição certa, as duas escolherem processos diferentes.
+        """
+        divergentes, so_na_varredura, verificadas = [], 0, 0
+        numeros = ProcessoPermanente.objects.values_list('numero', flat=True).iterator(chunk_size=lote)
+        while bloco := list(islice(numeros, lote)):
+            chaves = {
+                numero[:4] + numero[inicio:inicio + 5]
+                for numero in bloco if numero and len(numero) == 15
+                for inicio in range(len(numero) - 4)
+            }
+            novos = _resolver_legado(chaves)
+            antigos = resolver_legado_por_varredura(chaves)
+            verificadas += len(chaves)
+
+            for chave in sorted(chaves):
+                novo, antigo = novos.get(chave), antigos.get(chave)
+                if getattr(novo, 'pk', None) == getattr(antigo, 'pk', None):
+                    continue
+                if novo is None and chave_legado_do_numero(antigo.numero) != chave:
+                    # A varredura achou os 5 dígitos fora da posição da sequência
+                    so_na_varredura += 1
+                else:
+                    divergentes.append((chave, novo, antigo))
+
+        for chave, novo, antigo in divergentes[:20]:
+            self.stdout.write(self.style.WARNING(f'{chave}: chave={novo} varredura={antigo}'))
+        if so_na_varredura:
+            self.stdout.write(f'{so_na_varredura} números antigos só a varredura resolve '
+                              '(a sequência aparece fora da posição dela no número).')
+
+        if divergentes:
+            raise CommandError(f'{len(divergentes)} de {verificadas} chaves com resultado diferente.')
+        self.stdout.write(self.style.SUCCESS(f'Verificação OK: {verificadas} chaves com o mesmo resultado.'))
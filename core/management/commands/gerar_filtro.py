@@ -0,0 +1,15 @@
+from django.core.management.base import BaseCommand
+from core.filtro import reconstruir_filtro
+
+
+class Command(BaseCommand):
+    help = 'Gera de novo o filtro de números de processo (normalmente feito pela importação)'
+
+    def handle(self, *args, **options):
+        filtro = reconstruir_filtro()
+        if filtro is None:
+            self.stdout.write(self.style.WARNING('FILTRO_PROCESSOS_ARQUIVO não configurado.'))
+            return
+        self.stdout.write(self.style.SUCCESS(
+            f'Filtro gerado: {filtro.itens} chaves, {filtro.tamanho_bytes() / 1024:.1f} KiB.'
+        ))
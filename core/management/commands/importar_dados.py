@@ -1,63 +1,256 @@
-import csv
-import re
 import os
-from django.core.management.base import BaseCommand
+import queue
+import time
+from concurrent.futures import ProcessPoolExecutor
+from itertools import islice
+from multiprocessing import Manager
+from django.core.management.base import BaseCommand, CommandError
+from django.db import transaction
+from core.busca import em_blocos
+from core.filtro import reconstruir_filtro
+from core.geracao import novos_numeros
+from core.importacao import (CAMPOS_IMPORTADOS, carregar_mapa, ler_arquivo, ler_linhas, procurar_repetidos,
+                             verificar_cabecalho)
 from core.models import ProcessoPermanente
+from core.pesquisa import indice_adiado
+
+# Campos calculados a partir dos importados
+CAMPOS_DERIVADOS = list(ProcessoPermanente.CAMPOS_DERIVADOS)
+# Nome do atributo de cada campo (o da chave estrangeira termina em '_id')
+ATRIBUTOS = {campo: ProcessoPermanente._meta.get_field(campo).attname for campo in CAMPOS_IMPORTADOS + CAMPOS_DERIVADOS}
 
 class Command(BaseCommand):
-    help = 'Importa processos do arquivo dados.csv'
+    help = 'Importa processos de um ou mais arquivos CSV (um por vara/tribunal)'
 
     def add_arguments(self, parser):
-        parser.add_argument('arquivo_csv', type=str, help='Caminho do arquivo CSV')
+        parser.add_argument('arquivos_csv', nargs='+', type=str, help='Caminho dos arquivos CSV')
+        parser.add_argument('--batch-size', type=int, default=5000, help='Quantidade de linhas gravadas por transação')
+        parser.add_argument('--atualizar', action='store_true', help='Não apaga o banco: insere os novos e atualiza só o que mudou')
+        parser.add_argument('--remover-ausentes', action='store_true', help='Com --atualizar, apaga os processos que não estão nos arquivos')
+        parser.add_argument('--noinput', '--no-input', '--yes', action='store_false', dest='interactive', help='Não pede confirmação')
+        parser.add_argument('--workers', type=int, default=os.cpu_count() or 1, help='Processos usados para ler os arquivos em paralelo')
+        parser.add_argument('--mapa-colunas', type=str, help='JSON com o nome das colunas de cada campo, ex: {"caixa": "Caixa"}')
+        parser.add_argument('--delimitador', type=str, default=',', help='Separador de colunas do CSV')
 
     def handle(self, *args, **options):
-        caminho = options['arquivo_csv']
+        arquivos = options['arquivos_csv']
+        batch_size = options['batch_size']
+        if options['remover_ausentes'] and not options['atualizar']:
+            # Sem --atualizar o banco já é apagado inteiro: a opção não faria nada
+            raise CommandError('--remover-ausentes só pode ser usado junto com --atualizar.')
 
-        if not os.path.exists(caminho):
-            self.stdout.write(self.style.ERROR(f'Arquivo não encontrado: {caminho}'))
+        faltando = [caminho for caminho in arquivos if not os.path.exists(caminho)]
+        if faltando:
+            for caminho in faltando:
+                self.stdout.write(self.style.ERROR(f'Arquivo não encontrado: {caminho}'))
             return
 
-        self.stdout.write(self.style.WARNING('ATENÇÃO: Isso apagará o banco de dados atual para importar o novo.'))
-        # Se quiser pular a confirmação para testes rápidos, comente as 3 linhas abaixo
-        confirm = input("Deseja continuar? (s/n): ")
-        if confirm.lower() != 's':
-            self.stdout.write(self.style.ERROR('Cancelado.'))
+        self.delimitador = options['delimitador']
+        self.workers = options['workers']
+        self.batch_size = batch_size
+        # Mapa e cabeçalhos conferidos antes de tocar no banco: um erro aqui não pode deixar a tabela vazia
+        try:
+            self.mapa = carregar_mapa(options['mapa_colunas'])
+            for caminho in arquivos:
+                verificar_cabecalho(caminho, self.mapa, self.delimitador)
+        except (OSError, ValueError) as erro:
+            raise CommandError(erro)
+
+        if options['atualizar']:
+            self.importar_incremental(arquivos, batch_size, options['remover_ausentes'])
             return
 
-        # 1. Limpa o banco
-        ProcessoPermanente.objects.all().delete()
-        self.stdout.write(self.style.SUCCESS('Banco limpo. Iniciando leitura...'))
-
-        objetos = []
-        
-        # 2. Lê o arquivo
-        # Usamos 'utf-8' pois o arquivo é utf-8 (mesmo que tenha caracteres corrompidos gravados nele)
-        with open(caminho, 'r', encoding='utf-8', errors='replace') as f:
-            # O arquivo usa VÍRGULA como separador
-            reader = csv.DictReader(f, delimiter=',')
-            
-            for row in reader:
-                # Mapeamento: Nome na Planilha -> Nome no Banco
-                
-                # Processo -> numero
-                raw_num = row.get('Processo', '')
-                num_limpo = re.sub(r'\D', '', raw_num) # Remove pontos e traços
-
-                if not num_limpo:
+        # Um número (ou chave) repetido faria a gravação falhar no meio: recusa antes de apagar
+        repetidos = procurar_repetidos(arquivos, self.mapa, self.delimitador)
+        if repetidos:
+            for repetido in repetidos[:20]:
+                self.stdout.write(self.style.ERROR(repetido))
+            raise CommandError(f'{len(repetidos)} números repetidos nos arquivos. Nada foi apagado.')
+
+        self.stdout.write(self.style.WARNING('ATENÇÃO: Isso apagará o banco de dados atual para importar o novo.'))
+        if options['interactive']:
+            confirm = input("Deseja continuar? (s/n): ")
+            if confirm.lower() != 's':
+                self.stdout.write(self.style.ERROR('Cancelado.'))
+                return
+
+        # O índice da pesquisa por conteúdo é reconstruído uma vez no final, não linha a linha.
+        # Limpeza e carga numa transação só: se algo falhar no meio, a tabela antiga
+        # volta inteira (e, até o final, quem consulta continua vendo a antiga).
+        with indice_adiado(), transaction.atomic():
+            # 1. Limpa o banco (um DELETE só: nada aponta para os processos com SET_NULL ou CASCADE)
+            ProcessoPermanente.objects.all().delete()
+            self.stdout.write(self.style.SUCCESS('Banco limpo. Iniciando leitura...'))
+
+            # 2. Lê o arquivo aos poucos e grava em lotes (Bulk Create para ser rápido):
+            # a memória usada fica limitada ao tamanho do lote, não ao tamanho do arquivo.
+            total = 0
+            inicio = time.monotonic()
+            for lote in self.ler_lotes(arquivos, batch_size):
+                ProcessoPermanente.objects.bulk_create(lote, batch_size=batch_size)
+                total += len(lote)
+                self.mostrar_progresso(total, inicio)
+
+        # Descarta os caches de consulta e gera o filtro de números de novo
+        reconstruir_filtro()
+        self.stdout.write(self.style.SUCCESS(f'SUCESSO! {total} processos importados.'))
+
+    def importar_incremental(self, arquivos, batch_size, remover_ausentes):
+        """
+        Compara o arquivo com o banco pelo 'numero': insere os novos, atualiza
+        só as colunas que mudaram e mantém os dados de 'encontrado_por'.
+        """
+        contagem = {'inseridos': 0, 'atualizados': 0, 'inalterados': 0, 'removidos': 0}
+        vistos = set() if remover_ausentes else None
+        filtro_desligado = False
+        total = 0
+        inicio = time.monotonic()
+
+        for lote in self.ler_lotes(arquivos, batch_size):
+            # Se o número se repetir no arquivo, vale a última linha
+            novos_por_numero = {obj.numero: obj for obj in lote}
+            if vistos is not None:
+                vistos.update(novos_por_numero)
+
+            existentes = {}
+            for bloco in em_blocos(novos_por_numero):
+                campos = ['id', 'numero'] + CAMPOS_IMPORTADOS + CAMPOS_DERIVADOS
+                for proc in ProcessoPermanente.objects.filter(numero__in=bloco).only(*campos):
+                    existentes[proc.numero] = proc
+
+            inserir = []
+            atualizar = {}  # colunas alteradas -> processos
+            for numero, novo in novos_por_numero.items():
+                atual = existentes.get(numero)
+                if atual is None:
+                    inserir.append(novo)
+                    continue
+
+                alterados = [campo for campo, atributo in ATRIBUTOS.items()
+                             if getattr(atual, atributo) != getattr(novo, atributo)]
+                if not alterados:
+                    contagem['inalterados'] += 1
                     continue
 
-                # Cria o objeto na memória
-                obj = ProcessoPermanente(
-                    numero=num_limpo,
-                    caixa=row.get('Caixa', '').strip(),     # Coluna 'Caixa'
-                    situacao=row.get('Situacao', '').strip(), # Coluna 'Situacao'
-                    assunto=row.get('Assunto', '').strip(),   # Coluna 'Assunto'
-                    # Se seu modelo tiver o campo 'classe', descomente a linha abaixo:
-                    # classe=row.get('Classe', '').strip(),
-                )
-                objetos.append(obj)
-
-        # 3. Salva no Banco (Bulk Create para ser rápido)
-        ProcessoPermanente.objects.bulk_create(objetos)
-        
-        self.stdout.write(self.style.SUCCESS(f'SUCESSO! {len(objetos)} processos importados.'))
\ No newline at end of file
+                for campo in alterados:
+                    setattr(atual, ATRIBUTOS[campo], getattr(novo, ATRIBUTOS[campo]))
+                atualizar.setdefault(tuple(alterados), []).append(atual)
+
+            if inserir and not filtro_desligado:
+                # O filtro em disco não tem os números novos: mudar a geração dos números
+                # antes de inseri-los faz filtro_atual() ignorá-lo até ser reconstruído no final
+                novos_numeros()
+                filtro_desligado = True
+
+            with transaction.atomic():
+                ProcessoPermanente.objects.bulk_create(inserir, batch_size=batch_size)
+                for campos, processos in atualizar.items():
+                    ProcessoPermanente.objects.bulk_update(processos, campos, batch_size=batch_size)
+
+            contagem['inseridos'] += len(inserir)
+            contagem['atualizados'] += sum(len(processos) for processos in atualizar.values())
+            total += len(lote)
+            self.mostrar_progresso(total, inicio)
+
+        if vistos is not None:
+            contagem['removidos'] = self.remover_ausentes(vistos, batch_size)
+        # Descarta os caches de consulta e gera o filtro de números de novo
+        reconstruir_filtro()
+
+        self.stdout.write(self.style.SUCCESS(
+            'SUCESSO! {inseridos} inseridos, {atualizados} atualizados, '
+            '{inalterados} inalterados, {removidos} removidos.'.format(**contagem)
+        ))
+
+    def remover_ausentes(self, vistos, batch_size):
+        """Apaga os processos do banco cujo número não apareceu no arquivo."""
+        ausentes = [
+            pk for pk, numero in ProcessoPermanente.objects.values_list('id', 'numero').iterator(chunk_size=batch_size)
+            if numero not in vistos
+        ]
+        for bloco in em_blocos(ausentes):
+            ProcessoPermanente.objects.filter(id__in=bloco).delete()
+        return len(ausentes)
+
+    def mostrar_progresso(self, total, inicio):
+        decorrido = time.monotonic() - inicio
+        self.stdout.write(f'{total} processos lidos ({total / decorrido:.0f} linhas/s)')
+
+    def ler_lotes(self, arquivos, batch_size):
+        """Agrupa os processos lidos dos arquivos em listas de até 'batch_size' itens."""
+        objetos = self.ler_processos(arquivos)
+        while True:
+            lote = list(islice(objetos, batch_size))
+            if not lote:
+                return
+            yield lote
+
+    def ler_processos(self, arquivos):
+        """
+        Gera um ProcessoPermanente por linha dos arquivos.
+        Com vários arquivos, a leitura é feita em paralelo e a gravação fica
+        toda neste processo (um único escritor no banco).
+        """
+        situacoes = {}
+        for linha in self.ler_linhas(arquivos):
+            obj = ProcessoPermanente(**linha)
+            obj.atualizar_campos_derivados(situacoes)
+            yield obj
+
+    def ler_linhas(self, arquivos):
+        if self.workers <= 1 or len(arquivos) == 1:
+            # Um arquivo só: lê linha a linha, sem carregar o arquivo na memória
+            for caminho in arquivos:
+                yield from ler_linhas(caminho, self.mapa, self.delimitador)
+            return
+
+        # Os auxiliares mandam lotes de 'batch_size' linhas por uma fila limitada:
+        # a memória fica em alguns lotes, qualquer que seja o tamanho dos arquivos
+        with Manager() as gerente, ProcessPoolExecutor(max_workers=self.workers) as pool:
+            fila = gerente.Queue(maxsize=2 * self.workers)
+            parar = gerente.Event()
+            futuros = [pool.submit(ler_arquivo, caminho, self.mapa, self.delimitador, fila, self.batch_size, parar)
+                       for caminho in arquivos]
+            lidas = dict.fromkeys(arquivos, 0)
+            pendentes = len(arquivos)
+            try:
+                while pendentes:
+                    caminho, linhas = self.proximo_da_fila(fila, futuros)
+                    if linhas is None:
+                        pendentes -= 1
+                        self.stdout.write(f'{caminho}: {lidas[caminho]} linhas lidas')
+                        continue
+                    lidas[caminho] += len(linhas)
+                    yield from linhas
+            finally:
+                if pendentes:
+                    # Quem grava desistiu (erro ou interrupção): os auxiliares que ainda não
+                    # começaram são cancelados, os outros param, e a fila é esvaziada para
+                    # nenhum ficar preso num put() da fila cheia
+                    parar.set()
+                    pool.shutdown(wait=False, cancel_futures=True)
+                    pendentes -= sum(futuro.cancelled() for futuro in futuros)
+                    while pendentes:
+                        try:
+                            _, linhas = fila.get(timeout=1)
+                        except queue.Empty:
+                            if all(futuro.done() for futuro in futuros):
+                                break
+                            continue
+                        if linhas is None:
+                            pendentes -= 1
+            for futuro in futuros:
+                # Repassa o erro de leitura de algum arquivo
+                futuro.result()
+
+    def proximo_da_fila(self, fila, futuros):
+        """fila.get() que não espera para sempre se um auxiliar morreu sem avisar o fim."""
+        while True:
+            try:
+                return fila.get(timeout=1)
+            except queue.Empty:
+                if all(futuro.done() for futuro in futuros):
+                    for futuro in futuros:
+                        if not futuro.cancelled():
+                            futuro.result()
+                    raise CommandError('Um dos processos de leitura terminou sem avisar o fim do arquivo.')
@@ -0,0 +1,20 @@
+import time
+from django.core.management.base import BaseCommand
+from core.verificacoes import processar_fila
+
+
+class Command(BaseCommand):
+    help = 'Processa as verificações em lote da fila (fora do servidor web)'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--continuo', action='store_true', help='Não termina: confere a fila a cada --intervalo segundos')
+        parser.add_argument('--intervalo', type=float, default=5.0)
+
+    def handle(self, *args, **options):
+        while True:
+            quantidade = processar_fila()
+            if quantidade:
+                self.stdout.write(self.style.SUCCESS(f'{quantidade} verificação(ões) processada(s).'))
+            if not options['continuo']:
+                return
+            time.sleep(options['intervalo'])
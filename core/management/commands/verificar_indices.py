@@ -0,0 +1,90 @@
+import re
+from datetime import datetime, timezone
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection
+from django.db.models import Count
+from core.admin import ProcessoPermanenteAdmin
+from core.models import ConferenciaCaixa, ItemProcesso, LeituraConferencia, Listagem, ProcessoPermanente, SituacaoProcesso
+
+# Varredura da tabela inteira no plano de cada banco (SQLite: "SCAN tabela" sem índice)
+VARREDURA = {
+    'sqlite': re.compile(r'\bSCAN (\w+)(?!.*\bUSING\b)'),
+    'postgresql': re.compile(r'\bSeq Scan on (\w+)'),
+}
+
+
+def consultas_canonicas():
+    """As consultas de core/views.py, core/busca.py, core/caixas.py e do admin, com valores de exemplo."""
+    data = datetime(2025, 1, 1, tzinfo=timezone.utc)
+    numeros = ['199971100056908', '200171100012345']
+    ordem_admin = ProcessoPermanenteAdmin.ordering
+    return {
+        # Busca exata pela chave numérica (busca.py, criar_itens_listagem)
+        'processo_por_chave': ProcessoPermanente.objects.filter(chave__in=[int(numero) for numero in numeros]),
+        # Busca por número (importação incremental)
+        'processo_por_numero': ProcessoPermanente.objects.filter(numero__in=numeros),
+        # Números antigos de 10 dígitos (busca.py)
+        'processo_por_chave_legado': ProcessoPermanente.objects.filter(chave_legado__in=['199905690']).order_by('-permanente', 'pk'),
+        # Lista da caixa e páginas seguintes (get_processos_caixa)
+        'processos_da_caixa': ProcessoPermanente.objects.filter(caixa='10').order_by('numero').values_list('numero', 'assunto', 'situacao'),
+        'processos_da_caixa_apos': ProcessoPermanente.objects.filter(caixa='10', numero__gt=numeros[0]).order_by('numero').values_list('numero', 'assunto', 'situacao'),
+        # Placar da conferência por WebSocket
+        'quantidade_na_caixa': ProcessoPermanente.objects.filter(caixa='10').values('caixa').annotate(total=Count('id')),
+        'permanentes_da_caixa': ProcessoPermanente.objects.filter(caixa='10', permanente=True),
+        # Diretório de caixas do autocomplete (caixas.py): lê o índice, não a tabela
+        'diretorio_de_caixas': ProcessoPermanente.objects.exclude(caixa__isnull=True).exclude(caixa='')
+            .values('caixa').annotate(quantidade=Count('id')).order_by('caixa'),
+        # Filtros e busca do admin de processos
+        'admin_encontrados_desde': ProcessoPermanente.objects.filter(data_encontrado__gte=data).order_by(*ordem_admin),
+        'admin_encontrados': ProcessoPermanente.objects.filter(data_encontrado__isnull=False).order_by(*ordem_admin),
+        'admin_todos': ProcessoPermanente.objects.order_by(*ordem_admin)[:100],
+        'admin_permanentes': ProcessoPermanente.objects.filter(permanente=True).order_by(*ordem_admin),
+        'admin_busca_numero': ProcessoPermanente.objects.filter(chave=199971100056908).order_by(*ordem_admin),
+        'admin_busca_numero_antigo': ProcessoPermanente.objects.filter(chave_legado='199905690').order_by(*ordem_admin),
+        # Partes do número (busca.buscar_por_partes e busca "ano/sequência" do admin)
+        'processo_por_ano_sequencia': ProcessoPermanente.objects.filter(ano=1999, sequencia=5690).order_by('numero'),
+        'processos_da_origem': ProcessoPermanente.objects.filter(origem='7110').order_by('numero')[:100],
+        'situacao_por_nome': SituacaoProcesso.objects.filter(nome='BAIXADO'),
+        # Listagens do usuário com contagens (home)
+        'listagens_do_usuario': Listagem.objects.filter(criador=1).com_contagens().order_by('-data_criacao', '-pk'),
+        # Itens da listagem (detalhe_listagem, imprimir_listagem) e item repetido
+        'itens_da_listagem': ItemProcesso.objects.filter(listagem=1).order_by('data_adicionado'),
+        'item_repetido': ItemProcesso.objects.filter(listagem=1, numero_digitado=numeros[0]),
+        # Conferência de caixa gravada (conferencias.py): conferência aberta, repetidos, placar e faltantes
+        'conferencia_aberta': ConferenciaCaixa.objects.filter(caixa='10', status=ConferenciaCaixa.ABERTA),
+        'leituras_repetidas': LeituraConferencia.objects.filter(conferencia=1, numero__in=numeros),
+        'placar_da_conferencia': LeituraConferencia.objects.filter(conferencia=1).order_by().values_list('veredito')
+            .annotate(Count('pk')),
+        'faltantes_da_conferencia': ProcessoPermanente.objects.filter(caixa='10')
+            .exclude(numero__in=LeituraConferencia.objects.filter(conferencia=1).values('numero'))
+            .order_by('numero').values_list('numero', flat=True),
+    }
+
+
+class Command(BaseCommand):
+    help = 'Roda EXPLAIN nas consultas principais do sistema e falha se alguma varrer uma tabela inteira'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--mostrar-planos', action='store_true', help='Mostra o plano de todas as consultas')
+
+    def handle(self, *args, **options):
+        padrao = VARREDURA.get(connection.vendor)
+        if padrao is None:
+            raise CommandError(f'Banco "{connection.vendor}" não suportado.')
+
+        varreduras = {}
+        for nome, consulta in consultas_canonicas().items():
+            plano = consulta.explain()
+            tabelas = padrao.findall(plano)
+            if tabelas:
+                varreduras[nome] = tabelas
+                self.stdout.write(self.style.ERROR(f'VARREDURA  {nome}: {", ".join(tabelas)}'))
+            else:
+                self.stdout.write(f'ok         {nome}')
+            if options['mostrar_planos'] or tabelas:
+                for linha in plano.splitlines():
+                    self.stdout.write(f'           {linha}')
+
+        if varreduras:
+            raise CommandError(f'{len(varreduras)} consulta(s) varrendo a tabela inteira: {", ".join(varreduras)}')
+        self.stdout.write(self.style.SUCCESS('Todas as consultas usam índice.'))
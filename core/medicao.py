@@ -0,0 +1,125 @@
+"""
+Medição de tempo e de consultas ao banco por view (opcional).
+
+Ativado com MEDICAO_REQUISICOES = True no settings, que inclui
+'core.medicao.MedicaoMiddleware' no MIDDLEWARE. Para cada requisição:
+- mede o tempo total, a quantidade de consultas e o tempo gasto no banco;
+- devolve o cabeçalho Server-Timing (aparece na aba Rede do navegador);
+- registra um aviso no log 'core.medicao' quando a view passa de
+  MEDICAO_LIMITE_CONSULTAS consultas, com a consulta mais repetida
+  (o padrão de uma consulta por item);
+- guarda as últimas medições de cada view na memória do worker, para o
+  resumo em percentis da view 'estatisticas_requisicoes'.
+
+Respostas em streaming são medidas só até a view retornar.
+"""
+import logging
+import statistics
+import threading
+import time
+from collections import Counter, defaultdict, deque
+from contextlib import ExitStack
+from django.conf import settings
+from django.db import connections
+
+logger = logging.getLogger(__name__)
+
+# Medições guardadas por view (as mais antigas são descartadas)
+AMOSTRAS_POR_VIEW = 1000
+
+
+class Medicoes:
+    """Últimas medições de cada view deste worker."""
+
+    def __init__(self, limite=AMOSTRAS_POR_VIEW):
+        self.limite = limite
+        self.amostras = defaultdict(lambda: deque(maxlen=self.limite))
+        self.lock = threading.Lock()
+
+    def registrar(self, view, total, consultas, tempo_banco):
+        with self.lock:
+            self.amostras[view].append((total, consultas, tempo_banco))
+
+    def resumo(self):
+        with self.lock:
+            copia = {view: list(amostras) for view, amostras in self.amostras.items()}
+
+        resumo = {}
+        for view, amostras in sorted(copia.items()):
+            totais, consultas, tempos_banco = zip(*amostras)
+            resumo[view] = {
+                'requisicoes': len(amostras),
+                'total_ms': percentis(totais),
+                'banco_ms': percentis(tempos_banco),
+                'consultas': {'media': round(statistics.fmean(consultas), 1), 'max': max(consultas)},
+            }
+        return resumo
+
+    def limpar(self):
+        with self.lock:
+            self.amostras.clear()
+
+
+def percentis(valores):
+    """p50/p95/p99/máx em milissegundos."""
+    ordenados = sorted(valores)
+
+    def corte(fracao):
+        return round(ordenados[min(len(ordenados) - 1, int(fracao * len(ordenados)))] * 1000, 2)
+
+    return {'p50': corte(0.50), 'p95': corte(0.95), 'p99': corte(0.99), 'max': round(ordenados[-1] * 1000, 2)}
+
+
+medicoes = Medicoes()
+
+
+class _ContadorConsultas:
+    """execute_wrapper que conta as consultas e soma o tempo gasto em cada uma."""
+
+    def __init__(self):
+        self.consultas = 0
+        self.tempo = 0.0
+        self.sqls = Counter()
+
+    def __call__(self, execute, sql, params, many, context):
+        inicio = time.perf_counter()
+        try:
+            return execute(sql, params, many, context)
+        finally:
+            self.tempo += time.perf_counter() - inicio
+            self.consultas += 1
+            self.sqls[sql] += 1
+
+
+class MedicaoMiddleware:
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        self.limite_consultas = getattr(settings, 'MEDICAO_LIMITE_CONSULTAS', 50)
+
+    def __call__(self, request):
+        contador = _ContadorConsultas()
+        inicio = time.perf_counter()
+        with ExitStack() as pilha:
+            for conexao in connections.all():
+                pilha.enter_context(conexao.execute_wrapper(contador))
+            response = self.get_response(request)
+        total = time.perf_counter() - inicio
+
+        match = request.resolver_match
+        view = match.view_name if match else 'sem_rota'
+        medicoes.registrar(view, total, contador.consultas, contador.tempo)
+
+        response['Server-Timing'] = (
+            f'db;dur={contador.tempo * 1000:.1f};desc="{contador.consultas} consultas", '
+            f'total;dur={total * 1000:.1f}'
+        )
+
+        if contador.consultas > self.limite_consultas:
+            sql, repeticoes = contador.sqls.most_common(1)[0]
+            logger.warning(
+                '%s %s (%s) fez %d consultas (limite %d) em %.0f ms. Mais repetida (%dx): %s',
+                request.method, request.path, view, contador.consultas, self.limite_consultas,
+                total * 1000, repeticoes, sql[:300],
+            )
+        return response
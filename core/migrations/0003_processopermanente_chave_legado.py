@@ -0,0 +1,23 @@
+# Generated by Django 5.2.7 on 2026-10-18 10:13
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0002_processopermanente_assunto_processopermanente_caixa_and_more'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='processopermanente',
+            name='chave_legado',
+            field=models.CharField(blank=True, db_index=True, editable=False, max_length=9, null=True, verbose_name='Chave Legado'),
+        ),
+        migrations.AddField(
+            model_name='processopermanente',
+            name='permanente',
+            field=models.BooleanField(default=False, editable=False),
+        ),
+    ]
@@ -0,0 +1,18 @@
+# Generated by Django 5.2.7 on 2026-10-18 10:16
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0003_processopermanente_chave_legado'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='processopermanente',
+            name='caixa',
+            field=models.CharField(blank=True, db_index=True, max_length=50, null=True, verbose_name='Caixa'),
+        ),
+    ]
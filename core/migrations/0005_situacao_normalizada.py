@@ -0,0 +1,57 @@
+# Generated by Django 5.2.7 on 2026-10-18 10:22
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+
+
+def preencher_situacoes(apps, schema_editor):
+    """Cria as situações normalizadas e marca os permanentes dos processos já importados."""
+    SituacaoProcesso = apps.get_model('core', 'SituacaoProcesso')
+    ProcessoPermanente = apps.get_model('core', 'ProcessoPermanente')
+
+    situacoes = ProcessoPermanente.objects.exclude(situacao__isnull=True).values_list('situacao', flat=True).distinct()
+    for situacao in list(situacoes):
+        nome = ' '.join(situacao.upper().split())
+        if not nome:
+            continue
+        obj, _ = SituacaoProcesso.objects.get_or_create(nome=nome, defaults={'permanente': 'PERMANENTE' in nome})
+        ProcessoPermanente.objects.filter(situacao=situacao).update(situacao_normalizada=obj, permanente=obj.permanente)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0004_processopermanente_caixa_index'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='SituacaoProcesso',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('nome', models.CharField(max_length=255, unique=True)),
+                ('permanente', models.BooleanField(db_index=True, default=False)),
+            ],
+            options={
+                'verbose_name': 'Situação',
+                'verbose_name_plural': 'Situações',
+            },
+        ),
+        migrations.AlterField(
+            model_name='processopermanente',
+            name='permanente',
+            field=models.BooleanField(db_index=True, default=False, editable=False),
+        ),
+        migrations.AddField(
+            model_name='processopermanente',
+            name='situacao_normalizada',
+            field=models.ForeignKey(blank=True, editable=False, null=True, on_delete=django.db.models.deletion.PROTECT, to='core.situacaoprocesso'),
+        ),
+        migrations.AddIndex(
+            model_name='processopermanente',
+            index=models.Index(fields=['caixa', 'permanente'], name='core_proc_caixa_perm_idx'),
+        ),
+        migrations.RunPython(preencher_situacoes, migrations.RunPython.noop),
+    ]
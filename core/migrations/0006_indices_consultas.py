@@ -0,0 +1,54 @@
+# Generated by Django 5.2.7 on 2026-10-18 10:30
+
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0005_situacao_normalizada'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.RemoveIndex(
+            model_name='processopermanente',
+            name='core_proc_caixa_perm_idx',
+        ),
+        migrations.AlterField(
+            model_name='processopermanente',
+            name='caixa',
+            field=models.CharField(blank=True, max_length=50, null=True, verbose_name='Caixa'),
+        ),
+        migrations.AlterField(
+            model_name='processopermanente',
+            name='data_encontrado',
+            field=models.DateTimeField(blank=True, db_index=True, null=True),
+        ),
+        migrations.AlterField(
+            model_name='processopermanente',
+            name='permanente',
+            field=models.BooleanField(default=False, editable=False),
+        ),
+        migrations.AddIndex(
+            model_name='itemprocesso',
+            index=models.Index(fields=['listagem', 'data_adicionado'], name='core_item_listagem_data_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='listagem',
+            index=models.Index(fields=['criador', 'data_criacao'], name='core_list_criador_data_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='processopermanente',
+            index=models.Index(condition=models.Q(('permanente', True)), fields=['caixa'], name='core_proc_caixa_perm_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='processopermanente',
+            index=models.Index(condition=models.Q(('permanente', True)), fields=['-data_encontrado', '-id'], name='core_proc_perm_encontrado_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='processopermanente',
+            index=models.Index(fields=['caixa', 'numero'], name='core_proc_caixa_numero_idx'),
+        ),
+    ]
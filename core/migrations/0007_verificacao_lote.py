@@ -0,0 +1,53 @@
+# Generated by Django 5.2.7 on 2026-10-18 10:32
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0006_indices_consultas'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='VerificacaoLote',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('status', models.CharField(choices=[('pendente', 'Na fila'), ('processando', 'Processando'), ('concluida', 'Concluída'), ('erro', 'Erro')], default='pendente', max_length=12)),
+                ('numeros', models.TextField()),
+                ('total', models.PositiveIntegerField(default=0)),
+                ('processados', models.PositiveIntegerField(default=0)),
+                ('erro', models.TextField(blank=True)),
+                ('criada_em', models.DateTimeField(auto_now_add=True)),
+                ('atualizada_em', models.DateTimeField(auto_now=True)),
+                ('concluida_em', models.DateTimeField(blank=True, null=True)),
+                ('criador', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='verificacoes', to=settings.AUTH_USER_MODEL)),
+            ],
+            options={
+                'verbose_name': 'Verificação em lote',
+                'verbose_name_plural': 'Verificações em lote',
+            },
+        ),
+        migrations.CreateModel(
+            name='ResultadoVerificacao',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('posicao', models.PositiveIntegerField()),
+                ('numero', models.CharField(max_length=25)),
+                ('processo', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, to='core.processopermanente')),
+                ('verificacao', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='resultados', to='core.verificacaolote')),
+            ],
+        ),
+        migrations.AddIndex(
+            model_name='verificacaolote',
+            index=models.Index(fields=['status', 'criada_em'], name='core_verif_status_idx'),
+        ),
+        migrations.AlterUniqueTogether(
+            name='resultadoverificacao',
+            unique_together={('verificacao', 'posicao')},
+        ),
+    ]
@@ -0,0 +1,69 @@
+# Generated by Django 5.2.7 on 2026-10-18 10:34
+
+from django.conf import settings
+from django.db import migrations, models
+from core.numeros import decompor_numero
+
+
+def preencher_partes(apps, schema_editor):
+    """Decompõe os números dos processos já importados (em lotes)."""
+    ProcessoPermanente = apps.get_model('core', 'ProcessoPermanente')
+    campos = ['ano', 'segmento', 'tribunal', 'origem', 'sequencia']
+
+    pendentes = []
+    for proc in ProcessoPermanente.objects.only('id', 'numero').iterator(chunk_size=2000):
+        partes = decompor_numero(proc.numero)
+        if partes is None:
+            continue
+        for campo in campos:
+            setattr(proc, campo, getattr(partes, campo))
+        pendentes.append(proc)
+        if len(pendentes) >= 2000:
+            ProcessoPermanente.objects.bulk_update(pendentes, campos)
+            pendentes = []
+    ProcessoPermanente.objects.bulk_update(pendentes, campos)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0007_verificacao_lote'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='processopermanente',
+            name='ano',
+            field=models.PositiveSmallIntegerField(blank=True, editable=False, null=True),
+        ),
+        migrations.AddField(
+            model_name='processopermanente',
+            name='origem',
+            field=models.CharField(blank=True, editable=False, max_length=4, null=True),
+        ),
+        migrations.AddField(
+            model_name='processopermanente',
+            name='segmento',
+            field=models.CharField(blank=True, editable=False, max_length=1, null=True),
+        ),
+        migrations.AddField(
+            model_name='processopermanente',
+            name='sequencia',
+            field=models.PositiveIntegerField(blank=True, editable=False, null=True),
+        ),
+        migrations.AddField(
+            model_name='processopermanente',
+            name='tribunal',
+            field=models.CharField(blank=True, editable=False, max_length=2, null=True),
+        ),
+        migrations.AddIndex(
+            model_name='processopermanente',
+            index=models.Index(fields=['ano', 'sequencia'], name='core_proc_ano_seq_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='processopermanente',
+            index=models.Index(fields=['origem', 'ano'], name='core_proc_origem_ano_idx'),
+        ),
+        migrations.RunPython(preencher_partes, migrations.RunPython.noop),
+    ]
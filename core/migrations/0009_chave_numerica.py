@@ -0,0 +1,41 @@
+# Generated by Django 5.2.7 on 2026-10-18 10:36
+
+from django.db import migrations, models
+from core.numeros import chave_numerica
+
+
+def preencher_chaves(apps, schema_editor):
+    """Calcula a chave numérica dos processos e itens já gravados (em lotes)."""
+    for modelo, campo_numero in (('ProcessoPermanente', 'numero'), ('ItemProcesso', 'numero_digitado')):
+        Modelo = apps.get_model('core', modelo)
+        pendentes = []
+        for obj in Modelo.objects.only('id', campo_numero).iterator(chunk_size=2000):
+            obj.chave = chave_numerica(getattr(obj, campo_numero))
+            if obj.chave is None:
+                continue
+            pendentes.append(obj)
+            if len(pendentes) >= 2000:
+                Modelo.objects.bulk_update(pendentes, ['chave'])
+                pendentes = []
+        Modelo.objects.bulk_update(pendentes, ['chave'])
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0008_partes_do_numero'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='itemprocesso',
+            name='chave',
+            field=models.BigIntegerField(blank=True, editable=False, null=True),
+        ),
+        migrations.AddField(
+            model_name='processopermanente',
+            name='chave',
+            field=models.BigIntegerField(blank=True, editable=False, null=True, unique=True),
+        ),
+        migrations.RunPython(preencher_chaves, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,51 @@
+# Generated by Django 5.2.7 on 2026-10-18 10:38
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0009_chave_numerica'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ConferenciaCaixa',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('caixa', models.CharField(max_length=50)),
+                ('status', models.CharField(choices=[('aberta', 'Aberta'), ('finalizada', 'Finalizada')], default='aberta', max_length=10)),
+                ('iniciada_em', models.DateTimeField(auto_now_add=True)),
+                ('finalizada_em', models.DateTimeField(blank=True, null=True)),
+                ('criador', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='conferencias', to=settings.AUTH_USER_MODEL)),
+            ],
+            options={
+                'verbose_name': 'Conferência de caixa',
+                'verbose_name_plural': 'Conferências de caixa',
+            },
+        ),
+        migrations.CreateModel(
+            name='LeituraConferencia',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('numero', models.CharField(max_length=25)),
+                ('veredito', models.CharField(choices=[('permanente', 'Permanente'), ('na_caixa', 'Na caixa'), ('caixa_errada', 'Caixa errada'), ('nao_encontrado', 'Não encontrado')], max_length=15)),
+                ('lida_em', models.DateTimeField(auto_now_add=True)),
+                ('conferencia', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='leituras', to='core.conferenciacaixa')),
+                ('lida_por', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, to=settings.AUTH_USER_MODEL)),
+                ('processo', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, to='core.processopermanente')),
+            ],
+        ),
+        migrations.AddConstraint(
+            model_name='conferenciacaixa',
+            constraint=models.UniqueConstraint(condition=models.Q(('status', 'aberta')), fields=('caixa',), name='core_conf_aberta_unica'),
+        ),
+        migrations.AlterUniqueTogether(
+            name='leituraconferencia',
+            unique_together={('conferencia', 'numero')},
+        ),
+    ]
@@ -0,0 +1,36 @@
+# Generated by Django 5.2.7 on 2026-10-18 10:56
+
+import time
+
+from django.db import migrations, models
+
+
+def criar_geracoes(apps, schema_editor):
+    # Começa pelo relógio: um filtro gravado antes desta migração não vale mais
+    Geracao = apps.get_model('core', 'Geracao')
+    agora = time.time()
+    for nome in ('processos', 'numeros'):
+        Geracao.objects.get_or_create(nome=nome, defaults={'valor': int(agora * 1000), 'alterada_em': agora})
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0010_conferencia_caixa'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='Geracao',
+            fields=[
+                ('nome', models.CharField(max_length=50, primary_key=True, serialize=False)),
+                ('valor', models.BigIntegerField()),
+                ('alterada_em', models.FloatField()),
+            ],
+            options={
+                'verbose_name': 'Geração',
+                'verbose_name_plural': 'Gerações',
+            },
+        ),
+        migrations.RunPython(criar_geracoes, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,19 @@
+# Generated by Django 5.2.7 on 2026-10-18 10:59
+
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0011_geracao'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='processopermanente',
+            index=models.Index(fields=['sequencia'], name='core_proc_sequencia_idx'),
+        ),
+    ]
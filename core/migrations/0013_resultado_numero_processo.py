@@ -0,0 +1,33 @@
+# Generated by Django 5.2.7 on 2026-10-18 11:00
+
+from django.db import migrations, models
+from django.db.models import OuterRef, Subquery
+
+
+def copiar_numeros(apps, schema_editor):
+    """Guarda o número do processo de cada resultado antes de a chave estrangeira sair."""
+    ProcessoPermanente = apps.get_model('core', 'ProcessoPermanente')
+    ResultadoVerificacao = apps.get_model('core', 'ResultadoVerificacao')
+    ResultadoVerificacao.objects.filter(processo__isnull=False).update(
+        numero_processo=Subquery(ProcessoPermanente.objects.filter(pk=OuterRef('processo_id')).values('numero')[:1]),
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0012_processo_sequencia_idx'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='resultadoverificacao',
+            name='numero_processo',
+            field=models.CharField(blank=True, max_length=25, null=True),
+        ),
+        migrations.RunPython(copiar_numeros, migrations.RunPython.noop),
+        migrations.RemoveField(
+            model_name='resultadoverificacao',
+            name='processo',
+        ),
+    ]
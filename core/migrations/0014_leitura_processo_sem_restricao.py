@@ -0,0 +1,19 @@
+# Generated by Django 5.2.7 on 2026-10-18 11:02
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0013_resultado_numero_processo'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='leituraconferencia',
+            name='processo',
+            field=models.ForeignKey(blank=True, db_constraint=False, null=True, on_delete=django.db.models.deletion.DO_NOTHING, to='core.processopermanente'),
+        ),
+    ]
@@ -0,0 +1,17 @@
+# Generated by Django 5.2.7 on 2026-10-18 11:22
+
+from django.db import migrations
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0014_leitura_processo_sem_restricao'),
+    ]
+
+    operations = [
+        migrations.RemoveIndex(
+            model_name='processopermanente',
+            name='core_proc_sequencia_idx',
+        ),
+    ]
@@ -0,0 +1,25 @@
+from django.db import migrations
+from core.numeros import BASE_CHAVE_CNJ, chave_numerica
+
+
+def limpar_chaves_invalidas(apps, schema_editor):
+    """Tira a chave dos números de 20 dígitos com dígitos verificadores errados."""
+    # (A chave dos itens de listagem sai na migração seguinte)
+    ProcessoPermanente = apps.get_model('core', 'ProcessoPermanente')
+    invalidos = [
+        pk for pk, numero in ProcessoPermanente.objects.filter(chave__gte=BASE_CHAVE_CNJ).values_list('id', 'numero').iterator(chunk_size=2000)
+        if chave_numerica(numero) is None
+    ]
+    for inicio in range(0, len(invalidos), 900):
+        ProcessoPermanente.objects.filter(id__in=invalidos[inicio:inicio + 900]).update(chave=None)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0015_remover_sequencia_idx'),
+    ]
+
+    operations = [
+        migrations.RunPython(limpar_chaves_invalidas, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,17 @@
+# Generated by Django 5.2.7 on 2026-10-18 11:24
+
+from django.db import migrations
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0016_chave_cnj_com_digitos_conferidos'),
+    ]
+
+    operations = [
+        migrations.RemoveField(
+            model_name='itemprocesso',
+            name='chave',
+        ),
+    ]
@@ -1,10 +1,104 @@
 from django.db import models
 from django.contrib.auth.models import User
+from django.db import transaction
+from django.db.models.functions import Coalesce
+from .geracao import nova_geracao, novos_numeros
+from .numeros import chave_legado_do_numero, chave_numerica, decompor_numero
+
+
+def e_situacao_permanente(situacao):
+    """True se o texto da situação indicar um processo PERMANENTE."""
+    return 'PERMANENTE' in str(situacao).upper() if situacao else False
+
+
+def normalizar_situacao(situacao):
+    """'  Arquivado  permanente' -> 'ARQUIVADO PERMANENTE' (None se vazia)."""
+    if not situacao:
+        return None
+    return ' '.join(str(situacao).upper().split()) or None
+
+
+class SituacaoProcesso(models.Model):
+    """
+    Tabela de situações distintas (normalizadas), preenchida pela importação.
+    """
+    nome = models.CharField(max_length=255, unique=True)
+    permanente = models.BooleanField(default=False, db_index=True)
+
+    class Meta:
+        verbose_name = "Situação"
+        verbose_name_plural = "Situações"
+
+    def __str__(self):
+        return self.nome
+
+    @classmethod
+    def id_para(cls, situacao, conhecidas=None):
+        """
+        Id da situação normalizada, criando o registro na primeira vez.
+        'conhecidas' é um dicionário nome -> id reaproveitado entre chamadas
+        (a importação passa o mesmo para todas as linhas).
+        """
+        nome = normalizar_situacao(situacao)
+        if nome is None:
+            return None
+        if conhecidas is not None and nome in conhecidas:
+            return conhecidas[nome]
+        obj, _ = cls.objects.get_or_create(nome=nome, defaults={'permanente': e_situacao_permanente(nome)})
+        if conhecidas is not None:
+            conhecidas[nome] = obj.id
+        return obj.id
+
+
+def mudar_geracao_ao_confirmar(campos):
+    """
+    Agenda a mudança de geração para depois do commit, conforme os campos alterados:
+    número ou chaves mudam as duas gerações (o filtro de números também fica velho);
+    os campos rastreados, só a dos processos; os demais (ex: encontrado_por), nenhuma.
+    """
+    campos = set(campos)
+    if campos & {'numero', 'chave', 'chave_legado'}:
+        transaction.on_commit(novos_numeros)
+    elif campos & {*ProcessoPermanente.CAMPOS_RASTREADOS, 'permanente'}:
+        transaction.on_commit(nova_geracao)
+
+
+class ProcessoPermanenteQuerySet(models.QuerySet):
+    """
+    Operações em massa que não passam pelo save()/delete() de cada objeto nem pelos
+    sinais (ações do admin, importação): mudam a geração por conta própria.
+    bulk_update() também passa por aqui, porque grava com update().
+    """
+
+    def update(self, **kwargs):
+        linhas = super().update(**kwargs)
+        if linhas:
+            mudar_geracao_ao_confirmar(kwargs)
+        return linhas
+
+    def bulk_create(self, objs, *args, **kwargs):
+        criados = super().bulk_create(objs, *args, **kwargs)
+        if criados:
+            transaction.on_commit(novos_numeros)
+        return criados
+
+    def delete(self):
+        # Sem sinal post_delete de propósito: ele tiraria do Django o DELETE único (fast delete)
+        resultado = super().delete()
+        if resultado[0]:
+            transaction.on_commit(nova_geracao)
+        return resultado
+
 
 class ProcessoPermanente(models.Model):
     """
     Tabela principal que conterá todos os dados importados do Excel.
     """
+    # Campos usados pelos caches de consulta e pela lista da caixa: mudar algum deles muda a geração
+    CAMPOS_RASTREADOS = ('numero', 'caixa', 'situacao', 'assunto')
+    # Calculados por atualizar_campos_derivados()
+    CAMPOS_DERIVADOS = ('chave', 'chave_legado', 'permanente', 'situacao_normalizada', 'ano', 'segmento', 'tribunal', 'origem', 'sequencia')
+
     # --- DADOS DO PROCESSO (Vindos da Tabela) ---
     numero = models.CharField(max_length=15, unique=True, help_text="Número de 15 dígitos do processo permanente.")
     
@@ -17,22 +111,141 @@ class ProcessoPermanente(models.Model):
     # A segunda coluna 'SITUAÇÃO' da tabela original renomeada
     situacao_detalhe = models.CharField(max_length=255, verbose_name="Situação Detalhe", blank=True, null=True)
     
+    # Indexada pelos índices compostos do Meta (ambos começam pela caixa)
     caixa = models.CharField(max_length=50, verbose_name="Caixa", blank=True, null=True)
 
+    # --- CAMPOS DERIVADOS (Calculados na importação / save) ---
+    # O número como inteiro (numeros.chave_numerica): usado nas buscas exatas,
+    # com índice menor e comparação mais barata que a do texto
+    chave = models.BigIntegerField(unique=True, null=True, blank=True, editable=False)
+    # ANO + SEQUÊNCIA, para achar números antigos de 10 dígitos por igualdade
+    chave_legado = models.CharField(max_length=9, verbose_name="Chave Legado", blank=True, null=True, db_index=True, editable=False)
+    # Situação normalizada e o indicador de PERMANENTE, para filtrar/contar no SQL
+    situacao_normalizada = models.ForeignKey(SituacaoProcesso, on_delete=models.PROTECT, null=True, blank=True, editable=False)
+    # Indexado pelos índices parciais do Meta: o Django filtra por 'WHERE permanente'
+    # (sem '= 1'), que o SQLite só resolve com um índice de mesma condição
+    permanente = models.BooleanField(default=False, editable=False)
+    # Partes do número (core/numeros.py), para buscas por ano + sequência ou por origem.
+    # Segmento e tribunal só existem na numeração do CNJ (20 dígitos).
+    ano = models.PositiveSmallIntegerField(null=True, blank=True, editable=False)
+    segmento = models.CharField(max_length=1, null=True, blank=True, editable=False)
+    tribunal = models.CharField(max_length=2, null=True, blank=True, editable=False)
+    origem = models.CharField(max_length=4, null=True, blank=True, editable=False)
+    sequencia = models.PositiveIntegerField(null=True, blank=True, editable=False)
+
     # --- LÓGICA DE CONTROLE (Encontrado por quem?) ---
     encontrado_por = models.ForeignKey(User, on_delete=models.SET_NULL, null=True, blank=True, related_name="processos_encontrados")
-    data_encontrado = models.DateTimeField(null=True, blank=True)
+    data_encontrado = models.DateTimeField(null=True, blank=True, db_index=True)
     listagem_encontrado = models.ForeignKey('Listagem', on_delete=models.SET_NULL, null=True, blank=True)
 
+    objects = ProcessoPermanenteQuerySet.as_manager()
+
+    class Meta:
+        indexes = [
+            # "Permanentes da caixa X" e "todos os permanentes" (só as linhas permanentes)
+            models.Index(fields=['caixa'], condition=models.Q(permanente=True), name='core_proc_caixa_perm_idx'),
+            models.Index(fields=['-data_encontrado', '-id'], condition=models.Q(permanente=True), name='core_proc_perm_encontrado_idx'),
+            # Lista da caixa, já na ordem do número (get_processos_caixa)
+            models.Index(fields=['caixa', 'numero'], name='core_proc_caixa_numero_idx'),
+            # Busca por partes do número (busca.buscar_por_partes)
+            models.Index(fields=['ano', 'sequencia'], name='core_proc_ano_seq_idx'),
+            models.Index(fields=['origem', 'ano'], name='core_proc_origem_ano_idx'),
+        ]
+
     def __str__(self):
         return f"{self.numero} - {self.caixa or 'Sem Caixa'}"
 
+    def atualizar_campos_derivados(self, situacoes=None):
+        """
+        Recalcula os campos derivados. Chame antes de um bulk_create/bulk_update,
+        passando em 'situacoes' um mesmo dicionário para todos os objetos.
+        """
+        self.chave = chave_numerica(self.numero)
+        self.chave_legado = chave_legado_do_numero(self.numero)
+        self.permanente = e_situacao_permanente(self.situacao)
+        self.situacao_normalizada_id = SituacaoProcesso.id_para(self.situacao, situacoes)
+        partes = decompor_numero(self.numero)
+        self.ano = partes.ano if partes else None
+        self.segmento = partes.segmento if partes else None
+        self.tribunal = partes.tribunal if partes else None
+        self.origem = partes.origem if partes else None
+        self.sequencia = partes.sequencia if partes else None
+
+    @classmethod
+    def from_db(cls, db, field_names, values):
+        instancia = super().from_db(db, field_names, values)
+        instancia._rastreados = instancia._valores_rastreados()
+        return instancia
+
+    def _valores_rastreados(self):
+        # Usa __dict__ para não buscar no banco campos adiados (only/defer)
+        return {campo: self.__dict__[campo] for campo in self.CAMPOS_RASTREADOS if campo in self.__dict__}
+
+    def save(self, *args, **kwargs):
+        self.atualizar_campos_derivados()
+        update_fields = kwargs.get('update_fields')
+        if update_fields is not None:
+            kwargs['update_fields'] = set(update_fields) | set(self.CAMPOS_DERIVADOS)
+
+        # A geração muda no sinal post_save (processo_salvo), que também vale para o loaddata
+        super().save(*args, **kwargs)
+
+    def delete(self, *args, **kwargs):
+        resultado = super().delete(*args, **kwargs)
+        transaction.on_commit(nova_geracao)
+        return resultado
+
+
+def processo_salvo(sender, instance, **kwargs):
+    """post_save de ProcessoPermanente (ligado em CoreConfig.ready): muda a geração se preciso."""
+    originais = getattr(instance, '_rastreados', None)
+    atuais = instance._valores_rastreados()
+    if originais is None or originais.get('numero') != atuais.get('numero'):
+        # Número novo: o filtro de números também fica desatualizado
+        transaction.on_commit(novos_numeros)
+    elif originais != atuais:
+        transaction.on_commit(nova_geracao)
+    instance._rastreados = atuais
+
+
+class ListagemQuerySet(models.QuerySet):
+
+    def com_contagens(self):
+        """
+        Listagens com o criador e as contagens numa consulta só:
+        'qtd_itens', 'qtd_itens_permanentes' e 'qtd_encontrados' (processos
+        permanentes marcados como encontrados nesta listagem).
+        Cada contagem é uma subconsulta pelo índice da chave estrangeira: juntar
+        itens e processos no mesmo GROUP BY geraria itens x encontrados linhas.
+        """
+        return self.select_related('criador').annotate(
+            qtd_itens=_contagem(ItemProcesso.objects, 'listagem'),
+            qtd_itens_permanentes=_contagem(ItemProcesso.objects.filter(e_permanente=True), 'listagem'),
+            qtd_encontrados=_contagem(ProcessoPermanente.objects, 'listagem_encontrado'),
+        )
+
+
+def _contagem(queryset, campo):
+    """Subconsulta com a quantidade de linhas de 'queryset' que apontam para a listagem (0 se nenhuma)."""
+    contagem = (queryset.filter(**{campo: models.OuterRef('pk')}).order_by()
+                .values(campo).annotate(quantidade=models.Count('pk')).values('quantidade'))
+    return Coalesce(models.Subquery(contagem), 0)
+
+
 class Listagem(models.Model):
     # Título no formato NNNN/TT/AA
     titulo = models.CharField(max_length=100, help_text="Formato: NNNN/TT/AA")
     criador = models.ForeignKey(User, on_delete=models.PROTECT)
     data_criacao = models.DateTimeField(auto_now_add=True)
 
+    objects = ListagemQuerySet.as_manager()
+
+    class Meta:
+        indexes = [
+            # Listagens do usuário, mais recentes primeiro (home)
+            models.Index(fields=['criador', 'data_criacao'], name='core_list_criador_data_idx'),
+        ]
+
     def __str__(self):
         return f"{self.titulo} (Criada por: {self.criador.username})"
 
@@ -48,6 +261,155 @@ class ItemProcesso(models.Model):
     class Meta:
         # Garante que o mesmo número não seja digitado duas vezes na MESMA lista
         unique_together = ('listagem', 'numero_digitado') 
+        indexes = [
+            # Itens da listagem na ordem em que foram adicionados
+            models.Index(fields=['listagem', 'data_adicionado'], name='core_item_listagem_data_idx'),
+        ]
+
+    def __str__(self):
+        return f"{self.numero_digitado} (Lista: {self.listagem.titulo})"
+
+class VerificacaoLote(models.Model):
+    """
+    Verificação em lote grande, processada em segundo plano (core/verificacoes.py).
+    A fila é a própria tabela: os trabalhos 'pendentes' são pegos em ordem de criação.
+    """
+    PENDENTE = 'pendente'
+    PROCESSANDO = 'processando'
+    CONCLUIDA = 'concluida'
+    ERRO = 'erro'
+    STATUS = [
+        (PENDENTE, 'Na fila'),
+        (PROCESSANDO, 'Processando'),
+        (CONCLUIDA, 'Concluída'),
+        (ERRO, 'Erro'),
+    ]
+
+    criador = models.ForeignKey(User, on_delete=models.CASCADE, related_name="verificacoes")
+    status = models.CharField(max_length=12, choices=STATUS, default=PENDENTE)
+    # Números extraídos do texto colado, sem repetição, um por linha
+    numeros = models.TextField()
+    total = models.PositiveIntegerField(default=0)
+    processados = models.PositiveIntegerField(default=0)
+    erro = models.TextField(blank=True)
+    criada_em = models.DateTimeField(auto_now_add=True)
+    # Atualizada a cada bloco: um trabalho 'processando' parado há muito tempo é retomado
+    atualizada_em = models.DateTimeField(auto_now=True)
+    concluida_em = models.DateTimeField(null=True, blank=True)
+
+    class Meta:
+        verbose_name = "Verificação em lote"
+        verbose_name_plural = "Verificações em lote"
+        indexes = [
+            # Próximo trabalho da fila
+            models.Index(fields=['status', 'criada_em'], name='core_verif_status_idx'),
+        ]
+
+    def __str__(self):
+        return f"Verificação {self.pk} ({self.total} números, {self.get_status_display()})"
+
+    def lista_numeros(self):
+        return self.numeros.split('\n') if self.numeros else []
+
+    @property
+    def percentual(self):
+        return round(100 * self.processados / self.total) if self.total else 100
+
+
+class ResultadoVerificacao(models.Model):
+    """Um número da verificação e o processo encontrado para ele (ou nenhum)."""
+    verificacao = models.ForeignKey(VerificacaoLote, on_delete=models.CASCADE, related_name="resultados")
+    # Ordem do número no texto colado
+    posicao = models.PositiveIntegerField()
+    numero = models.CharField(max_length=25)
+    # Número do processo encontrado, como gravado no banco (vazio se nenhum). Não é chave
+    # estrangeira: a importação completa troca os ids, mas o número continua o mesmo, e o
+    # DELETE da importação não precisa passar por esta tabela
+    numero_processo = models.CharField(max_length=25, null=True, blank=True)
+
+    class Meta:
+        unique_together = ('verificacao', 'posicao')
+
+    def __str__(self):
+        return self.numero
+
+
+class ConferenciaCaixa(models.Model):
+    """
+    Conferência física de uma caixa, gravada leitura a leitura (core/conferencias.py).
+    Fica aberta até ser finalizada: recarregar a página ou abrir a mesma caixa
+    em outra estação continua a mesma conferência.
+    """
+    ABERTA = 'aberta'
+    FINALIZADA = 'finalizada'
+    STATUS = [
+        (ABERTA, 'Aberta'),
+        (FINALIZADA, 'Finalizada'),
+    ]
+
+    caixa = models.CharField(max_length=50)
+    criador = models.ForeignKey(User, on_delete=models.CASCADE, related_name="conferencias")
+    status = models.CharField(max_length=10, choices=STATUS, default=ABERTA)
+    iniciada_em = models.DateTimeField(auto_now_add=True)
+    finalizada_em = models.DateTimeField(null=True, blank=True)
+
+    class Meta:
+        verbose_name = "Conferência de caixa"
+        verbose_name_plural = "Conferências de caixa"
+        constraints = [
+            # Uma conferência aberta por caixa: duas estações abrindo a mesma caixa caem na mesma
+            models.UniqueConstraint(fields=['caixa'], condition=models.Q(status='aberta'), name='core_conf_aberta_unica'),
+        ]
+
+    def __str__(self):
+        return f"Caixa {self.caixa} ({self.get_status_display()})"
+
+
+class LeituraConferencia(models.Model):
+    """Um processo lido na conferência, com o veredito do momento da leitura."""
+    PERMANENTE = 'permanente'
+    NA_CAIXA = 'na_caixa'
+    CAIXA_ERRADA = 'caixa_errada'
+    NAO_ENCONTRADO = 'nao_encontrado'
+    VEREDITOS = [
+        (PERMANENTE, 'Permanente'),
+        (NA_CAIXA, 'Na caixa'),
+        (CAIXA_ERRADA, 'Caixa errada'),
+        (NAO_ENCONTRADO, 'Não encontrado'),
+    ]
+
+    conferencia = models.ForeignKey(ConferenciaCaixa, on_delete=models.CASCADE, related_name="leituras")
+    # Número oficial do processo encontrado, ou o número lido quando não foi encontrado
+    numero = models.CharField(max_length=25)
+    # Só informativo: a importação completa troca os ids dos processos, então o relatório
+    # usa o 'numero'. Sem restrição no banco e sem SET_NULL, o DELETE da importação é um só
+    processo = models.ForeignKey(ProcessoPermanente, on_delete=models.DO_NOTHING, db_constraint=False, null=True, blank=True)
+    veredito = models.CharField(max_length=15, choices=VEREDITOS)
+    lida_por = models.ForeignKey(User, on_delete=models.SET_NULL, null=True, blank=True)
+    lida_em = models.DateTimeField(auto_now_add=True)
+
+    class Meta:
+        # O mesmo processo lido duas vezes (ou por duas estações) conta uma vez só
+        unique_together = ('conferencia', 'numero')
+
+    def __str__(self):
+        return self.numero
+
+
+class Geracao(models.Model):
+    """
+    Contador de geração dos dados (core/geracao.py), uma linha por contador.
+    Fica no banco e não no cache: não é descartado junto com o cache e
+    o incremento (UPDATE valor = valor + 1) é atômico entre os processos.
+    """
+    nome = models.CharField(max_length=50, primary_key=True)
+    valor = models.BigIntegerField()
+    # Timestamp da última mudança (para o Last-Modified)
+    alterada_em = models.FloatField()
+
+    class Meta:
+        verbose_name = "Geração"
+        verbose_name_plural = "Gerações"
 
     def __str__(self):
-        return f"{self.numero_digitado} (Lista: {self.listagem.titulo})"
\ No newline at end of file
+        return f"{self.nome}: {self.valor}"
@@ -0,0 +1,159 @@
+import re
+from collections import namedtuple
+
+# Um número antigo (10 dígitos) vira a chave ANO (4) + SEQUÊNCIA (5)
+TAMANHO_CHAVE_LEGADO = 9
+
+
+def apenas_numeros(texto):
+    """Remove tudo que não for dígito."""
+    return re.sub(r'\D', '', str(texto)) if texto else ''
+
+
+def chave_legado(numero_limpo):
+    """
+    Converte um número antigo de 10 dígitos na chave ANO + SEQUÊNCIA.
+    Exemplo: 9919056901 -> '199905690'
+    """
+    # 1. Ignora o último dígito (Verificador antigo)
+    corpo = numero_limpo[:-1]
+
+    # 2. Extrai o Ano (2 primeiros dígitos). Corte para 19xx vs 20xx
+    ano_prefixo = corpo[:2]
+    ano_completo = ('19' if int(ano_prefixo) > 50 else '20') + ano_prefixo
+
+    # 3. Os últimos 5 dígitos do corpo são a sequência ("DNA" do processo).
+    # Isso ignora códigos de vara no meio.
+    return ano_completo + corpo[-5:]
+
+
+def chave_legado_do_numero(numero):
+    """
+    Chave ANO + SEQUÊNCIA de um número de 15 dígitos gravado no banco.
+    Exemplo: 199971100056908 -> '199905690' (ano no início, sequência antes do DV)
+    """
+    if not numero or len(numero) != 15 or not numero.isdigit():
+        return None
+    return numero[:4] + numero[-6:-1]
+
+
+# --- Números completos: formatos aceitos, decomposição e validação ---
+
+FORMATO_ANTIGO = 'antigo'   # 10 dígitos: AA SS NNNNN D
+FORMATO_ATUAL = 'atual'     # 15 dígitos: AAAA SS VV NNNNNN D (o gravado no banco)
+FORMATO_CNJ = 'cnj'         # 20 dígitos: NNNNNNN DD AAAA J TR OOOO (numeração única do CNJ)
+FORMATOS = {10: FORMATO_ANTIGO, 15: FORMATO_ATUAL, 20: FORMATO_CNJ}
+
+# Anos aceitos nos números de 15 e 20 dígitos
+ANO_MINIMO = 1900
+ANO_MAXIMO = 2099
+
+# Separadores entre números numa lista colada
+_SEPARADORES = re.compile(r'[\s,;/]+')
+# Um número colado com ou sem pontuação (ex: 0001234-56.2019.4.04.7110)
+_TRECHO_NUMERO = re.compile(r'\d[\d.\-]*\d')
+_PONTUACAO = re.compile(r'[.\-]')
+
+NumeroProcesso = namedtuple('NumeroProcesso', 'numero formato ano segmento tribunal origem sequencia digito')
+
+
+def digitos_cnj(sequencia, ano, segmento, tribunal, origem):
+    """Dígitos verificadores (módulo 97, Resolução CNJ 65/2008) de um número de 20 dígitos."""
+    resto = int(f'{sequencia}{ano}{segmento}{tribunal}{origem}00') % 97
+    return f'{98 - resto:02d}'
+
+
+def digitos_cnj_conferem(partes):
+    """True se os dígitos verificadores de um número de 20 dígitos decomposto estão certos."""
+    numero = partes.numero
+    return partes.digito == digitos_cnj(numero[:7], numero[9:13], partes.segmento, partes.tribunal, partes.origem)
+
+
+def decompor_numero(numero_limpo):
+    """
+    Separa um número (só dígitos) nas partes do seu formato, sem validar.
+    Retorna None se o tamanho não for de nenhum formato conhecido.
+    Exemplo: 199971100056908 -> ano 1999, origem '7110', sequência 5690, dígito '8'
+    """
+    formato = FORMATOS.get(len(numero_limpo or ''))
+    if formato is None or not numero_limpo.isdigit():
+        return None
+
+    if formato == FORMATO_CNJ:
+        return NumeroProcesso(
+            numero_limpo, formato, int(numero_limpo[9:13]), numero_limpo[13], numero_limpo[14:16],
+            numero_limpo[16:20], int(numero_limpo[:7]), numero_limpo[7:9],
+        )
+    if formato == FORMATO_ATUAL:
+        return NumeroProcesso(
+            numero_limpo, formato, int(numero_limpo[:4]), None, None,
+            numero_limpo[4:8], int(numero_limpo[8:14]), numero_limpo[14],
+        )
+    # Antigo: mesmo corte de século da chave_legado
+    return NumeroProcesso(
+        numero_limpo, formato, int(chave_legado(numero_limpo)[:4]), None, None,
+        numero_limpo[2:4], int(numero_limpo[4:9]), numero_limpo[9],
+    )
+
+
+def analisar_numero(texto):
+    """
+    Decompõe e valida um número digitado ou bipado. Retorna NumeroProcesso,
+    ou None se o número não puder existir (tamanho, ano ou dígito do CNJ errado).
+    """
+    partes = decompor_numero(apenas_numeros(texto))
+    if partes is None:
+        return None
+    if partes.formato != FORMATO_ANTIGO and not ANO_MINIMO <= partes.ano <= ANO_MAXIMO:
+        return None
+    if partes.formato == FORMATO_CNJ and not digitos_cnj_conferem(partes):
+        return None
+    return partes
+
+
+def analisar_numeros(textos):
+    """analisar_numero para uma lista inteira: {texto: NumeroProcesso ou None}."""
+    return {texto: analisar_numero(texto) for texto in dict.fromkeys(textos)}
+
+
+def extrair_numeros(texto):
+    """
+    Números de 10 a 25 dígitos de um texto colado (com ou sem pontuação),
+    só com os dígitos, sem repetição e na ordem em que aparecem.
+    Espaços, ',', ';' e '/' sempre separam números. '.' e '-' só ficam dentro
+    de um número se o trecho todo tiver o tamanho de um formato conhecido
+    (10, 15 ou 20 dígitos); senão cada parte é um número
+    ('199971100056908-199971100012345' são dois).
+    """
+    numeros = []
+    for parte in _SEPARADORES.split(texto or ''):
+        for trecho in _TRECHO_NUMERO.findall(parte):
+            limpo = apenas_numeros(trecho)
+            if len(limpo) in FORMATOS:
+                numeros.append(limpo)
+            else:
+                numeros.extend(pedaco for pedaco in _PONTUACAO.split(trecho) if 10 <= len(pedaco) <= 25)
+    return list(dict.fromkeys(numeros))
+
+
+# Chaves dos números de 20 dígitos ficam acima de todas as de 15 dígitos
+BASE_CHAVE_CNJ = 10 ** 18
+
+
+def chave_numerica(numero_limpo):
+    """
+    Chave inteira de um número de 15 ou 20 dígitos (cabe num BigInteger), ou None.
+    15 dígitos: o próprio número. 20 dígitos: o número sem os dígitos
+    verificadores, somado a BASE_CHAVE_CNJ. Os 20 dígitos inteiros não cabem
+    num BigInteger; sem os verificadores, a chave só é única porque eles são
+    conferidos aqui: com dígitos errados não há chave (None), e dois números
+    que só diferem neles não disputam a mesma chave.
+    """
+    partes = decompor_numero(numero_limpo)
+    if partes is None or partes.formato == FORMATO_ANTIGO:
+        return None
+    if partes.formato == FORMATO_ATUAL:
+        return int(numero_limpo)
+    if not digitos_cnj_conferem(partes):
+        return None
+    return BASE_CHAVE_CNJ + int(numero_limpo[:7] + numero_limpo[9:])
@@ -0,0 +1,146 @@
+"""
+Pesquisa de processos pelo conteúdo: assunto, classe, localizador e órgão atual.
+
+No SQLite, uma tabela FTS5 (TABELA_FTS) indexa esses campos, lendo o texto
+da própria tabela de processos ('external content', sem cópia dos dados).
+Gatilhos no banco mantêm o índice em dia a cada insert/update/delete,
+inclusive nos bulk_create/bulk_update da importação e nos save(). A
+importação completa desliga os gatilhos e reconstrói o índice de uma vez
+no final (indice_adiado).
+
+A tabela e os gatilhos são criados depois de cada 'migrate' (garantir_indice,
+ligado ao post_migrate em apps.py): as migrações do SQLite que recriam a
+tabela de processos apagam os gatilhos junto.
+
+Em bancos sem FTS5 (PostgreSQL, SQLite compilado sem o módulo) a pesquisa
+continua funcionando com icontains: mais lenta e sem ordem de relevância.
+"""
+import logging
+import re
+from contextlib import contextmanager
+from functools import reduce
+from operator import or_
+from django.db import DEFAULT_DB_ALIAS, OperationalError, connection, connections
+from django.db.models import Q
+from .models import ProcessoPermanente, normalizar_situacao
+
+logger = logging.getLogger(__name__)
+
+CAMPOS_PESQUISA = ('assunto', 'classe', 'localizador', 'orgao_atual')
+TABELA = ProcessoPermanente._meta.db_table
+TABELA_FTS = f'{TABELA}_fts'
+LIMITE_PADRAO = 50
+
+_colunas = ', '.join(CAMPOS_PESQUISA)
+_inserir = (f"INSERT INTO {TABELA_FTS}(rowid, {_colunas}) "
+            f"VALUES (new.id, {', '.join(f'new.{campo}' for campo in CAMPOS_PESQUISA)});")
+_apagar = (f"INSERT INTO {TABELA_FTS}({TABELA_FTS}, rowid, {_colunas}) "
+           f"VALUES ('delete', old.id, {', '.join(f'old.{campo}' for campo in CAMPOS_PESQUISA)});")
+
+# Sem diferenciar maiúsculas nem acentos ('previdenciaria' acha 'Previdenciárias')
+CRIAR_TABELA = (f"CREATE VIRTUAL TABLE IF NOT EXISTS {TABELA_FTS} USING fts5({_colunas}, "
+                f"content='{TABELA}', content_rowid='id', tokenize='unicode61 remove_diacritics 2')")
+GATILHOS = {
+    f'{TABELA_FTS}_ai': f"AFTER INSERT ON {TABELA} BEGIN {_inserir} END",
+    f'{TABELA_FTS}_ad': f"AFTER DELETE ON {TABELA} BEGIN {_apagar} END",
+    # Só as colunas pesquisadas: marcar um processo como encontrado não mexe no índice
+    f'{TABELA_FTS}_au': f"AFTER UPDATE OF {_colunas} ON {TABELA} BEGIN {_apagar} {_inserir} END",
+}
+
+
+def _existe(cursor, tipo, nome):
+    cursor.execute("SELECT 1 FROM sqlite_master WHERE type = %s AND name = %s", [tipo, nome])
+    return cursor.fetchone() is not None
+
+
+def fts_disponivel():
+    """True se o banco tem o índice FTS5 (SQLite com o módulo e 'migrate' já rodado)."""
+    if connection.vendor != 'sqlite':
+        return False
+    with connection.cursor() as cursor:
+        return _existe(cursor, 'table', TABELA_FTS)
+
+
+def garantir_indice(using=DEFAULT_DB_ALIAS, **kwargs):
+    """
+    Cria a tabela FTS5 e os gatilhos que faltarem. Se faltava algum gatilho, o
+    índice pode ter perdido alterações e é reconstruído. Retorna False sem FTS5.
+    """
+    conexao = connections[using]
+    if conexao.vendor != 'sqlite':
+        return False
+    try:
+        with conexao.cursor() as cursor:
+            faltando = [nome for nome in GATILHOS if not _existe(cursor, 'trigger', nome)]
+            cursor.execute(CRIAR_TABELA)
+            for nome in faltando:
+                cursor.execute(f'CREATE TRIGGER IF NOT EXISTS {nome} {GATILHOS[nome]}')
+            if faltando:
+                cursor.execute(f"INSERT INTO {TABELA_FTS}({TABELA_FTS}) VALUES ('rebuild')")
+    except OperationalError as erro:
+        # "no such module: fts5"
+        logger.warning('Pesquisa por conteúdo sem FTS5 (%s): usando icontains.', erro)
+        return False
+    return True
+
+
+@contextmanager
+def indice_adiado():
+    """Para cargas grandes: desliga os gatilhos e reconstrói o índice uma vez no final."""
+    if not fts_disponivel():
+        yield
+        return
+    with connection.cursor() as cursor:
+        for nome in GATILHOS:
+            cursor.execute(f'DROP TRIGGER IF EXISTS {nome}')
+    try:
+        yield
+    finally:
+        garantir_indice()
+
+
+def consulta_fts(palavras):
+    """['imposto', 'rend'] -> '"imposto"* "rend"*' (todas as palavras, como começo de palavra)."""
+    return ' '.join(f'"{palavra}"*' for palavra in palavras)
+
+
+def pesquisar_processos(texto, caixa=None, situacao=None, limite=LIMITE_PADRAO, modo=None):
+    """
+    Processos com todas as palavras de 'texto' no assunto, classe, localizador
+    ou órgão atual, os mais relevantes primeiro, filtrados pela caixa e pela
+    situação (normalizada) quando informadas.
+    Retorna (lista de processos, modo), com modo 'fts' ou 'icontains'
+    (modo=None escolhe 'fts' quando disponível; 'icontains' força o LIKE).
+    """
+    if modo is None:
+        modo = 'fts' if fts_disponivel() else 'icontains'
+    palavras = re.findall(r'\w+', texto or '')
+    if not palavras:
+        return [], modo
+
+    processos = ProcessoPermanente.objects.only('id', 'numero', 'caixa', 'situacao', *CAMPOS_PESQUISA)
+    if caixa:
+        processos = processos.filter(caixa=caixa)
+    if situacao:
+        processos = processos.filter(situacao_normalizada__nome=normalizar_situacao(situacao))
+
+    if modo == 'icontains':
+        # Cada palavra em algum dos campos (LIKE '%palavra%': varre a tabela)
+        for palavra in palavras:
+            processos = processos.filter(reduce(or_, (Q(**{f'{campo}__icontains': palavra}) for campo in CAMPOS_PESQUISA)))
+        return list(processos.order_by('numero')[:limite]), modo
+
+    sql = f'SELECT rowid FROM {TABELA_FTS} WHERE {TABELA_FTS} MATCH %s'
+    parametros = [consulta_fts(palavras)]
+    if caixa or situacao:
+        filtro, parametros_filtro = processos.values('id').query.sql_with_params()
+        # '+rowid': o filtro não vai para o FTS5 como restrição de rowid (que refaria o MATCH a cada id);
+        # a subconsulta roda uma vez e só filtra os resultados do MATCH
+        sql += f' AND +rowid IN ({filtro})'
+        parametros += list(parametros_filtro)
+    with connection.cursor() as cursor:
+        cursor.execute(sql + ' ORDER BY rank LIMIT %s', parametros + [limite])
+        ids = [linha[0] for linha in cursor.fetchall()]
+
+    por_id = processos.in_bulk(ids)
+    return [por_id[pk] for pk in ids if pk in por_id], modo
@@ -1,3 +1,749 @@
-from django.test import TestCase
+import json
+import os
+import tempfile
+from io import StringIO
+from unittest import mock
+from asgiref.testing import ApplicationCommunicator
+from django.contrib import admin
+from django.contrib.auth.models import User
+from django.core.cache import cache, caches
+from django.core.management import call_command
+from django.core.management.base import CommandError
+from django.db import connection
+from django.test import TestCase, modify_settings, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.utils import timezone
+from .admin import ProcessoPermanenteAdmin
+from .busca import buscar_por_partes, buscar_processos_em_lote
+from .cache_processos import (NAO_ENCONTRADO, CacheCompartilhado, CacheLocal, consultar_processo, consultar_processos,
+                              obter_cache)
+from .conferencia_ws import SessaoConferencia
+from .conferencias import abrir_conferencia
+from .filtro import reconstruir_filtro
+from .importacao import carregar_mapa
+from .management.commands.gerar_chaves_legado import Command as GerarChavesLegado
+from .management.commands.importar_dados import Command as ImportarDados
+from .geracao import nova_geracao, obter_geracao
+from .medicao import medicoes
+from .models import ItemProcesso, Listagem, ProcessoPermanente, VerificacaoLote
+from .numeros import FORMATO_ANTIGO, FORMATO_CNJ, analisar_numero, chave_numerica, digitos_cnj, extrair_numeros
+from .pesquisa import pesquisar_processos
+from .verificacoes import pegar_proxima, processar_fila
 
-# Create your tests here.
+CACHE_MEMORIA = {
+    'default': {'BACKEND': 'django.core.cache.backends.locmem.LocMemCache'},
+    'processos': {'BACKEND': 'django.core.cache.backends.locmem.LocMemCache', 'LOCATION': 'processos'},
+}
+
+
+@override_settings(CACHES=CACHE_MEMORIA)
+class CacheProcessosTests(TestCase):
+
+    def setUp(self):
+        obter_cache().limpar()
+
+    def test_segunda_consulta_nao_vai_ao_banco(self):
+        processo = ProcessoPermanente.objects.create(numero='199971100056908', caixa='10')
+        self.assertEqual(consultar_processo('199971100056908').id, processo.id)
+        self.assertIsNone(consultar_processo('123'))
+        with self.assertNumQueries(0):
+            self.assertEqual(consultar_processo('199971100056908').caixa, '10')
+            # "Não encontrado" também fica no cache
+            self.assertIsNone(consultar_processo('123'))
+
+    def test_save_de_campo_rastreado_invalida(self):
+        processo = ProcessoPermanente.objects.create(numero='199971100056908', caixa='10')
+        consultar_processo('199971100056908')
+        with self.captureOnCommitCallbacks(execute=True):
+            processo.caixa = '20'
+            processo.save()
+        self.assertEqual(consultar_processo('199971100056908').caixa, '20')
+
+    def test_compartilhado_le_a_geracao_uma_vez(self):
+        compartilhado = CacheCompartilhado(caches['processos'])
+        with self.assertNumQueries(1):
+            _, faltando, geracao = compartilhado.obter_varios(['123'])
+        self.assertEqual(faltando, ['123'])
+        nova_geracao()
+        # Guarda com a geração da leitura, sem consultar de novo: fica sob a geração velha
+        with self.assertNumQueries(0):
+            compartilhado.guardar_varios({'123': NAO_ENCONTRADO}, geracao)
+        self.assertEqual(compartilhado.obter_varios(['123'])[1], ['123'])
+
+    def test_local_descarta_o_lido_numa_geracao_velha(self):
+        local = CacheLocal(10)
+        _, _, geracao = local.obter_varios(['123'])
+        local.limpar()  # como o ouvinte faz quando este processo muda a geração
+        local.guardar_varios({'123': NAO_ENCONTRADO}, geracao)
+        self.assertEqual(local.obter_varios(['123'])[1], ['123'])
+
+    def test_operacoes_em_massa_invalidam(self):
+        processo = ProcessoPermanente.objects.create(numero='199971100056908', caixa='10')
+        consultar_processo('199971100056908')
+        with self.captureOnCommitCallbacks(execute=True):
+            ProcessoPermanente.objects.filter(pk=processo.pk).update(caixa='20')
+        self.assertEqual(consultar_processo('199971100056908').caixa, '20')
+
+        # Marcar como encontrado não muda nada do que o cache guarda
+        geracao = obter_geracao()
+        with self.captureOnCommitCallbacks(execute=True):
+            ProcessoPermanente.objects.filter(pk=processo.pk).update(data_encontrado=timezone.now())
+        self.assertEqual(obter_geracao(), geracao)
+
+        # Como a ação "apagar selecionados" do admin
+        with self.captureOnCommitCallbacks(execute=True):
+            ProcessoPermanente.objects.filter(pk=processo.pk).delete()
+        self.assertIsNone(consultar_processo('199971100056908'))
+
+    def test_geracao_fica_no_banco(self):
+        inicial = obter_geracao()
+        self.assertEqual(nova_geracao(), inicial + 1)
+        # Esvaziar o cache (ou o descarte de entradas) não muda a geração
+        cache.clear()
+        self.assertEqual(obter_geracao(), inicial + 1)
+
+
+@override_settings(CACHES=CACHE_MEMORIA)
+class ConferenciaWebSocketTests(TestCase):
+    """Conferência de caixa pelo WebSocket, usando o ASGI em processo."""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.usuario = User.objects.create_user('conferente', password='senha')
+        ProcessoPermanente.objects.create(numero='199971100056908', caixa='10', situacao='Baixado')
+        ProcessoPermanente.objects.create(numero='200171100012345', caixa='20', situacao='Baixado')
+        ProcessoPermanente.objects.create(numero='200271100099999', caixa='10', situacao='PERMANENTE')
+
+    async def conectar(self, caminho='/ws/conferencia/', cookie=True):
+        from permanentes.asgi import application
+
+        headers = []
+        if cookie:
+            await self.async_client.aforce_login(self.usuario)
+            headers.append((b'cookie', f'sessionid={self.async_client.cookies["sessionid"].value}'.encode()))
+        comunicador = ApplicationCommunicator(application, {
+            'type': 'websocket', 'path': caminho, 'query_string': b'caixa=10', 'headers': headers,
+        })
+        await comunicador.send_input({'type': 'websocket.connect'})
+        return comunicador
+
+    async def receber(self, comunicador):
+        return json.loads((await comunicador.receive_output())['text'])
+
+    async def test_vereditos_e_placar(self):
+        comunicador = await self.conectar()
+        self.assertEqual((await comunicador.receive_output())['type'], 'websocket.accept')
+        sessao = await self.receber(comunicador)
+        self.assertEqual(sessao['placar']['esperados'], 2)
+
+        numeros = ['9919056901', '200171100012345', '200271100099999', '123', '9919056901']
+        await comunicador.send_input({'type': 'websocket.receive', 'text': json.dumps({'numeros': numeros})})
+        vereditos = [await self.receber(comunicador) for _ in numeros]
+
+        self.assertEqual(
+            [v['veredito'] for v in vereditos],
+            ['na_caixa', 'caixa_errada', 'permanente', 'nao_encontrado', 'na_caixa'],
+        )
+        self.assertEqual(vereditos[1]['caixa_origem'], '20')
+        self.assertTrue(vereditos[-1]['repetido'])
+        self.assertEqual(vereditos[-1]['placar'], {
+            'esperados': 2, 'na_caixa': 1, 'caixa_errada': 1, 'nao_encontrado': 1, 'permanente': 1,
+        })
+
+        await comunicador.send_input({'type': 'websocket.disconnect', 'code': 1000})
+        await comunicador.wait()
+
+    async def test_recusa_sem_login(self):
+        comunicador = await self.conectar(cookie=False)
+        self.assertEqual(await comunicador.receive_output(), {'type': 'websocket.close', 'code': 4401})
+
+
+@override_settings(CACHES=CACHE_MEMORIA)
+class ConferenciaCaixaTests(TestCase):
+    """Conferência de caixa gravada no servidor, pelo HTTP."""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.usuario = User.objects.create_user('conferente', password='senha')
+        ProcessoPermanente.objects.create(numero='199971100056908', caixa='10', situacao='Baixado')
+        ProcessoPermanente.objects.create(numero='200171100012345', caixa='20', situacao='Baixado')
+        ProcessoPermanente.objects.create(numero='200271100088888', caixa='10', situacao='Baixado')
+
+    def setUp(self):
+        obter_cache().limpar()
+        self.client.force_login(self.usuario)
+
+    def abrir(self):
+        return self.client.post('/conferir-caixa/abrir/', {'caixa': '10'}, content_type='application/json').json()
+
+    def ler(self, conferencia, numeros):
+        return self.client.post(conferencia['url_leituras'], {'numeros': numeros}, content_type='application/json')
+
+    def test_retoma_e_monta_relatorio(self):
+        conferencia = self.abrir()
+        resposta = self.ler(conferencia, ['9919056908', '200171100012345', '123']).json()
+        self.assertEqual([r['veredito'] for r in resposta['resultados']], ['na_caixa', 'caixa_errada', 'nao_encontrado'])
+        self.assertEqual(resposta['placar']['esperados'], 2)
+
+        # Recarregar a página (ou abrir em outra estação) continua a mesma conferência
+        retomada = self.abrir()
+        self.assertEqual(retomada['id'], conferencia['id'])
+        self.assertEqual([l['numero'] for l in retomada['leituras']], ['199971100056908', '200171100012345', '123'])
+        # O mesmo processo em outro formato é repetido e não conta de novo
+        resposta = self.ler(conferencia, ['199971100056908']).json()
+        self.assertTrue(resposta['resultados'][0]['repetido'])
+        self.assertEqual(resposta['placar']['na_caixa'], 1)
+
+        # Uma importação completa no meio da conferência troca os ids: o relatório cruza pelos números
+        dados = list(ProcessoPermanente.objects.values('numero', 'caixa', 'situacao'))
+        ProcessoPermanente.objects.all().delete()
+        ProcessoPermanente.objects.bulk_create(ProcessoPermanente(**processo) for processo in dados)
+
+        relatorio = self.client.post(conferencia['url_finalizar'], follow=True)
+        self.assertEqual(list(relatorio.context['faltantes']), ['200271100088888'])
+        self.assertEqual(relatorio.context['excedentes'][0].caixa_origem, '20')
+        self.assertEqual([l.numero for l in relatorio.context['excedentes']], ['200171100012345', '123'])
+        self.assertEqual(self.ler(conferencia, ['200271100088888']).status_code, 409)
+        self.assertNotEqual(self.abrir()['id'], conferencia['id'])
+
+    def test_placar_do_websocket_inclui_outras_estacoes(self):
+        conferencia = abrir_conferencia('10', self.usuario)
+        estacao_a, estacao_b = SessaoConferencia(conferencia, self.usuario), SessaoConferencia(conferencia, self.usuario)
+        estacao_a.registrar(['199971100056908'])
+        vereditos = estacao_b.registrar(['200271100088888', '9919056908'])
+        self.assertTrue(vereditos[-1]['repetido'])
+        self.assertEqual(vereditos[-1]['placar']['na_caixa'], 2)
+
+
+@override_settings(CACHES=CACHE_MEMORIA)
+class AdicionarListagemTests(TestCase):
+    """Bipagem em lote na listagem: marcação condicional e itens num bulk_create."""
+
+    def setUp(self):
+        obter_cache().limpar()
+        self.ana = User.objects.create_user('ana', password='senha')
+        self.bia = User.objects.create_user('bia', password='senha')
+        self.processo = ProcessoPermanente.objects.create(numero='199971100056908', situacao='PERMANENTE')
+
+    def adicionar(self, usuario, numeros):
+        listagem = Listagem.objects.create(titulo='0001/25/25', criador=usuario)
+        self.client.force_login(usuario)
+        return listagem, self.client.post(f'/listagem/{listagem.pk}/adicionar/', {'numeros': numeros},
+                                          content_type='application/json').json()
+
+    def test_quem_encontrou_primeiro_fica_registrado(self):
+        listagem_ana, dados = self.adicionar(self.ana, ['199971100056908'])
+        self.assertTrue(dados['permanentes'][0]['primeiro'])
+
+        listagem_bia, dados = self.adicionar(self.bia, ['199971100056908', '200171100012345', '200171100012345', '123'])
+        self.assertFalse(dados['permanentes'][0]['primeiro'])
+        self.assertEqual(dados['permanentes'][0]['encontrado_por'], 'ana')
+        self.assertEqual([a['numero'] for a in dados['adicionados']], ['200171100012345'])
+        self.assertEqual(dados['invalidos'], ['123'])
+
+        self.processo.refresh_from_db()
+        self.assertEqual((self.processo.encontrado_por, self.processo.listagem_encontrado), (self.ana, listagem_ana))
+        resposta = self.client.post(f'/listagem/{listagem_bia.pk}/adicionar/', {'numeros': ['200171100012345']},
+                                    content_type='application/json')
+        self.assertEqual(resposta.json()['repetidos'], ['200171100012345'])
+
+    def test_lote_com_encontrados_e_novos(self):
+        encontrados = [f'2001711{i:08d}' for i in range(3)]
+        with self.captureOnCommitCallbacks(execute=True):
+            for numero in encontrados:
+                ProcessoPermanente.objects.create(numero=numero)
+        novos = [f'2002711{i:08d}' for i in range(400)]
+        listagem, dados = self.adicionar(self.ana, novos + encontrados)
+        self.assertEqual(sorted(p['numero'] for p in dados['permanentes']), encontrados)
+        self.assertTrue(all(p['primeiro'] for p in dados['permanentes']))
+        self.assertEqual(len(dados['adicionados']), 400)
+        self.assertEqual(listagem.itens.count(), 400)
+        self.assertEqual(ProcessoPermanente.objects.filter(encontrado_por=self.ana, listagem_encontrado=listagem).count(), 3)
+
+    def test_id_velho_no_cache(self):
+        consultar_processos(['199971100056908'])
+        # Reimportado com outro id, sem o cache saber
+        ProcessoPermanente.objects.filter(pk=self.processo.pk).update(id=self.processo.pk + 1000)
+        _, dados = self.adicionar(self.ana, ['199971100056908'])
+        self.assertEqual(dados['permanentes'][0]['numero'], '199971100056908')
+        self.assertTrue(dados['permanentes'][0]['primeiro'])
+        self.assertEqual(ProcessoPermanente.objects.get(numero='199971100056908').encontrado_por, self.ana)
+
+
+@override_settings(CACHES=CACHE_MEMORIA)
+class PesquisaTests(TestCase):
+    """Pesquisa por conteúdo: índice FTS5 mantido pelos gatilhos e o fallback com icontains."""
+
+    def setUp(self):
+        self.renda = ProcessoPermanente.objects.create(
+            numero='199971100056908', caixa='10', situacao='Baixado',
+            assunto='Imposto de Renda - Restituição', classe='Procedimento Comum',
+        )
+        self.fiscal = ProcessoPermanente.objects.create(
+            numero='200171100012345', caixa='20', situacao='PERMANENTE',
+            assunto='Imposto de Renda - Cobrança', classe='Execução Fiscal', localizador='Arquivo Permanente',
+        )
+
+    def numeros(self, texto, **filtros):
+        processos, modo = pesquisar_processos(texto, **filtros)
+        return [processo.numero for processo in processos], modo
+
+    def test_sem_acento_por_prefixo_e_com_filtros(self):
+        self.assertEqual(self.numeros('restituicao'), (['199971100056908'], 'fts'))
+        self.assertEqual(self.numeros('EXECUCAO fisc'), (['200171100012345'], 'fts'))
+        self.assertEqual(sorted(self.numeros('imposto renda')[0]), ['199971100056908', '200171100012345'])
+        self.assertEqual(self.numeros('imposto', caixa='20')[0], ['200171100012345'])
+        self.assertEqual(self.numeros('imposto', situacao='permanente ')[0], ['200171100012345'])
+        self.assertEqual(self.numeros('imposto', caixa='10', situacao='Permanente')[0], [])
+
+    def test_gatilhos_acompanham_save_e_delete(self):
+        self.renda.assunto = 'FGTS - Revisão'
+        self.renda.save()
+        self.assertEqual(self.numeros('fgts')[0], ['199971100056908'])
+        self.assertEqual(self.numeros('restituicao')[0], [])
+        self.fiscal.delete()
+        self.assertEqual(self.numeros('imposto')[0], [])
+
+    def test_icontains_e_endpoint(self):
+        self.assertEqual(self.numeros('Restituição', modo='icontains'), (['199971100056908'], 'icontains'))
+        self.client.force_login(User.objects.create_user('ana', password='senha'))
+        dados = self.client.get('/ajax/pesquisar/', {'q': 'arquivo permanente'}).json()
+        self.assertEqual(dados['modo'], 'fts')
+        self.assertEqual([processo['numero'] for processo in dados['processos']], ['200171100012345'])
+        self.assertEqual(dados['processos'][0]['classe'], 'Execução Fiscal')
+
+
+@override_settings(CACHES=CACHE_MEMORIA)
+class ImportacaoTests(TestCase):
+
+    def setUp(self):
+        self.diretorio = tempfile.TemporaryDirectory()
+        self.addCleanup(self.diretorio.cleanup)
+        filtro = override_settings(FILTRO_PROCESSOS_ARQUIVO=os.path.join(self.diretorio.name, 'filtro.bin'))
+        filtro.enable()
+        self.addCleanup(filtro.disable)
+        ProcessoPermanente.objects.create(numero='199971100056908', caixa='10')
+
+    def csv(self, nome, conteudo):
+        caminho = os.path.join(self.diretorio.name, nome)
+        with open(caminho, 'w', encoding='utf-8') as arquivo:
+            arquivo.write(conteudo)
+        return caminho
+
+    def test_cabecalho_errado_nao_apaga_o_banco(self):
+        bom = self.csv('bom.csv', 'Processo,Caixa\n200171100012345,20\n')
+        ruim = self.csv('ruim.csv', 'Numero do Processo,Caixa\n200171100012346,20\n')
+        with self.assertRaisesMessage(CommandError, 'coluna do número do processo não encontrada'):
+            call_command('importar_dados', bom, ruim, '--yes', stdout=StringIO())
+        self.assertEqual(list(ProcessoPermanente.objects.values_list('numero', flat=True)), ['199971100056908'])
+
+    def test_limpeza_e_um_delete_so(self):
+        # Nenhuma chave estrangeira com SET_NULL/CASCADE aponta para os processos
+        with self.assertNumQueries(1):
+            ProcessoPermanente.objects.all().delete()
+
+    def test_leitura_paralela_em_lotes(self):
+        arquivos = [
+            self.csv(f'vara{vara}.csv', 'Processo,Caixa\n' + ''.join(f'2001711{vara}{i:07d},{vara}\n' for i in range(7)))
+            for vara in (1, 2)
+        ]
+        call_command('importar_dados', *arquivos, '--yes', '--workers', '2', '--batch-size', '3', stdout=StringIO())
+        self.assertEqual(ProcessoPermanente.objects.count(), 14)
+        self.assertEqual(ProcessoPermanente.objects.filter(caixa='2').count(), 7)
+
+    def test_numero_repetido_nao_apaga_o_banco(self):
+        vara1 = self.csv('vara1.csv', 'Processo,Caixa\n200171100000001,1\n200171100000002,1\n')
+        vara2 = self.csv('vara2.csv', 'Processo,Caixa\n200171100000003,2\n2001.71.10.000000-2,2\n')
+        for workers in ('1', '2'):
+            saida = StringIO()
+            with self.assertRaisesMessage(CommandError, '1 números repetidos'):
+                call_command('importar_dados', vara1, vara2, '--yes', '--workers', workers, stdout=saida)
+            self.assertIn(f'{vara2}: 200171100000002 repete {vara1}: 200171100000002', saida.getvalue())
+            self.assertEqual(list(ProcessoPermanente.objects.values_list('numero', flat=True)), ['199971100056908'])
+
+    def test_cnj_que_so_difere_nos_digitos_verificadores(self):
+        cnj = '0001234' + digitos_cnj('0001234', '2019', '4', '04', '7110') + '2019404' + '7110'
+        errado = cnj[:7] + f'{(int(cnj[7:9]) + 1) % 100:02d}' + cnj[9:]
+        arquivo = self.csv('vara.csv', f'Processo,Caixa\n{cnj},1\n{errado},1\n')
+        call_command('importar_dados', arquivo, '--yes', stdout=StringIO())
+        self.assertEqual(dict(ProcessoPermanente.objects.values_list('numero', 'chave')),
+                         {cnj: chave_numerica(cnj), errado: None})
+
+    def test_falha_na_carga_mantem_a_tabela_antiga(self):
+        arquivo = self.csv('vara.csv', 'Processo,Caixa\n' + ''.join(f'2001711{i:08d},1\n' for i in range(6)))
+        # Falha depois do primeiro lote já gravado
+        with mock.patch.object(ImportarDados, 'mostrar_progresso', side_effect=RuntimeError('disco cheio')):
+            with self.assertRaisesMessage(RuntimeError, 'disco cheio'):
+                call_command('importar_dados', arquivo, '--yes', '--batch-size', '2', stdout=StringIO())
+        self.assertEqual(list(ProcessoPermanente.objects.values_list('numero', flat=True)), ['199971100056908'])
+
+    def test_leitura_paralela_interrompida_nao_trava(self):
+        arquivos = [
+            self.csv(f'vara{vara}.csv', 'Processo,Caixa\n' + ''.join(f'2001711{vara}{i:07d},{vara}\n' for i in range(200)))
+            for vara in (1, 2, 3)
+        ]
+        comando = ImportarDados(stdout=StringIO())
+        comando.mapa, comando.delimitador, comando.workers, comando.batch_size = carregar_mapa(), ',', 2, 1
+        linhas = comando.ler_linhas(arquivos)
+        next(linhas)
+        # Como quando a gravação falha: a fila fica cheia e os auxiliares, presos no put()
+        linhas.close()
+
+    def test_atualizar_insere_e_agrupa_as_colunas_alteradas(self):
+        base = self.csv('base.csv', 'Processo,Caixa,Situacao\n'
+                        '200171100000001,10,Baixado\n200171100000002,10,Baixado\n'
+                        '200171100000003,10,Baixado\n200171100000004,10,Baixado\n')
+        call_command('importar_dados', base, '--yes', stdout=StringIO())
+        ids = dict(ProcessoPermanente.objects.values_list('numero', 'id'))
+
+        novo = self.csv('novo.csv', 'Processo,Caixa,Situacao\n'
+                        '200171100000001,10,Baixado\n'                              # inalterado
+                        '200171100000002,20,Baixado\n200171100000003,20,Baixado\n'  # só a caixa
+                        '200171100000004,10,Arquivado\n'                            # situação (e derivados)
+                        '200171100000005,30,Baixado\n')                             # novo
+        saida = StringIO()
+        with CaptureQueriesContext(connection) as consultas:
+            call_command('importar_dados', novo, '--atualizar', stdout=saida)
+
+        self.assertIn('1 inseridos, 3 atualizados, 1 inalterados, 0 removidos', saida.getvalue())
+        # Um bulk_update por conjunto de colunas alteradas, não um por processo
+        atualizacoes = [c['sql'] for c in consultas.captured_queries
+                        if c['sql'].startswith('UPDATE "core_processopermanente"')]
+        self.assertEqual(len(atualizacoes), 2)
+        # Os existentes são atualizados no lugar (mesmo id)
+        processos = {p.numero: p for p in ProcessoPermanente.objects.all()}
+        self.assertEqual(processos['200171100000002'].id, ids['200171100000002'])
+        self.assertEqual(processos['200171100000003'].caixa, '20')
+        self.assertEqual(processos['200171100000004'].situacao, 'Arquivado')
+        self.assertEqual(processos['200171100000005'].caixa, '30')
+        self.assertEqual(len(processos), 5)
+
+    def test_atualizar_removendo_ausentes(self):
+        ProcessoPermanente.objects.create(numero='200171100000009', caixa='10')
+        arquivo = self.csv('novo.csv', 'Processo,Caixa\n199971100056908,10\n200171100000001,20\n')
+        saida = StringIO()
+        call_command('importar_dados', arquivo, '--atualizar', '--remover-ausentes', stdout=saida)
+        self.assertIn('1 removidos', saida.getvalue())
+        self.assertEqual(sorted(ProcessoPermanente.objects.values_list('numero', flat=True)),
+                         ['199971100056908', '200171100000001'])
+
+    def test_remover_ausentes_exige_atualizar(self):
+        arquivo = self.csv('novo.csv', 'Processo,Caixa\n200171100000001,20\n')
+        with self.assertRaisesMessage(CommandError, '--atualizar'):
+            call_command('importar_dados', arquivo, '--yes', '--remover-ausentes', stdout=StringIO())
+        self.assertEqual(list(ProcessoPermanente.objects.values_list('numero', flat=True)), ['199971100056908'])
+
+
+class ProcessosCaixaTests(TestCase):
+    """Lista de processos da caixa (JSON em streaming, paginado e com ETag)."""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.usuario = User.objects.create_user('conferente', password='senha')
+        for numero in ('199971100000003', '199971100000001', '199971100000002'):
+            ProcessoPermanente.objects.create(numero=numero, caixa='10', situacao='Baixado')
+
+    def setUp(self):
+        self.client.force_login(self.usuario)
+
+    def listar(self, **parametros):
+        resposta = self.client.get('/ajax/get-processos/', {'caixa': '10', **parametros})
+        return resposta, json.loads(b''.join(resposta.streaming_content))
+
+    def test_paginas_e_cursor(self):
+        resposta, dados = self.listar(limite=2)
+        self.assertEqual([p['numero'] for p in dados['processos']], ['199971100000001', '199971100000002'])
+        self.assertEqual(dados['proximo'], '199971100000002')
+
+        _, dados = self.listar(limite=2, apos=dados['proximo'])
+        self.assertEqual([p['numero'] for p in dados['processos']], ['199971100000003'])
+        self.assertIsNone(dados['proximo'])
+
+    def test_304_enquanto_a_geracao_nao_muda(self):
+        resposta, _ = self.listar()
+        etag = resposta['ETag']
+        repetida = self.client.get('/ajax/get-processos/', {'caixa': '10'}, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(repetida.status_code, 304)
+
+        with self.captureOnCommitCallbacks(execute=True):
+            ProcessoPermanente.objects.create(numero='199971100000004', caixa='10')
+        resposta, dados = self.listar()
+        self.assertNotEqual(resposta['ETag'], etag)
+        self.assertEqual(len(dados['processos']), 4)
+
+
+@override_settings(CACHES=CACHE_MEMORIA, MEDICAO_LIMITE_CONSULTAS=4)
+@modify_settings(MIDDLEWARE={'prepend': 'core.medicao.MedicaoMiddleware'})
+class MedicaoTests(TestCase):
+
+    def setUp(self):
+        medicoes.limpar()
+        self.usuario = User.objects.create_user('chefe', password='senha', is_staff=True)
+        self.client.force_login(self.usuario)
+
+    def test_server_timing_e_resumo(self):
+        resposta = self.client.get('/ajax/checar-processo/', {'numero': '199971100056908'})
+        self.assertIn('db;dur=', resposta['Server-Timing'])
+
+        resumo = self.client.get('/ajax/estatisticas-requisicoes/').json()['views']
+        self.assertEqual(resumo['checar_processo_individual']['requisicoes'], 1)
+
+    def test_aviso_acima_do_limite_de_consultas(self):
+        with self.assertLogs('core.medicao', 'WARNING') as log:
+            self.client.post('/listagem/nova/', {'titulo': 'T', 'processos': ['199971100000001']})
+        self.assertIn('(criar_listagem) fez', log.output[0])
+
+
+@override_settings(CACHES=CACHE_MEMORIA)
+class QuantidadeConsultasTests(TestCase):
+    """As páginas fazem o mesmo número de consultas com poucas ou muitas linhas."""
+
+    def setUp(self):
+        self.usuario = User.objects.create_user('chefe', password='senha', is_staff=True, is_superuser=True)
+        self.client.force_login(self.usuario)
+
+    def criar_listagens(self, quantidade):
+        for _ in range(quantidade):
+            inicio = Listagem.objects.count()
+            listagem = Listagem.objects.create(titulo=f'{inicio:04d}/TT/25', criador=self.usuario)
+            ItemProcesso.objects.create(listagem=listagem, numero_digitado=f'{inicio:015d}', e_permanente=True)
+            ProcessoPermanente.objects.create(
+                numero=f'{inicio + 1:015d}', listagem_encontrado=listagem, encontrado_por=self.usuario,
+            )
+
+    def consultas(self, url):
+        with CaptureQueriesContext(connection) as capturadas:
+            self.assertEqual(self.client.get(url).status_code, 200)
+        return len(capturadas)
+
+    def assertConsultasConstantes(self, url):
+        self.criar_listagens(2)
+        poucas = self.consultas(url)
+        self.criar_listagens(8)
+        self.assertEqual(self.consultas(url), poucas)
+
+    def test_home(self):
+        self.assertConsultasConstantes('/')
+
+    def test_admin_listagens(self):
+        self.assertConsultasConstantes('/admin/core/listagem/')
+
+    def test_admin_itens(self):
+        self.assertConsultasConstantes('/admin/core/itemprocesso/')
+
+    def test_admin_processos(self):
+        self.assertConsultasConstantes('/admin/core/processopermanente/')
+
+    def test_consultas_principais_usam_indice(self):
+        # Falha com CommandError se alguma consulta varrer uma tabela inteira
+        call_command('verificar_indices', stdout=StringIO())
+
+    def test_contagens_da_listagem(self):
+        self.criar_listagens(1)
+        listagem = Listagem.objects.com_contagens().get()
+        self.assertEqual((listagem.qtd_itens, listagem.qtd_itens_permanentes, listagem.qtd_encontrados), (1, 1, 1))
+
+    def test_contagens_com_itens_e_encontrados_na_mesma_listagem(self):
+        listagem = Listagem.objects.create(titulo='0001/TT/25', criador=self.usuario)
+        vazia = Listagem.objects.create(titulo='0002/TT/25', criador=self.usuario)
+        for i in range(3):
+            ItemProcesso.objects.create(listagem=listagem, numero_digitado=f'{i:015d}', e_permanente=i == 0)
+        for i in range(4):
+            ProcessoPermanente.objects.create(numero=f'{100 + i:015d}', listagem_encontrado=listagem)
+        contagens = {l.pk: (l.qtd_itens, l.qtd_itens_permanentes, l.qtd_encontrados)
+                     for l in Listagem.objects.com_contagens()}
+        self.assertEqual(contagens, {listagem.pk: (3, 1, 4), vazia.pk: (0, 0, 0)})
+
+
+@override_settings(CACHES=CACHE_MEMORIA, VERIFICACAO_LIMITE_SINCRONO=2, VERIFICACAO_WORKER_NA_THREAD=False)
+class VerificacaoSegundoPlanoTests(TestCase):
+
+    def setUp(self):
+        self.usuario = User.objects.create_user('conferente', password='senha')
+        self.client.force_login(self.usuario)
+        ProcessoPermanente.objects.create(numero='199971100056908', caixa='10', situacao='PERMANENTE')
+
+    def test_lista_grande_vai_para_a_fila(self):
+        texto = '199971100056908\n9971056908\n200071100000001'
+        resposta = self.client.post('/verificar-em-lote/', {'lista_processos': texto})
+        verificacao = VerificacaoLote.objects.get()
+        self.assertRedirects(resposta, f'/verificar-em-lote/{verificacao.pk}/')
+        self.assertTemplateUsed(self.client.get(resposta['Location']), 'core/verificacao_andamento.html')
+
+        self.assertEqual(processar_fila(), 1)
+        progresso = self.client.get(f'/verificar-em-lote/{verificacao.pk}/progresso/').json()
+        self.assertEqual((progresso['status'], progresso['processados']), ('concluida', 3))
+
+        relatorio = self.client.get(resposta['Location'])
+        # O número novo e o antigo levam ao mesmo processo permanente
+        self.assertEqual(len(relatorio.context['lista_permanentes']), 1)
+        self.assertEqual(relatorio.context['nao_encontrados'], ['200071100000001'])
+
+        csv = b''.join(self.client.get(f'/verificar-em-lote/{verificacao.pk}/csv/').streaming_content).decode()
+        self.assertEqual(len(csv.splitlines()), 4)
+        self.assertIn('9971056908,Sim,199971100056908,10,PERMANENTE,Sim', csv)
+
+        # A importação completa troca o id do processo: o resultado guarda o número e continua valendo
+        ProcessoPermanente.objects.all().delete()
+        ProcessoPermanente.objects.create(numero='199971100056908', caixa='11', situacao='PERMANENTE')
+        relatorio = self.client.get(resposta['Location'])
+        self.assertEqual([p.caixa for p in relatorio.context['lista_permanentes']], ['11'])
+
+    def test_verificacao_pega_uma_vez_so(self):
+        self.client.post('/verificar-em-lote/', {'lista_processos': '199971100056908 200071100000001 200171100000001'})
+        self.assertIsNotNone(pegar_proxima())
+        self.assertIsNone(pegar_proxima())
+
+
+@override_settings(FILTRO_PROCESSOS_ARQUIVO=None)
+class BuscaEmLoteTests(TestCase):
+    """buscar_processos_em_lote: blocos de 'chave__in', formatos misturados e números antigos."""
+
+    def criar(self, numeros, **campos):
+        processos = [ProcessoPermanente(numero=numero, **campos) for numero in numeros]
+        for processo in processos:
+            processo.atualizar_campos_derivados()
+        return ProcessoPermanente.objects.bulk_create(processos)
+
+    def test_mais_de_um_bloco(self):
+        existentes = [f'2001711{i:07d}1' for i in range(950)]
+        self.criar(existentes)
+        ausentes = [f'2002711{i:07d}1' for i in range(50)]
+        # 1000 chaves: dois blocos de 'chave__in', nenhuma consulta a mais
+        with self.assertNumQueries(2):
+            resolvidos = buscar_processos_em_lote(existentes + ausentes)
+        self.assertEqual(sum(processo is not None for processo in resolvidos.values()), 950)
+        self.assertEqual(resolvidos[existentes[-1]].numero, existentes[-1])
+        self.assertIsNone(resolvidos[ausentes[0]])
+
+    def test_formatos_misturados(self):
+        cnj = '0001234' + digitos_cnj('0001234', '2019', '4', '04', '7110') + '2019404' + '7110'
+        atual, unico = self.criar(['199971100056908', cnj])
+        entrada = ['1999.71.10.005690-8', '9971056908', cnj, '200071100000001', '123']
+        # Chave numérica num bloco, depois os antigos pela chave legado
+        with self.assertNumQueries(2):
+            resolvidos = buscar_processos_em_lote(entrada)
+        self.assertEqual(resolvidos, {
+            '1999.71.10.005690-8': atual, '9971056908': atual, cnj: unico, '200071100000001': None, '123': None,
+        })
+
+    def test_ordem_dos_candidatos_antigos(self):
+        # Três processos com a mesma chave legado (1999 + 05690), em varas diferentes
+        primeiro, _, permanente = self.criar(['199971100056908', '199971110056905', '199971200056901'])
+        ProcessoPermanente.objects.filter(numero=permanente.numero).update(permanente=True)
+        self.assertEqual(buscar_processos_em_lote(['9971056908'])['9971056908'].numero, permanente.numero)
+        # Sem permanente entre os candidatos, vale o mais antigo (menor pk)
+        ProcessoPermanente.objects.filter(numero=permanente.numero).update(permanente=False)
+        self.assertEqual(buscar_processos_em_lote(['9971056908'])['9971056908'].numero, primeiro.numero)
+
+    def test_falta_certa_pelo_filtro_sem_consulta(self):
+        self.criar(['199971100056908'])
+        with tempfile.TemporaryDirectory() as diretorio, \
+                override_settings(FILTRO_PROCESSOS_ARQUIVO=os.path.join(diretorio, 'filtro.bin')):
+            reconstruir_filtro()
+            self.assertIsNone(buscar_processos_em_lote(['200171100012345'])['200171100012345'])
+            # A geração dos números já foi conferida há menos de um segundo: nem ela vai ao banco
+            with self.assertNumQueries(0):
+                self.assertEqual(buscar_processos_em_lote(['200271100012345', '9971099998']),
+                                 {'200271100012345': None, '9971099998': None})
+
+    def test_verificar_parte_das_entradas(self):
+        # '05690' aparece logo depois do ano no segundo número, fora da posição da sequência
+        self.criar(['199971100056908', '199905690000011'])
+        saida = StringIO()
+        call_command('gerar_chaves_legado', '--verificar', stdout=saida)
+        # 9956900001 só era achado pela varredura: diferença esperada, contada à parte
+        self.assertIn('só a varredura resolve', saida.getvalue())
+        self.assertIn('Verificação OK', saida.getvalue())
+
+    def test_verificar_acusa_chave_que_falta(self):
+        primeiro, _ = self.criar(['199971100056908', '199905690000011'])
+        ProcessoPermanente.objects.filter(pk=primeiro.pk).update(chave_legado=None)
+        # Sem recalcular antes: a varredura acha 199905690 na posição certa e a chave não
+        with self.assertRaises(CommandError):
+            GerarChavesLegado(stdout=StringIO()).verificar(lote=1)
+
+
+class NumerosTests(TestCase):
+
+    def test_cnj_com_digito_verificador(self):
+        numero = '0001234' + digitos_cnj('0001234', '2019', '4', '04', '7110') + '2019404' + '7110'
+        partes = analisar_numero(numero)
+        self.assertEqual(partes.formato, FORMATO_CNJ)
+        self.assertEqual((partes.ano, partes.segmento, partes.tribunal, partes.origem, partes.sequencia),
+                         (2019, '4', '04', '7110', 1234))
+        # Um dígito trocado na leitura invalida o número
+        self.assertIsNone(analisar_numero(numero[:-1] + str((int(numero[-1]) + 1) % 10)))
+
+    def test_formatos_antigos(self):
+        partes = analisar_numero('1999.71.10.005690-8')
+        self.assertEqual((partes.numero, partes.ano, partes.origem, partes.sequencia), ('199971100056908', 1999, '7110', 5690))
+        self.assertEqual(analisar_numero('9971056908').formato, FORMATO_ANTIGO)
+        self.assertIsNone(analisar_numero('000071100056908'))  # ano impossível
+        self.assertIsNone(analisar_numero('1234567890123'))    # tamanho desconhecido
+
+    def test_extrair_numeros_com_pontuacao(self):
+        texto = '0001234-56.2019.4.04.7110; 1999.71.10.005690-8\n123 9971056908 9971056908'
+        self.assertEqual(extrair_numeros(texto), ['00012345620194047110', '199971100056908', '9971056908'])
+
+    def test_extrair_numeros_separados_por_pontuacao(self):
+        texto = '9919056901/9919056902\n199971100056908-199971100012345;1999.71.10.005690-8'
+        self.assertEqual(extrair_numeros(texto), ['9919056901', '9919056902', '199971100056908', '199971100012345'])
+
+    def test_invalidos_nao_vao_ao_banco(self):
+        with self.assertNumQueries(0):
+            self.assertEqual(buscar_processos_em_lote(['000071100056908', '00012345620194047110']),
+                             {'000071100056908': None, '00012345620194047110': None})
+
+    def test_busca_por_partes_indexadas(self):
+        processo = ProcessoPermanente.objects.create(numero='199971100056908')
+        self.assertEqual(list(buscar_por_partes(ano=1999, sequencia=5690)), [processo])
+        self.assertEqual(list(buscar_por_partes(origem='7110')), [processo])
+        self.assertFalse(buscar_por_partes(origem='7111').exists())
+
+    def test_busca_do_admin(self):
+        cnj = '0001234' + digitos_cnj('0001234', '2019', '4', '04', '7110') + '2019404' + '7110'
+        atual = ProcessoPermanente.objects.create(numero='199971100056908')
+        unico = ProcessoPermanente.objects.create(numero=cnj)
+        modelo_admin = ProcessoPermanenteAdmin(ProcessoPermanente, admin.site)
+
+        def buscar(termo):
+            encontrados, _ = modelo_admin.get_search_results(None, ProcessoPermanente.objects.all(), termo)
+            return set(encontrados)
+
+        self.assertEqual(buscar('1999.71.10.005690-8'), {atual})
+        self.assertEqual(buscar('9971056908'), {atual})
+        self.assertEqual(buscar(cnj), {unico})
+        # Trechos curtos: 'numero' contém o trecho, em qualquer parte (não só na sequência ou na origem)
+        outro = ProcessoPermanente.objects.create(numero='200156900012345')
+        self.assertEqual(buscar('5690'), {atual, outro})
+        self.assertEqual(buscar('7110'), {atual, unico})
+        self.assertEqual(buscar('56908'), {atual})
+        self.assertEqual(buscar('1999/5690'), {atual})
+
+    def test_situacao_nao_e_editavel_no_admin(self):
+        processo = ProcessoPermanente.objects.create(numero='199971100056908', situacao='Baixado')
+        chefe = User.objects.create_user('chefe', password='senha', is_staff=True, is_superuser=True)
+        self.client.force_login(chefe)
+        url = f'/admin/core/situacaoprocesso/{processo.situacao_normalizada_id}/change/'
+        self.client.post(url, {'nome': 'PERMANENTE', 'permanente': 'on'})
+        processo.refresh_from_db()
+        self.assertEqual(processo.situacao_normalizada.nome, 'BAIXADO')
+        self.assertFalse(processo.situacao_normalizada.permanente)
+        self.assertFalse(processo.permanente)
+
+    def test_chave_numerica_separa_formatos(self):
+        cnj = '0001234' + digitos_cnj('0001234', '1999', '4', '04', '7110') + '1999404' + '7110'
+        atual = ProcessoPermanente.objects.create(numero='199971100056908')
+        unico = ProcessoPermanente.objects.create(numero=cnj)
+        self.assertEqual(atual.chave, 199971100056908)
+        self.assertNotEqual(unico.chave, atual.chave)
+        self.assertLess(unico.chave, 2 ** 63)
+        self.assertIsNone(chave_numerica('9971056908'))
+        # Os dígitos verificadores não entram na chave, mas são conferidos: com eles errados não há chave
+        errado = cnj[:7] + f'{(int(cnj[7:9]) + 1) % 100:02d}' + cnj[9:]
+        self.assertIsNone(chave_numerica(errado))
+        self.assertIsNone(ProcessoPermanente.objects.create(numero=errado).chave)
+        # A busca exata compara a chave, com pontuação ou sem
+        self.assertEqual(buscar_processos_em_lote(['1999.71.10.005690-8', cnj]),
+                         {'1999.71.10.005690-8': atual, cnj: unico})
@@ -5,11 +5,24 @@ urlpatterns = [
     path('', views.home, name='home'),
     path('listagem/nova/', views.criar_listagem, name='criar_listagem'),
     path('listagem/<int:pk>/', views.detalhe_listagem, name='detalhe_listagem'),
+    path('listagem/<int:pk>/adicionar/', views.adicionar_processos_listagem, name='adicionar_processos_listagem'),
     path('listagem/<int:pk>/imprimir/', views.imprimir_listagem, name="imprimir_listagem"),
     path('listagem/<int:pk>/editar/', views.editar_listagem, name='editar_listagem'),
     path('item/<int:item_pk>/apagar/', views.apagar_item, name='apagar_item'),
     path('verificar-em-lote/', views.verificar_lote, name='verificar_lote'),
+    path('verificar-em-lote/<int:pk>/', views.detalhe_verificacao, name='detalhe_verificacao'),
+    path('verificar-em-lote/<int:pk>/progresso/', views.progresso_verificacao, name='progresso_verificacao'),
+    path('verificar-em-lote/<int:pk>/csv/', views.csv_verificacao, name='csv_verificacao'),
+    path('pesquisar/', views.pesquisar, name='pesquisar'),
+    path('ajax/pesquisar/', views.pesquisar_ajax, name='pesquisar_ajax'),
     path('ajax/get-processos/', views.get_processos_caixa, name='get_processos_caixa'),
     path('conferir-caixa/', views.conferir_caixa, name='conferir_caixa'),
+    path('conferir-caixa/abrir/', views.abrir_conferencia_caixa, name='abrir_conferencia'),
+    path('conferir-caixa/<int:pk>/', views.relatorio_conferencia, name='relatorio_conferencia'),
+    path('conferir-caixa/<int:pk>/leituras/', views.registrar_leituras_conferencia, name='registrar_leituras'),
+    path('conferir-caixa/<int:pk>/finalizar/', views.finalizar_conferencia_caixa, name='finalizar_conferencia'),
+    path('ajax/caixas/', views.buscar_caixas_ajax, name='buscar_caixas'),
     path('ajax/checar-processo/', views.checar_processo_individual, name='checar_processo_individual'),
+    path('ajax/estatisticas-cache/', views.estatisticas_cache, name='estatisticas_cache'),
+    path('ajax/estatisticas-requisicoes/', views.estatisticas_requisicoes, name='estatisticas_requisicoes'),
 ]
\ No newline at end of file
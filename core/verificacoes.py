@@ -0,0 +1,133 @@
+"""
+Verificações em lote em segundo plano.
+
+Listas grandes coladas na verificação em lote (mais de
+settings.VERIFICACAO_LIMITE_SINCRONO números) não são resolvidas na
+requisição: viram um VerificacaoLote 'pendente' e a página acompanha o
+progresso. A fila é a própria tabela, sem broker externo:
+
+- cada worker web mantém no máximo uma thread que processa a fila e
+  termina quando ela esvazia (iniciada ao criar uma verificação);
+- o trabalho é pego com um UPDATE condicional, então dois workers nunca
+  processam a mesma verificação;
+- cada bloco de números é gravado numa transação junto com o progresso;
+  um trabalho interrompido (worker reiniciado) é retomado do último bloco
+  quando fica parado por mais de PRAZO_RETOMADA;
+- 'python manage.py processar_verificacoes' processa a fila fora do
+  servidor web (por exemplo, numa tarefa agendada).
+"""
+import logging
+import threading
+from datetime import timedelta
+from django.conf import settings
+from django.db import connection, transaction
+from django.db.models import Q
+from django.utils import timezone
+from .busca import buscar_processos_em_lote
+from .models import ResultadoVerificacao, VerificacaoLote
+
+logger = logging.getLogger(__name__)
+
+# Números resolvidos e gravados por transação
+TAMANHO_BLOCO = 1000
+# Um trabalho 'processando' sem progresso por este tempo é considerado interrompido
+PRAZO_RETOMADA = timedelta(minutes=10)
+
+
+def criar_verificacao(usuario, numeros):
+    """Coloca a verificação na fila; o processamento começa depois do commit."""
+    verificacao = VerificacaoLote.objects.create(criador=usuario, numeros='\n'.join(numeros), total=len(numeros))
+    if getattr(settings, 'VERIFICACAO_WORKER_NA_THREAD', True):
+        transaction.on_commit(iniciar_worker)
+    return verificacao
+
+
+def pegar_proxima():
+    """Marca a próxima verificação da fila como 'processando' e a devolve (ou None)."""
+    parada_desde = timezone.now() - PRAZO_RETOMADA
+    disponiveis = VerificacaoLote.objects.filter(
+        Q(status=VerificacaoLote.PENDENTE) | Q(status=VerificacaoLote.PROCESSANDO, atualizada_em__lt=parada_desde)
+    )
+    for pk, status in disponiveis.order_by('criada_em').values_list('pk', 'status')[:5]:
+        # Só um worker consegue mudar o status de uma mesma verificação
+        pega = VerificacaoLote.objects.filter(pk=pk, status=status).filter(
+            Q(status=VerificacaoLote.PENDENTE) | Q(atualizada_em__lt=parada_desde)
+        ).update(status=VerificacaoLote.PROCESSANDO, atualizada_em=timezone.now())
+        if pega:
+            return VerificacaoLote.objects.get(pk=pk)
+    return None
+
+
+def processar(verificacao):
+    """Resolve os números em blocos, continuando de onde parou."""
+    numeros = verificacao.lista_numeros()
+    try:
+        for inicio in range(verificacao.processados, len(numeros), TAMANHO_BLOCO):
+            bloco = numeros[inicio:inicio + TAMANHO_BLOCO]
+            resolvidos = buscar_processos_em_lote(bloco)
+            with transaction.atomic():
+                ResultadoVerificacao.objects.bulk_create([
+                    ResultadoVerificacao(
+                        verificacao=verificacao, posicao=inicio + i, numero=numero,
+                        numero_processo=resolvidos[numero].numero if resolvidos[numero] else None,
+                    )
+                    for i, numero in enumerate(bloco)
+                ], ignore_conflicts=True)
+                verificacao.processados = inicio + len(bloco)
+                VerificacaoLote.objects.filter(pk=verificacao.pk).update(
+                    processados=verificacao.processados, atualizada_em=timezone.now(),
+                )
+    except Exception as e:
+        VerificacaoLote.objects.filter(pk=verificacao.pk).update(status=VerificacaoLote.ERRO, erro=str(e))
+        raise
+
+    VerificacaoLote.objects.filter(pk=verificacao.pk).update(
+        status=VerificacaoLote.CONCLUIDA, concluida_em=timezone.now(), atualizada_em=timezone.now(),
+    )
+
+
+def processar_fila():
+    """Processa verificações até a fila esvaziar. Retorna quantas foram processadas."""
+    quantidade = 0
+    while True:
+        verificacao = pegar_proxima()
+        if verificacao is None:
+            return quantidade
+        try:
+            processar(verificacao)
+        except Exception:
+            # O erro fica registrado na verificação; segue com a próxima
+            logger.exception('Erro na verificação %s.', verificacao.pk)
+        quantidade += 1
+
+
+_worker = {'thread': None}
+_acordar = threading.Event()
+_lock = threading.Lock()
+
+
+def iniciar_worker():
+    """Garante uma thread processando a fila neste processo."""
+    with _lock:
+        _acordar.set()
+        if _worker['thread'] is None:
+            _worker['thread'] = threading.Thread(target=_rodar_worker, name='verificacoes', daemon=True)
+            _worker['thread'].start()
+
+
+def _rodar_worker():
+    try:
+        while True:
+            _acordar.clear()
+            processar_fila()
+            with _lock:
+                # Uma verificação criada durante a última passada pede outra
+                if not _acordar.is_set():
+                    _worker['thread'] = None
+                    return
+    except Exception:
+        logger.exception('Worker de verificações parou.')
+        with _lock:
+            _worker['thread'] = None
+    finally:
+        connection.close()
@@ -1,45 +1,58 @@
 from django.contrib.auth.forms import UserCreationForm
-from django.urls import reverse_lazy
+from django.urls import reverse, reverse_lazy
 from django.views import generic
 from django.contrib.auth import login
 from django.http import HttpResponseRedirect
 from django.shortcuts import render, get_object_or_404, redirect
+from django.core.paginator import Paginator
 from django.contrib.auth.decorators import login_required
+from django.contrib.admin.views.decorators import staff_member_required
+from django.views.decorators.csrf import ensure_csrf_cookie
+from django.views.decorators.http import require_POST
 from django.contrib import messages
 from django.utils import timezone
-from .models import Listagem, ProcessoPermanente, ItemProcesso
-from django.http import JsonResponse
-import re
+from django.db import transaction
+from django.db.models import Count
+from .models import ConferenciaCaixa, Listagem, ProcessoPermanente, ItemProcesso, SituacaoProcesso, VerificacaoLote
+from .busca import buscar_processos_em_lote, dados_conferencia, em_blocos, processos_por_numero
+from .caixas import LIMITE_PADRAO, buscar_caixas
+from .cache_processos import consultar_processo, consultar_processos, obter_cache
+from .conferencias import (ConferenciaFinalizada, abrir_conferencia, calcular_placar, finalizar_conferencia,
+                           leituras_para_retomar, registrar_leituras, relatorio)
+from .geracao import data_geracao, obter_geracao
+from .medicao import medicoes
+from .pesquisa import CAMPOS_PESQUISA, pesquisar_processos
+from .verificacoes import criar_verificacao
+from .numeros import FORMATO_ATUAL, analisar_numero, analisar_numeros, chave_numerica, extrair_numeros
+from django.conf import settings
+from django.http import JsonResponse, StreamingHttpResponse
+from django.views.decorators.cache import cache_control
+from django.views.decorators.http import condition
+from datetime import datetime, timezone as dt_timezone
+import csv
+import json
+from itertools import islice
+
+# Máximo de números aceitos por envio da conferência em lote
+LIMITE_LOTE_CONFERENCIA = 500
+# Listagens mostradas por página na home
+LISTAGENS_POR_PAGINA = 25
+# Resultados da pesquisa por conteúdo (padrão e máximo pedido em ?limite=)
+LIMITE_PADRAO_PESQUISA = 50
+LIMITE_PESQUISA = 200
 
 
-@login_required
-def get_processos(request):
-    caixa = request.GET.get('caixa')
-    processos = ProcessoPermanente.objects.filter(caixa=caixa)
-    
-    # IMPORTANTE: Envia o número LIMPO para o frontend facilitar a comparação
-    data = []
-    for p in processos:
-        data.append({
-            'numero': apenas_numeros(p.numero), # Limpa aqui para bater com o leitor
-            'numero_original': p.numero,        # Mantém o original para exibição se quiser
-            'situacao': p.situacao if p.situacao else "Sem Situação"
-        })
-    
-    return JsonResponse({'processos': data})    
-
 # (Vamos precisar criar um formulário simples, mas por enquanto faremos sem)
 @login_required
 def home(request):
-    # Página inicial que lista todas as listagens criadas pelo usuário
-    listagens = Listagem.objects.filter(criador=request.user).order_by('-data_criacao')
-    return render(request, 'core/home.html', {'listagens': listagens})
+    # Página inicial que lista todas as listagens criadas pelo usuário,
+    # com as contagens de cada uma calculadas na mesma consulta
+    listagens = Listagem.objects.filter(criador=request.user).com_contagens().order_by('-data_criacao', '-pk')
+    pagina = Paginator(listagens, LISTAGENS_POR_PAGINA).get_page(request.GET.get('pagina'))
+    return render(request, 'core/home.html', {'listagens': pagina})
 
 @login_required
 def criar_listagem(request):
-    # Busca todas as caixas para o autocomplete
-    caixas_existentes = ProcessoPermanente.objects.exclude(caixa__isnull=True).exclude(caixa='').values_list('caixa', flat=True).distinct().order_by('caixa')
-
     if request.method == 'POST':
         titulo = request.POST.get('titulo')
         
@@ -49,85 +62,192 @@ def criar_listagem(request):
         # Validação do Título
         if not titulo:
             messages.error(request, 'O título é obrigatório.')
-            return render(request, 'core/criar_listagem.html', {'caixas': caixas_existentes})
+            return render(request, 'core/criar_listagem.html')
+
+        # 1. Valida todos os números antes de gravar qualquer coisa
+        relatorio = separar_numeros_validos(lista_numeros)
+        for numero_limpo in relatorio['ignorados']:
+            messages.warning(request, f"O valor '{numero_limpo}' foi ignorado pois não parece um processo válido (15 dígitos).")
 
         # Validação/Criação
         try:
-            # 1. Criar a Listagem
-            listagem = Listagem.objects.create(titulo=titulo, criador=request.user)
-            
-            # 2. Processar cada número digitado
-            itens_criados = 0
-            for numero in lista_numeros:
-                # Remove espaços e ignora campos vazios
-                numero_limpo = numero.strip()
-                if not numero_limpo:
-                    continue
-                
-                # Verifica se é um número válido (opcional, mas recomendado)
-                if not numero_limpo.isdigit() or len(numero_limpo) != 15:
-                    messages.warning(request, f"O valor '{numero_limpo}' foi ignorado pois não parece um processo válido (15 dígitos).")
-                    continue
-
-                # Cria o item (a lógica de verificar se é permanente fica para depois ou podemos fazer agora)
-                # Aqui vamos apenas criar o item na listagem.
-                # A verificação se "e_permanente" fazemos na hora ou deixamos para a view de detalhe.
-                # Para simplificar e ser rápido, vamos criar e marcar.
-                
-                eh_perm = ProcessoPermanente.objects.filter(numero=numero_limpo).exists()
-                
-                ItemProcesso.objects.create(
-                    listagem=listagem,
-                    numero_digitado=numero_limpo,
-                    e_permanente=eh_perm
-                )
-                itens_criados += 1
-
-            messages.success(request, f'Listagem "{titulo}" criada com {itens_criados} processos!')
+            # 2. Cria a Listagem e todos os itens numa única transação
+            with transaction.atomic():
+                listagem = Listagem.objects.create(titulo=titulo, criador=request.user)
+                relatorio['permanentes'] = criar_itens_listagem(listagem, relatorio['validos'])
+
+            if relatorio['duplicados']:
+                messages.info(request, f"Números repetidos (adicionados uma vez só): {', '.join(relatorio['duplicados'])}")
+            if relatorio['permanentes']:
+                messages.warning(request, f"Processos permanentes na listagem: {', '.join(relatorio['permanentes'])}")
+
+            messages.success(request, f'Listagem "{titulo}" criada com {len(relatorio["validos"])} processos!')
             return redirect('detalhe_listagem', pk=listagem.pk)
 
         except Exception as e:
             messages.error(request, f'Erro ao salvar: {e}')
     
-    return render(request, 'core/criar_listagem.html', {'caixas': caixas_existentes})
+    return render(request, 'core/criar_listagem.html')
 
 # Em core/views.py
 
 @login_required
+@ensure_csrf_cookie
 def conferir_caixa(request):
     """
     View específica para auditoria de caixas.
     """
-    # Busca todas as caixas únicas para o autocomplete (ordenadas)
-    caixas_existentes = ProcessoPermanente.objects.exclude(caixa__isnull=True).exclude(caixa='').values_list('caixa', flat=True).distinct().order_by('caixa')
-    
-    return render(request, 'core/conferir_caixa.html', {'caixas': caixas_existentes})
+    # As caixas do autocomplete são buscadas via AJAX (buscar_caixas_ajax)
+    # Conferências em andamento, para continuar de qualquer estação
+    abertas = (ConferenciaCaixa.objects.filter(status=ConferenciaCaixa.ABERTA).select_related('criador')
+               .annotate(qtd_leituras=Count('leituras')).order_by('-iniciada_em')[:10])
+    return render(request, 'core/conferir_caixa.html', {'abertas': abertas})
+
+
+def _conferencia_json(conferencia):
+    return {
+        'id': conferencia.pk,
+        'caixa': conferencia.caixa,
+        'placar': calcular_placar(conferencia),
+        'leituras': leituras_para_retomar(conferencia),
+        'url_leituras': reverse('registrar_leituras', kwargs={'pk': conferencia.pk}),
+        'url_finalizar': reverse('finalizar_conferencia', kwargs={'pk': conferencia.pk}),
+    }
+
+
+@login_required
+@require_POST
+def abrir_conferencia_caixa(request):
+    """
+    Abre a conferência da caixa ou retoma a que está aberta (mesmo que em outra estação).
+    Corpo (JSON): {"caixa": "..."}. Devolve as leituras já feitas, para a página se remontar.
+    """
+    try:
+        caixa = str(json.loads(request.body).get('caixa') or '').strip()
+    except (ValueError, AttributeError):
+        return JsonResponse({'erro': 'JSON inválido.'}, status=400)
+    if not caixa:
+        return JsonResponse({'erro': 'Informe a caixa.'}, status=400)
+
+    return JsonResponse(_conferencia_json(abrir_conferencia(caixa, request.user)))
+
+
+@login_required
+@require_POST
+def registrar_leituras_conferencia(request, pk):
+    """
+    Leituras da conferência pelo HTTP (sem WebSocket): grava os números bipados
+    desde o último envio e devolve o veredito de cada um e o placar.
+    Corpo (JSON): {"numeros": ["...", ...]}
+    """
+    conferencia = get_object_or_404(ConferenciaCaixa, pk=pk)
+    try:
+        numeros = [str(numero).strip() for numero in json.loads(request.body).get('numeros', [])][:LIMITE_LOTE_CONFERENCIA]
+    except (ValueError, AttributeError, TypeError):
+        return JsonResponse({'erro': 'JSON inválido.'}, status=400)
+
+    try:
+        resultados = registrar_leituras(conferencia, numeros, consultar_processos(numeros), request.user)
+    except ConferenciaFinalizada:
+        return JsonResponse({'erro': 'Esta conferência já foi finalizada.'}, status=409)
+    return JsonResponse({'resultados': resultados, 'placar': calcular_placar(conferencia)})
 
 
 @login_required
+@require_POST
+def finalizar_conferencia_caixa(request, pk):
+    conferencia = get_object_or_404(ConferenciaCaixa, pk=pk)
+    finalizar_conferencia(conferencia)
+    return redirect('relatorio_conferencia', pk=conferencia.pk)
+
+
+@login_required
+def relatorio_conferencia(request, pk):
+    """Relatório da conferência, montado no servidor a partir das leituras gravadas."""
+    conferencia = get_object_or_404(ConferenciaCaixa.objects.select_related('criador'), pk=pk)
+    context = relatorio(conferencia)
+    context['conferencia'] = conferencia
+    return render(request, 'core/conferencia_relatorio.html', context)
+
+
+@login_required
+def buscar_caixas_ajax(request):
+    """
+    Autocomplete de caixas: retorna as primeiras caixas que começam com 'q',
+    com a quantidade de processos de cada uma.
+    """
+    prefixo = request.GET.get('q', '').strip()
+    try:
+        limite = min(int(request.GET.get('limite', LIMITE_PADRAO)), 100)
+    except ValueError:
+        limite = LIMITE_PADRAO
+
+    return JsonResponse({'caixas': buscar_caixas(prefixo, limite)})
+
+
+def _parametros_caixa(request):
+    limite = request.GET.get('limite', '')
+    return request.GET.get('caixa', ''), request.GET.get('apos', ''), int(limite) if limite.isdigit() else None
+
+
+def _etag_caixa(request):
+    # Os dados só mudam com uma nova geração: mesma geração + mesmos parâmetros = mesma resposta
+    return '-'.join(str(parte) for parte in (obter_geracao(), *_parametros_caixa(request)))
+
+
+def _ultima_alteracao_caixa(request):
+    return datetime.fromtimestamp(data_geracao(), tz=dt_timezone.utc)
+
+
+@login_required
+@cache_control(private=True, no_cache=True)
+@condition(etag_func=_etag_caixa, last_modified_func=_ultima_alteracao_caixa)
 def get_processos_caixa(request):
     """
     Retorna uma lista JSON de processos vinculados a uma caixa específica.
     Chamado via AJAX pelo javascript da página.
+
+    A lista é gerada aos poucos (StreamingHttpResponse), direto das tuplas do
+    banco. Paginação opcional: 'limite' itens por página e 'apos' com o valor
+    de 'proximo' da página anterior. Se nada mudou desde a última consulta,
+    responde 304 (ETag/Last-Modified pela geração dos dados).
     """
-    caixa_nome = request.GET.get('caixa', None)
-    data = []
+    caixa_nome, apos, limite = _parametros_caixa(request)
+    linhas = []
 
     if caixa_nome:
         # Filtra os processos daquela caixa e ordena pelo número
-        processos = ProcessoPermanente.objects.filter(caixa=caixa_nome).order_by('numero')
-        for proc in processos:
-            data.append({
-                'numero': proc.numero,
-                'assunto': proc.assunto or 'Sem Assunto',
-                'situacao': proc.situacao or '-'
-            })
-    
-    return JsonResponse({'processos': data})
+        linhas = ProcessoPermanente.objects.filter(caixa=caixa_nome).order_by('numero')
+        if apos:
+            linhas = linhas.filter(numero__gt=apos)
+        linhas = linhas.values_list('numero', 'assunto', 'situacao')
+        if limite:
+            # Um a mais para saber se existe próxima página
+            linhas = linhas[:limite + 1]
+        linhas = linhas.iterator(chunk_size=2000)
+
+    return StreamingHttpResponse(_json_processos_caixa(linhas, limite), content_type='application/json')
+
+
+def _json_processos_caixa(linhas, limite):
+    yield '{"processos": ['
+    ultimo = None
+    proximo = None
+    for indice, (numero, assunto, situacao) in enumerate(linhas):
+        if limite and indice == limite:
+            proximo = ultimo
+            break
+        yield (',' if indice else '') + json.dumps({
+            'numero': numero,
+            'assunto': assunto or 'Sem Assunto',
+            'situacao': situacao or '-'
+        })
+        ultimo = numero
+    yield '], "proximo": %s}' % json.dumps(proximo)
 
 @login_required
 def detalhe_listagem(request, pk):
-    listagem = get_object_or_404(Listagem, pk=pk)
+    listagem = get_object_or_404(Listagem.objects.select_related('criador'), pk=pk)
 
     if listagem.criador != request.user:
         messages.error(request, "Acesso não autorizado.")
@@ -137,42 +257,17 @@ def detalhe_listagem(request, pk):
         
         # --- A CORREÇÃO ESTÁ AQUI ---
         # Verificamos se o botão 'submit_adicionar' foi o que enviou o formulário
+        # (envio sem JavaScript: a página normalmente usa adicionar_processos_listagem)
         if 'submit_adicionar' in request.POST:
-            
-            # Agora podemos pegar o valor do input com segurança
-            numero_digitado = request.POST.get('numero_processo')
+            numero_digitado = request.POST.get('numero_processo', '').strip()
+            resultado = adicionar_numeros_listagem(listagem, [numero_digitado], request.user)
 
-            # Esta validação agora funcionará com o valor correto
-            if not numero_digitado or not numero_digitado.isdigit() or len(numero_digitado) != 15:
+            if resultado['invalidos']:
                 messages.error(request, "Número inválido. Deve ter 15 dígitos numéricos.")
-                return redirect('detalhe_listagem', pk=listagem.pk)
-
-            # --- A LÓGICA DE ALERTA (que já estava correta) ---
-            try:
-                # 1. Tenta encontrar o processo na base de dados permanente
-                processo_perm = ProcessoPermanente.objects.get(numero=numero_digitado)
-                
-                # 2. SE ENCONTROU (PERMANENTE):
-                messages.warning(request, f"O processo {numero_digitado} foi encontrado. Separe-o para registro em separado.")
-                
-                # 3. Registra na tabela Permanentes
-                processo_perm.encontrado_por = request.user
-                processo_perm.data_encontrado = timezone.now()
-                processo_perm.listagem_encontrado = listagem
-                processo_perm.save()
-                
-            except ProcessoPermanente.DoesNotExist:
-                # 5. SE NÃO ENCONTROU (NORMAL):
-                if ItemProcesso.objects.filter(listagem=listagem, numero_digitado=numero_digitado).exists():
-                    messages.info(request, "Este processo já foi adicionado a esta listagem.")
-                else:
-                    ItemProcesso.objects.create(
-                        listagem=listagem,
-                        numero_digitado=numero_digitado,
-                        e_permanente=False
-                    )
-            except Exception as e:
-                messages.error(request, f"Ocorreu um erro inesperado: {e}")
+            if resultado['repetidos']:
+                messages.info(request, "Este processo já foi adicionado a esta listagem.")
+            for encontrado in resultado['permanentes']:
+                messages.warning(request, encontrado['mensagem'])
 
             # Redireciona de volta para a listagem
             return redirect('detalhe_listagem', pk=listagem.pk)
@@ -182,6 +277,24 @@ def detalhe_listagem(request, pk):
     return render(request, 'core/detalhe_listagem.html', {'listagem': listagem, 'itens': itens})
 
 
+@login_required
+@require_POST
+def adicionar_processos_listagem(request, pk):
+    """
+    AJAX da listagem: adiciona os números bipados desde o último envio de uma vez,
+    sem recarregar a página. Corpo (JSON): {"numeros": ["...", ...]}
+    """
+    listagem = get_object_or_404(Listagem, pk=pk)
+    if listagem.criador != request.user:
+        return JsonResponse({'erro': 'Acesso não autorizado.'}, status=403)
+    try:
+        numeros = [str(numero).strip() for numero in json.loads(request.body).get('numeros', [])][:LIMITE_LOTE_CONFERENCIA]
+    except (ValueError, AttributeError, TypeError):
+        return JsonResponse({'erro': 'JSON inválido.'}, status=400)
+
+    return JsonResponse(adicionar_numeros_listagem(listagem, numeros, request.user))
+
+
 @login_required
 def editar_listagem(request, pk):
     """
@@ -218,7 +331,7 @@ def editar_listagem(request, pk):
 
 @login_required
 def imprimir_listagem(request, pk):
-    listagem = get_object_or_404(Listagem, pk=pk)
+    listagem = get_object_or_404(Listagem.objects.select_related('criador'), pk=pk)
     if listagem.criador != request.user:
         messages.error(request, "Acesso não autorizado.")
         return redirect('home')
@@ -264,27 +377,51 @@ def checar_processo_individual(request):
     """AJAX para conferência caixa a caixa"""
     numero_input = request.GET.get('numero', '').strip()
     
-    # Usa a busca inteligente
-    processo = buscar_processo_no_banco(numero_input)
-    
-    if processo:
-        # Pega a situação exata
-        situacao_db = processo.situacao
-        situacao_texto = str(situacao_db).strip() if situacao_db else "Campo Nulo"
-        if not situacao_texto: situacao_texto = "Vazio"
-
-        # Verifica se é Permanente
-        is_permanente = 'PERMANENTE' in situacao_texto.upper()
-        
-        return JsonResponse({
-            'encontrado': True,
-            'caixa_origem': processo.caixa,
-            'situacao': situacao_texto,
-            'is_permanente': is_permanente,
-            'numero_db': processo.numero # Retorna o número oficial (15 dígitos) para exibir
-        })
-    else:
-        return JsonResponse({'encontrado': False})
+    # Usa a busca inteligente (com cache)
+    processo = consultar_processo(numero_input)
+    return JsonResponse(dados_conferencia(processo))
+
+
+@staff_member_required
+def estatisticas_cache(request):
+    """Acertos/falhas do cache de consultas de processos deste worker."""
+    return JsonResponse(obter_cache().estatisticas())
+
+
+@staff_member_required
+def estatisticas_requisicoes(request):
+    """Percentis de tempo e consultas por view deste worker (com MEDICAO_REQUISICOES ligado)."""
+    return JsonResponse({'ativa': getattr(settings, 'MEDICAO_REQUISICOES', False), 'views': medicoes.resumo()})
+
+
+def _pesquisa(request):
+    texto = request.GET.get('q', '').strip()
+    caixa = request.GET.get('caixa', '').strip()
+    situacao = request.GET.get('situacao', '').strip()
+    limite = request.GET.get('limite', '')
+    limite = min(int(limite), LIMITE_PESQUISA) if limite.isdigit() else LIMITE_PADRAO_PESQUISA
+    processos, modo = pesquisar_processos(texto, caixa=caixa, situacao=situacao, limite=limite)
+    return {'q': texto, 'caixa': caixa, 'situacao': situacao, 'processos': processos, 'modo': modo}
+
+
+@login_required
+def pesquisar(request):
+    """Pesquisa de processos pelo assunto, classe, localizador ou órgão atual."""
+    context = _pesquisa(request)
+    context['situacoes'] = SituacaoProcesso.objects.order_by('nome').values_list('nome', flat=True)
+    return render(request, 'core/pesquisar.html', context)
+
+
+@login_required
+def pesquisar_ajax(request):
+    """A mesma pesquisa em JSON (?q=...&caixa=...&situacao=...&limite=...)."""
+    context = _pesquisa(request)
+    campos = ('numero', 'caixa', 'situacao') + CAMPOS_PESQUISA
+    return JsonResponse({
+        'modo': context['modo'],
+        'processos': [{campo: getattr(processo, campo) for campo in campos} for processo in context['processos']],
+    })
+
 
 @login_required
 def verificar_lote(request):
@@ -294,107 +431,231 @@ def verificar_lote(request):
         texto_colado = request.POST.get('lista_processos', '')
         context['texto_original'] = texto_colado
         
-        # Regex captura sequências de 10 a 25 dígitos
-        numeros_extraidos = re.findall(r'\d{10,25}', texto_colado)
-        numeros_unicos = list(dict.fromkeys(numeros_extraidos))
-        
-        lista_permanentes = []
-        lista_outros = []
-        encontrados_map = {} # Evita duplicar objetos se inputs diferentes levarem ao mesmo processo
-
-        for num_input in numeros_unicos:
-            proc = buscar_processo_no_banco(num_input)
-            
-            if proc:
-                # Usa o ID do processo como chave única
-                if proc.id not in encontrados_map:
-                    encontrados_map[proc.id] = True
-                    
-                    situacao = str(proc.situacao).upper() if proc.situacao else ""
-                    if 'PERMANENTE' in situacao:
-                        lista_permanentes.append(proc)
-                    else:
-                        lista_outros.append(proc)
-        
-        # Calcula não encontrados (baseado nos inputs originais)
-        # Se o input achou alguém, conta como encontrado.
-        # (Lógica simplificada: se total inputs > total achados, mostra diferença)
-        # Para precisão total, teríamos que mapear input -> sucesso.
-        
-        # Aqui, vamos listar como "Não Encontrados" aqueles inputs que retornaram None
-        nao_encontrados = []
-        for num_input in numeros_unicos:
-            if not buscar_processo_no_banco(num_input):
-                nao_encontrados.append(num_input)
-
-        context['sucesso'] = True
-        context['qtd_verificados'] = len(numeros_unicos)
-        context['qtd_encontrados'] = len(lista_permanentes) + len(lista_outros)
-        context['lista_permanentes'] = lista_permanentes
-        context['lista_outros'] = lista_outros
-        context['nao_encontrados'] = nao_encontrados
+        # Captura números de 10 a 25 dígitos (com ou sem pontuação), sem repetição,
+        # e separa os que não podem existir (tamanho, ano ou dígito verificador)
+        analisados = analisar_numeros(extrair_numeros(texto_colado))
+        numeros_unicos = [numero for numero, partes in analisados.items() if partes]
+        context['invalidos'] = [numero for numero, partes in analisados.items() if not partes]
+
+        # Listas muito grandes vão para a fila e a página acompanha o progresso
+        if len(numeros_unicos) > settings.VERIFICACAO_LIMITE_SINCRONO:
+            verificacao = criar_verificacao(request.user, numeros_unicos)
+            return redirect('detalhe_verificacao', pk=verificacao.pk)
+
+        # Resolve a lista inteira de uma vez (input -> processo ou None)
+        resolvidos = buscar_processos_em_lote(numeros_unicos)
+        context.update(resumo_verificacao(numeros_unicos, resolvidos))
 
     return render(request, 'core/verificar_lote.html', context)
 
 
-def apenas_numeros(texto):
-    """Remove tudo que não for dígito."""
-    return re.sub(r'\D', '', str(texto)) if texto else ''
+@login_required
+def detalhe_verificacao(request, pk):
+    """Progresso de uma verificação em segundo plano e, quando terminar, o relatório."""
+    verificacao = get_object_or_404(VerificacaoLote, pk=pk, criador=request.user)
+    if verificacao.status != VerificacaoLote.CONCLUIDA:
+        return render(request, 'core/verificacao_andamento.html', {'verificacao': verificacao})
+
+    linhas = list(verificacao.resultados.order_by('posicao').values_list('numero', 'numero_processo'))
+    processos = processos_por_numero(numero_processo for _, numero_processo in linhas if numero_processo)
+    numeros = [numero for numero, _ in linhas]
+    resolvidos = {numero: processos.get(numero_processo) for numero, numero_processo in linhas}
+
+    context = resumo_verificacao(numeros, resolvidos)
+    context['verificacao'] = verificacao
+    return render(request, 'core/verificar_lote.html', context)
+
 
-def buscar_processo_no_banco(numero_input):
+@login_required
+def progresso_verificacao(request, pk):
+    """AJAX da página de andamento."""
+    verificacao = get_object_or_404(VerificacaoLote, pk=pk, criador=request.user)
+    return JsonResponse({
+        'status': verificacao.status,
+        'status_texto': verificacao.get_status_display(),
+        'total': verificacao.total,
+        'processados': verificacao.processados,
+        'percentual': verificacao.percentual,
+        'erro': verificacao.erro,
+    })
+
+
+class _Eco:
+    """'Arquivo' que devolve o que recebe, para o csv.writer gerar linhas sob demanda."""
+
+    def write(self, valor):
+        return valor
+
+
+@login_required
+def csv_verificacao(request, pk):
+    """Resultado completo da verificação em CSV (gerado aos poucos)."""
+    verificacao = get_object_or_404(VerificacaoLote, pk=pk, criador=request.user, status=VerificacaoLote.CONCLUIDA)
+    linhas = verificacao.resultados.order_by('posicao').values_list('numero', 'numero_processo').iterator(chunk_size=2000)
+
+    escritor = csv.writer(_Eco())
+
+    def gerar():
+        yield escritor.writerow(['Número informado', 'Encontrado', 'Número no banco', 'Caixa', 'Situação', 'Permanente'])
+        # Os processos de cada bloco de linhas numa consulta só
+        while bloco := list(islice(linhas, 2000)):
+            processos = processos_por_numero(numero_processo for _, numero_processo in bloco if numero_processo)
+            for numero, numero_processo in bloco:
+                processo = processos.get(numero_processo)
+                if processo is None:
+                    yield escritor.writerow([numero, 'Não', '', '', '', ''])
+                else:
+                    yield escritor.writerow([
+                        numero, 'Sim', processo.numero, processo.caixa or '', processo.situacao or '',
+                        'Sim' if processo.permanente else 'Não',
+                    ])
+
+    response = StreamingHttpResponse(gerar(), content_type='text/csv; charset=utf-8')
+    response['Content-Disposition'] = f'attachment; filename="verificacao_{verificacao.pk}.csv"'
+    return response
+
+
+
+def separar_numeros_validos(lista_numeros):
     """
-    Busca inteligente que lida com 10 dígitos (formato antigo) e 15/20 dígitos (novo).
-    Prioriza encontrar registros PERMANENTES.
+    Separa os números digitados em válidos (15 dígitos, sem repetição),
+    duplicados e ignorados (inválidos). Campos vazios são descartados.
     """
-    numero_limpo = apenas_numeros(numero_input)
-    if not numero_limpo:
-        return None
-
-    # TENTATIVA 1: Busca Exata (Ideal)
-    # Tenta pelo input original e pelo limpo
-    for n in [numero_input, numero_limpo]:
-        processo = ProcessoPermanente.objects.filter(numero=n).first()
-        if processo: return processo
-
-    # TENTATIVA 2: Busca por Conversão de 10 dígitos
-    # Exemplo: Input 9919056901 (10 dígitos) -> Alvo 199971100056908
-    if len(numero_limpo) == 10:
-        # 1. Ignora o último dígito (Verificador antigo)
-        corpo = numero_limpo[:-1] # Ex: 991905690
-        
-        # 2. Extrai o Ano (2 primeiros dígitos)
-        ano_prefixo = corpo[:2] # 99
-        try:
-            if int(ano_prefixo) > 50: # Corte para 19xx vs 20xx
-                ano_completo = '19' + ano_prefixo
-            else:
-                ano_completo = '20' + ano_prefixo
-        except:
-            ano_completo = '20' + ano_prefixo
-
-        # 3. Extrai a Sequência Numérica (O "DNA" do processo)
-        # Pegamos os últimos 5 dígitos do corpo. Isso ignora códigos de vara no meio.
-        # Ex: De '991905690' pegamos '05690'.
-        # O alvo '199971100056908' contem '05690'.
-        sequencia_dna = corpo[-5:] 
-        
-        # Busca no banco: Começa com o Ano E contém a Sequência
-        candidatos = ProcessoPermanente.objects.filter(
-            numero__startswith=ano_completo,
-            numero__contains=sequencia_dna
+    relatorio = {'validos': [], 'duplicados': [], 'ignorados': []}
+    vistos = set()
+    for numero in lista_numeros:
+        # Remove espaços e ignora campos vazios
+        numero_limpo = numero.strip()
+        if not numero_limpo:
+            continue
+
+        partes = analisar_numero(numero_limpo)
+        if not numero_limpo.isdigit() or partes is None or partes.formato != FORMATO_ATUAL:
+            relatorio['ignorados'].append(numero_limpo)
+        elif numero_limpo in vistos:
+            relatorio['duplicados'].append(numero_limpo)
+        else:
+            vistos.add(numero_limpo)
+            relatorio['validos'].append(numero_limpo)
+    return relatorio
+
+
+def criar_itens_listagem(listagem, numeros):
+    """
+    Cria os itens da listagem com um único bulk_create, marcando 'e_permanente'
+    com uma consulta só. Retorna a lista dos números permanentes.
+    """
+    chaves = {numero: chave_numerica(numero) for numero in numeros}
+    permanentes = set()
+    for bloco in em_blocos(set(chaves.values()) - {None}):
+        permanentes.update(ProcessoPermanente.objects.filter(chave__in=bloco).values_list('chave', flat=True))
+
+    ItemProcesso.objects.bulk_create(
+        [ItemProcesso(listagem=listagem, numero_digitado=numero, e_permanente=chaves[numero] in permanentes)
+         for numero in numeros],
+        # Respeita o unique_together (listagem, numero_digitado) sem erro
+        ignore_conflicts=True,
+    )
+    return [numero for numero in numeros if chaves[numero] in permanentes]
+
+
+def adicionar_numeros_listagem(listagem, numeros, usuario):
+    """
+    Adiciona números de 15 dígitos à listagem. Os que estão na base são marcados
+    como encontrados com um único UPDATE condicional (só vale a primeira marcação,
+    mesmo com dois servidores bipando o mesmo processo); os demais viram itens
+    num único bulk_create. Retorna as listas 'permanentes' (com quem encontrou
+    primeiro), 'adicionados', 'repetidos' e 'invalidos'.
+    """
+    resultado = {'permanentes': [], 'adicionados': [], 'repetidos': [], 'invalidos': []}
+    validos = []
+    for numero in dict.fromkeys(numeros):
+        partes = analisar_numero(numero)
+        if numero.isdigit() and partes is not None and partes.formato == FORMATO_ATUAL:
+            validos.append(numero)
+        else:
+            resultado['invalidos'].append(numero)
+
+    resolvidos = consultar_processos(validos)
+
+    # 1. Encontrados: marca só os que ninguém marcou ainda e depois lê quem ficou registrado.
+    # Pelo número, não pelo id do cache: um id antigo (processo reimportado) não acharia a linha.
+    encontrados = [numero for numero in validos if resolvidos[numero]]
+    confirmados = set()
+    agora = timezone.now()
+    for bloco in em_blocos(encontrados):
+        ProcessoPermanente.objects.filter(numero__in=bloco, encontrado_por__isnull=True).update(
+            encontrado_por=usuario, data_encontrado=agora, listagem_encontrado=listagem,
+        )
+        marcados = ProcessoPermanente.objects.filter(numero__in=bloco).values_list(
+            'numero', 'encontrado_por_id', 'encontrado_por__username', 'data_encontrado', 'listagem_encontrado_id',
         )
+        for numero, encontrado_por_id, encontrado_por, data, listagem_id in marcados:
+            confirmados.add(numero)
+            # A marcação é desta requisição se tem exatamente o usuário, a listagem e o instante dela
+            primeiro = (encontrado_por_id, listagem_id, data) == (usuario.pk, listagem.pk, agora)
+            mensagem = f"O processo {numero} foi encontrado. Separe-o para registro em separado."
+            if not primeiro and data:
+                mensagem += f" (Já registrado por {encontrado_por} em {timezone.localtime(data):%d/%m/%Y %H:%M}.)"
+            resultado['permanentes'].append({
+                'numero': numero, 'primeiro': primeiro, 'encontrado_por': encontrado_por, 'mensagem': mensagem,
+            })
 
-        # 4. PRIORIDADE: Se achou mais de um, pega o que for PERMANENTE
-        melhor_candidato = None
-        for cand in candidatos:
-            situacao = str(cand.situacao).upper() if cand.situacao else ""
-            if 'PERMANENTE' in situacao:
-                return cand # Achou um permanente! Retorna na hora.
-            
-            # Se não for permanente, guarda o primeiro que achou como "plano B"
-            if not melhor_candidato:
-                melhor_candidato = cand
-        
-        return melhor_candidato
+    # 2. Não encontrados (pelo cache ou, se o cache estava velho, pelo banco): itens normais,
+    # pulando os que já estão na listagem
+    normais = [numero for numero in validos if numero not in confirmados]
+    existentes = set()
+    for bloco in em_blocos(normais):
+        existentes.update(listagem.itens.filter(numero_digitado__in=bloco).values_list('numero_digitado', flat=True))
+    resultado['repetidos'] = [numero for numero in normais if numero in existentes]
+    novos = [numero for numero in normais if numero not in existentes]
+
+    ItemProcesso.objects.bulk_create(
+        [ItemProcesso(listagem=listagem, numero_digitado=numero, e_permanente=False)
+         for numero in novos],
+        # Outra aba adicionando o mesmo número ao mesmo tempo
+        ignore_conflicts=True,
+    )
+    # Os ids não voltam do bulk_create com ignore_conflicts: lidos de novo para os botões de apagar
+    for bloco in em_blocos(novos):
+        for numero, item_pk in listagem.itens.filter(numero_digitado__in=bloco).values_list('numero_digitado', 'pk'):
+            resultado['adicionados'].append({
+                'numero': numero, 'url_apagar': reverse('apagar_item', kwargs={'item_pk': item_pk}),
+            })
+    return resultado
+
+
+def resumo_verificacao(numeros_unicos, resolvidos):
+    """
+    Separa os processos encontrados em permanentes e outros (sem repetir um
+    processo achado por números diferentes) e lista os não encontrados.
+    """
+    lista_permanentes = []
+    lista_outros = []
+    nao_encontrados = []
+    encontrados_map = {} # Evita duplicar objetos se inputs diferentes levarem ao mesmo processo
+
+    for num_input in numeros_unicos:
+        proc = resolvidos[num_input]
+
+        if not proc:
+            nao_encontrados.append(num_input)
+            continue
 
-    return None
\ No newline at end of file
+        # Usa o ID do processo como chave única
+        if proc.id not in encontrados_map:
+            encontrados_map[proc.id] = True
+
+            if proc.permanente:
+                lista_permanentes.append(proc)
+            else:
+                lista_outros.append(proc)
+
+    return {
+        'sucesso': True,
+        'qtd_verificados': len(numeros_unicos),
+        'qtd_encontrados': len(lista_permanentes) + len(lista_outros),
+        'lista_permanentes': lista_permanentes,
+        'lista_outros': lista_outros,
+        'nao_encontrados': nao_encontrados,
+    }
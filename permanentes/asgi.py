@@ -3,6 +3,9 @@ ASGI config for permanentes project.
 
 It exposes the ASGI callable as a module-level variable named ``application``.
 
+Besides the regular Django views, it serves the box conference over
+WebSocket (see core/conferencia_ws.py), e.g. with: uvicorn permanentes.asgi:application
+
 For more information on this file, see
 https://docs.djangoproject.com/en/5.2/howto/deployment/asgi/
 """
@@ -13,4 +16,14 @@ from django.core.asgi import get_asgi_application
 
 os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'permanentes.settings')
 
-application = get_asgi_application()
+django_application = get_asgi_application()
+
+# Importado depois do setup do Django (usa os models)
+from core.conferencia_ws import conferencia_websocket  # noqa: E402
+
+
+async def application(scope, receive, send):
+    if scope['type'] == 'websocket':
+        await conferencia_websocket(scope, receive, send)
+    else:
+        await django_application(scope, receive, send)
@@ -50,6 +50,15 @@ MIDDLEWARE = [
     'django.middleware.clickjacking.XFrameOptionsMiddleware',
 ]
 
+# Medição de tempo e consultas por view (core/medicao.py). Desligada por padrão.
+# Resumo em /ajax/estatisticas-requisicoes/ (só staff).
+MEDICAO_REQUISICOES = os.environ.get('MEDICAO_REQUISICOES', '') == '1'
+# Acima disso a requisição gera um aviso no log 'core.medicao'
+MEDICAO_LIMITE_CONSULTAS = int(os.environ.get('MEDICAO_LIMITE_CONSULTAS', 50))
+if MEDICAO_REQUISICOES:
+    # Primeiro da lista, para incluir as consultas de sessão e autenticação
+    MIDDLEWARE.insert(0, 'core.medicao.MedicaoMiddleware')
+
 ROOT_URLCONF = 'permanentes.urls'
 
 TEMPLATES = [
@@ -74,13 +83,110 @@ WSGI_APPLICATION = 'permanentes.wsgi.application'
 # Database
 # https://docs.djangoproject.com/en/5.2/ref/settings/#databases
 
-DATABASES = {
-    'default': {
-        'ENGINE': 'django.db.backends.sqlite3',
-        'NAME': BASE_DIR / 'db.sqlite3',
+#
+# Escolhido por variáveis de ambiente:
+# - BANCO_TIPO: 'sqlite' (padrão) ou 'postgresql' (precisa do pacote psycopg);
+# - BANCO_NOME: arquivo do SQLite ou nome do banco no PostgreSQL;
+# - BANCO_USUARIO, BANCO_SENHA, BANCO_HOST, BANCO_PORTA: só para o PostgreSQL;
+# - BANCO_CONN_MAX_AGE: segundos que uma conexão é reaproveitada (0 = uma por requisição);
+# - SQLITE_PERFIL: 'otimizado' (padrão, pragmas abaixo) ou 'padrao' (sem pragmas).
+#
+# O perfil otimizado põe o SQLite em WAL: leitores não esperam o escritor e
+# vice-versa, o que importa com vários leitores bipando ao mesmo tempo.
+# Compare os dois com 'python manage.py benchmark_concorrencia'.
+
+BANCO_TIPO = os.environ.get('BANCO_TIPO', 'sqlite')
+BANCO_CONN_MAX_AGE = int(os.environ.get('BANCO_CONN_MAX_AGE', 600))
+
+# Executados em cada conexão nova do SQLite (perfil 'otimizado')
+SQLITE_PRAGMAS = {
+    'journal_mode': 'WAL',
+    'synchronous': 'NORMAL',     # Seguro com WAL; só perde a última transação se a máquina cair
+    'mmap_size': 256 * 1024 * 1024,
+    'cache_size': -64 * 1024,    # Negativo = KiB (64 MiB por conexão)
+    'busy_timeout': 20_000,      # ms esperando a vez de escrever antes de "database is locked"
+    'temp_store': 'MEMORY',
+}
+SQLITE_OPCOES = {
+    'init_command': ';'.join(f'PRAGMA {nome}={valor}' for nome, valor in SQLITE_PRAGMAS.items()),
+    # Quem vai escrever pega a trava no início da transação: com WAL, evita o
+    # "database is locked" imediato de quando uma leitura tenta virar escrita
+    'transaction_mode': 'IMMEDIATE',
+}
+
+if BANCO_TIPO == 'postgresql':
+    DATABASES = {
+        'default': {
+            'ENGINE': 'django.db.backends.postgresql',
+            'NAME': os.environ.get('BANCO_NOME', 'permanentes'),
+            'USER': os.environ.get('BANCO_USUARIO', ''),
+            'PASSWORD': os.environ.get('BANCO_SENHA', ''),
+            'HOST': os.environ.get('BANCO_HOST', ''),
+            'PORT': os.environ.get('BANCO_PORTA', ''),
+            'CONN_MAX_AGE': BANCO_CONN_MAX_AGE,
+            'CONN_HEALTH_CHECKS': True,
+        }
     }
+else:
+    DATABASES = {
+        'default': {
+            'ENGINE': 'django.db.backends.sqlite3',
+            'NAME': os.environ.get('BANCO_NOME', BASE_DIR / 'db.sqlite3'),
+            'CONN_MAX_AGE': BANCO_CONN_MAX_AGE,
+            'CONN_HEALTH_CHECKS': True,
+        }
+    }
+    if os.environ.get('SQLITE_PERFIL', 'otimizado') == 'otimizado':
+        DATABASES['default']['OPTIONS'] = dict(SQLITE_OPCOES)
+
+
+# Cache
+# Em arquivo para ser compartilhado entre os workers e o comando de importação.
+# Os contadores de geração ficam no banco (core/geracao.py), não aqui: o
+# descarte de entradas do cache não invalida os caches dos workers.
+
+# Cache de consultas por número (core/cache_processos.py):
+# 'local' (memória de cada worker) ou 'compartilhado' (usa o cache CACHE_PROCESSOS_ALIAS)
+CACHE_PROCESSOS_TIPO = os.environ.get('CACHE_PROCESSOS_TIPO', 'local')
+# Máximo de números guardados no cache 'local' de cada worker e no 'compartilhado'
+CACHE_PROCESSOS_LIMITE = 100_000
+CACHE_PROCESSOS_ALIAS = 'processos'
+# Redis para o 'compartilhado' ser visto por vários workers, ex: redis://127.0.0.1:6379/1
+# (precisa do pacote 'redis'). Sem ele, o alias fica na memória de cada processo.
+CACHE_PROCESSOS_URL = os.environ.get('CACHE_PROCESSOS_URL')
+
+CACHES = {
+    'default': {
+        'BACKEND': 'django.core.cache.backends.filebased.FileBasedCache',
+        'LOCATION': BASE_DIR / 'cache',
+        # Diretório de caixas (uma entrada por geração) e pouco mais
+        'OPTIONS': {'MAX_ENTRIES': 1000},
+    },
+    # Alias próprio para os números não expulsarem o resto. Não em arquivo: com um
+    # arquivo por número, o FileBasedCache lista o diretório inteiro a cada set()
+    CACHE_PROCESSOS_ALIAS: {
+        'BACKEND': 'django.core.cache.backends.redis.RedisCache',
+        'LOCATION': CACHE_PROCESSOS_URL,
+    } if CACHE_PROCESSOS_URL else {
+        'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+        'LOCATION': 'processos',
+        # Ao chegar no limite, descarta 1/10 das entradas
+        'OPTIONS': {'MAX_ENTRIES': CACHE_PROCESSOS_LIMITE, 'CULL_FREQUENCY': 10},
+    },
 }
 
+# Filtro de números (core/filtro.py), gerado pela importação.
+# Com FILTRO_PROCESSOS_ARQUIVO = None o filtro não é usado.
+FILTRO_PROCESSOS_ARQUIVO = BASE_DIR / 'filtro_processos.bin'
+FILTRO_PROCESSOS_TAXA_FP = 0.01
+
+# Verificação em lote (core/verificacoes.py): acima deste número de processos
+# a lista é processada em segundo plano e a página mostra o progresso
+VERIFICACAO_LIMITE_SINCRONO = 2000
+# Processa a fila numa thread do próprio servidor web. Com False, rode
+# 'python manage.py processar_verificacoes --continuo' (ou agende o comando)
+VERIFICACAO_WORKER_NA_THREAD = os.environ.get('VERIFICACAO_WORKER_NA_THREAD', '1') == '1'
+
 
 # Password validation
 # https://docs.djangoproject.com/en/5.2/ref/settings/#auth-password-validators